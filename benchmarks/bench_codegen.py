@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of loading a rule set: parsing it against importing its module.
+
+Generates N rules from a few templates, then times compiling all of them
+with the parser and importing the module CodeGenerator wrote for them,
+from the bytecode Write leaves as a worker would, best of --repeat runs.
+
+    python benchmarks/bench_codegen.py [--rules N] [--repeat N]
+"""
+# stdlib
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import timeit
+
+# firstparty
+from xpath import CodeGenerator
+from xpath import Compile
+
+
+
+TEMPLATES = [
+    "//item[@id = 'i%d']/name",
+    "count(section[%d]/item[price > 50])",
+    "/catalog/section/item[position() <= %d]/@id",
+    "sum(//item[name = concat('n', %d)]/price) div 2",
+]
+
+
+def Rules(count):
+    return [TEMPLATES[n % len(TEMPLATES)] % n for n in range(count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rules", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rules = Rules(args.rules)
+    directory = tempfile.mkdtemp()
+    CodeGenerator.Write(os.path.join(directory, "bench_rules.py"), rules)
+    sys.path.insert(0, directory)
+
+    def Parse():
+        for expr in rules:
+            Compile(expr)
+
+    def Import():
+        sys.modules.pop("bench_rules", None)
+        importlib.import_module("bench_rules")
+
+    parse = min(timeit.repeat(Parse, number=1, repeat=args.repeat))
+    load = min(timeit.repeat(Import, number=1, repeat=args.repeat))
+    print("%d rules: parse %8.1f ms  import %8.1f ms  (%.1fx)" % (
+        len(rules), parse * 1e3, load * 1e3, parse / load))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
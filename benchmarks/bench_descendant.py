@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of //name before and after the descendant step rewrite.
+
+Builds a catalog document of N items and times location paths of the
+//name shape as parsed and as rewritten by the optimizer.
+
+    python benchmarks/bench_descendant.py [--items N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+
+
+
+EXPRESSIONS = [
+    "//item",
+    "//item[@id]",
+    "/catalog//price",
+    "//section//item[price > 50]",
+]
+
+
+def BuildCatalog(items):
+    parts = ["<catalog>"]
+    for section in range(max(items // 100, 1)):
+        parts.append("<section n='%d'>" % section)
+        for item in range(min(items, 100)):
+            parts.append(
+                "<item id='i%d-%d'><name>n%d</name><price>%d</price></item>"
+                % (section, item, item, item)
+            )
+        parts.append("</section>")
+    parts.append("</catalog>")
+    return minidom.parseString("".join(parts))
+
+
+def Time(tree, doc, repeat):
+    def Run():
+        tree.evaluate(Context.Context(doc, 1, 1))
+
+    return min(timeit.repeat(Run, number=1, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    doc = BuildCatalog(args.items)
+    for expr in EXPRESSIONS:
+        tree = TableParser.ExprParser().parse(expr)
+        optimized = Optimizer.Optimize(tree)
+        before = Time(tree, doc, args.repeat)
+        after = Time(optimized, doc, args.repeat)
+        print(
+            "%-30s %9.1f ms -> %9.1f ms (%.1fx)  %s"
+            % (expr, before * 1000, after * 1000, before / after, repr(optimized))
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Per-evaluation benchmark of the tree-walking and closure engines.
+
+Evaluates each expression against a generated catalog document with
+the optimized tree and with its ClosureCompiler closures, best of
+--repeat runs of --number evaluations each.
+
+    python benchmarks/bench_engines.py [--items N] [--number N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+
+# firstparty
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+
+# localfolder
+from bench_descendant import BuildCatalog
+
+
+
+EXPRESSIONS = [
+    "1 + 2 * $n - $n div 3",
+    "$n > 10 and $n < 100 or $n = 5",
+    "concat(name(), '-', string-length(name()))",
+    "count(item[price > $n])",
+    "item[@id = 'i0-50']/name",
+    "item[price > $n and price < $n * 2]/@id",
+]
+
+
+def Time(compiled, context, number, repeat):
+    evaluate = compiled.evaluate
+    return min(timeit.repeat(lambda: evaluate(context), number=number, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    doc = BuildCatalog(args.items)
+    section = doc.documentElement.firstChild
+    context = Context.Context(section, 1, 1)
+    context.varBindings = {(None, "n"): 40.0}
+    total = [0.0, 0.0]
+    for expr in EXPRESSIONS:
+        tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+        compiled = ClosureCompiler.Compile(tree)
+        times = [
+            Time(tree, context, args.number, args.repeat) / args.number,
+            Time(compiled, context, args.number, args.repeat) / args.number,
+        ]
+        total = [total[0] + times[0], total[1] + times[1]]
+        print(
+            "%-45s tree %8.2f us  closure %8.2f us  (%.2fx)"
+            % (expr, times[0] * 1e6, times[1] * 1e6, times[0] / times[1])
+        )
+    print("%-45s tree %8.2f us  closure %8.2f us  (%.2fx)" % (
+        "total", total[0] * 1e6, total[1] * 1e6, total[0] / total[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Import-time regression benchmark, based on python -X importtime.
+
+Imports the package in fresh interpreters, reports the best cumulative
+import time of the package and its slowest modules, and fails if it is
+over budget.
+
+    python benchmarks/bench_import.py [--budget MS] [--eager] [--top N]
+"""
+# stdlib
+import argparse
+import os
+import subprocess
+import sys
+
+
+
+def ImportTimes(statement, env):
+    """Run statement under -X importtime: [(self us, cumulative us, level, name)]"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if proc.returncode:
+        sys.exit("%r failed:\n%s" % (statement, proc.stderr))
+    times = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        (own, cumulative, name) = line[len("import time:") :].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        times.append((int(own), int(cumulative), level, name.strip()))
+    return times
+
+
+def PackageTime(times, package):
+    """The cumulative time of the outermost imports of the package's modules"""
+    entries = [t for t in times if t[3] == package or t[3].startswith(package + ".")]
+    if not entries:
+        return (0, [])
+    outer = min([t[2] for t in entries])
+    return (sum([t[1] for t in entries if t[2] == outer]), entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--package", default="xpath")
+    parser.add_argument("--statement", help="code to time (default: import PACKAGE)")
+    parser.add_argument("--budget", type=float, default=25.0, help="milliseconds")
+    parser.add_argument("--eager", action="store_true", help="set XPATH_EAGER_INIT")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    statement = args.statement or "import %s" % args.package
+    env = dict(os.environ)
+    env.pop("XPATH_EAGER_INIT", None)
+    if args.eager:
+        env["XPATH_EAGER_INIT"] = "1"
+
+    best = None
+    for i in range(args.repeat):
+        (total, entries) = PackageTime(ImportTimes(statement, env), args.package)
+        if best is None or total < best[0]:
+            best = (total, entries)
+    (total, entries) = best
+    if not entries:
+        sys.exit("%r did not import %s" % (statement, args.package))
+
+    print("%s: %.1f ms (budget %.1f ms)" % (statement, total / 1000.0, args.budget))
+    entries.sort(key=lambda t: t[0], reverse=True)
+    for (own, cumulative, level, name) in entries[: args.top]:
+        print("  %8.1f ms self %8.1f ms cumulative  %s" % (own / 1000.0, cumulative / 1000.0, name))
+    if total / 1000.0 > args.budget:
+        print("over budget by %.1f ms" % (total / 1000.0 - args.budget))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
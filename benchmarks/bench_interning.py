@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark of hash-consed expression trees.
+
+Compiles a generated rule set with a plain FtFactory and with an
+InterningFtFactory and reports the memory the trees hold (tracemalloc)
+and the number of distinct node objects.
+
+    python benchmarks/bench_interning.py [--count N] [--terms N]
+"""
+# stdlib
+import argparse
+import gc
+import time
+import tracemalloc
+
+# firstparty
+from xpath import pyxpath
+from xpath import TableParser
+from xpath.ParsedNode import ParsedNode
+
+# localfolder
+from bench_scanner import GenerateExpressions
+
+
+
+def CountNodes(trees):
+    """The number of distinct node objects reachable from trees"""
+    seen = set()
+    todo = list(trees)
+    while todo:
+        node = todo.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        todo.extend([child for child in node.children() if isinstance(child, ParsedNode)])
+    return len(seen)
+
+
+def Compile(factory, exprs):
+    gc.collect()
+    tracemalloc.start()
+    began = time.perf_counter()
+    parser = TableParser.ExprParser(factory)
+    trees = [parser.parse(expr) for expr in exprs]
+    elapsed = time.perf_counter() - began
+    gc.collect()
+    (size, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (trees, size, elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--terms", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    exprs = GenerateExpressions(args.count, args.terms)
+    base = None
+    for (label, factory) in [
+        ("plain", pyxpath.FtFactory()),
+        ("interning", pyxpath.InterningFtFactory()),
+    ]:
+        (trees, size, elapsed) = Compile(factory, exprs)
+        base = base or size
+        print(
+            "%-10s %8.1f MB (%.2fx)  %8d nodes  compiled in %7.1f ms"
+            % (label, size / 1e6, base / float(size), CountNodes(trees), elapsed * 1000)
+        )
+        del trees
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of predicates with invariant parts, with and without hoisting.
+
+Evaluates each expression against a document of N rows with the
+optimized tree and with the tree whose invariant predicate parts are
+hoisted, best of --repeat runs.
+
+    python benchmarks/bench_invariants.py [--rows N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Invariants
+from xpath import Optimizer
+from xpath import TableParser
+
+
+
+EXPRESSIONS = [
+    "//row[@v > /doc/meta/@cutoff]",
+    "//row[@v > $limit * 2]",
+    "//row[@v < count(/doc/meta/error) + 10]",
+]
+
+
+def BuildDocument(rows):
+    text = "".join(["<row v='%d'/>" % (n % 100) for n in range(rows)])
+    return minidom.parseString("<doc><meta cutoff='90'><error/></meta>%s</doc>" % text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    doc = BuildDocument(args.rows)
+    context = Context.Context(doc, 1, 1)
+    context.varBindings = {(None, "limit"): 45.0}
+    for expr in EXPRESSIONS:
+        tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+        hoisted = Invariants.Hoist(tree)
+        times = [
+            min(timeit.repeat(lambda: tree.evaluate(context), number=1, repeat=args.repeat)),
+            min(timeit.repeat(lambda: hoisted.evaluate(context), number=1, repeat=args.repeat)),
+        ]
+        print("%-45s %8.1f ms  hoisted %8.1f ms  (%.2fx)" % (
+            expr, times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
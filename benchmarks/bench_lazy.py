@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of consumers that stop at the first node, lazy and eager.
+
+Evaluates each optimized expression, which selects the nodes of its
+location path one at a time, against a document of N items, and the same
+consumer applied to the whole node-set of the path, best of --repeat runs.
+
+    python benchmarks/bench_lazy.py [--items N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+
+
+
+# The expression, its location path, and the consumer of the path's nodes
+EXPRESSIONS = [
+    ("boolean(//x)", "//x", "boolean($nodes)"),
+    ("string(//title)", "//title", "string($nodes)"),
+    ("//x = 'lit'", "//x", "$nodes = 'lit'"),
+    ("(//item)[1]", "//item", "$nodes[1]"),
+]
+
+
+def BuildDocument(items):
+    text = "".join(["<item><title>t%d</title><x>lit</x></item>" % n for n in range(items)])
+    return minidom.parseString("<doc>%s</doc>" % text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    doc = BuildDocument(args.items)
+    context = Context.Context(doc, 1, 1)
+    for (expr, path, consumer) in EXPRESSIONS:
+        tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+        path = Optimizer.Optimize(TableParser.ExprParser().parse(path))
+        consumer = Optimizer.Optimize(TableParser.ExprParser().parse(consumer))
+
+        def Eager():
+            context.varBindings = {(None, "nodes"): path.evaluate(context)}
+            return consumer.evaluate(context)
+
+        assert tree.evaluate(context) == Eager()
+        times = [
+            min(timeit.repeat(Eager, number=1, repeat=args.repeat)),
+            min(timeit.repeat(lambda: tree.evaluate(context), number=1, repeat=args.repeat)),
+        ]
+        print("%-20s eager %8.2f ms  lazy %8.3f ms  (%.0fx)" % (
+            expr, times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
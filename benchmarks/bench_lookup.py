@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of steps that pick elements by the value of an attribute.
+
+Looks up --lookups products of a catalog of N by their sku, as lookup
+heavy templates do in a loop, with each optimized expression, against
+the catalog and against a copy of it whose sku and ref attributes are
+indexed with Util.IndexAttributes, best of --repeat runs.
+
+    python benchmarks/bench_lookup.py [--products N] [--lookups N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+from xpath import Util
+
+
+
+EXPRESSIONS = [
+    "//product[@sku = $sku]",
+    "/catalog/product[@sku = $sku]/price",
+    "//*[@ref = $sku]",
+]
+
+
+def BuildDocument(products):
+    text = "".join([
+        "<product sku='s%d'><name>n</name><price>%d</price><link ref='s%d'/></product>"
+        % (n, n, (n * 7) % products)
+        for n in range(products)
+    ])
+    return minidom.parseString("<catalog>%s</catalog>" % text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    plain = BuildDocument(args.products)
+    indexed = BuildDocument(args.products)
+    Util.IndexAttributes(indexed, ["sku", "ref"])
+    skus = ["s%d" % (n * args.products // args.lookups) for n in range(args.lookups)]
+    for expr in EXPRESSIONS:
+        tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+
+        def Lookups(doc):
+            context = Context.Context(doc, 1, 1)
+            result = []
+            for sku in skus:
+                context.varBindings = {(None, "sku"): sku}
+                result.append(len(tree.evaluate(context)))
+            return result
+
+        assert Lookups(plain) == Lookups(indexed)
+        times = [
+            min(timeit.repeat(lambda: Lookups(plain), number=1, repeat=args.repeat)),
+            min(timeit.repeat(lambda: Lookups(indexed), number=1, repeat=args.repeat)),
+        ]
+        print("%-40s scanned %9.1f ms  indexed %7.2f ms  (%.0fx)" % (
+            expr, times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Side-by-side compile benchmark of the expression parser backends.
+
+Compares the recursive-descent YAPPS parser (pyxpath) with the LALR table
+driven parser (TableParser) on generated expressions and on deeply
+nested ones.
+
+    python benchmarks/bench_parsers.py [--count N] [--terms N] [--depth N]
+"""
+# stdlib
+import argparse
+import sys
+import timeit
+
+# firstparty
+from xpath import pyxpath
+from xpath import TableParser
+
+# localfolder
+from bench_scanner import GenerateExpressions
+
+
+
+BACKENDS = [
+    ("yapps", pyxpath.ExprParserFactory),
+    ("table", TableParser.ExprParserFactory),
+]
+
+
+def Nested(depth):
+    """An expression nesting depth parenthesized sub-expressions"""
+    expr = "@x"
+    for i in range(depth):
+        expr = "(%s + %d) * -count(item[@n > %d])" % (expr, i, i)
+    return expr
+
+
+def Compile(factory, exprs):
+    for expr in exprs:
+        factory.new().parse(expr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--terms", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    workloads = [
+        ("generated", GenerateExpressions(args.count, args.terms)),
+        ("nested", [Nested(args.depth)] * 20),
+    ]
+    for (label, exprs) in workloads:
+        # Both backends must build the same trees
+        for expr in exprs[:20]:
+            trees = [repr(factory.new().parse(expr)) for (name, factory) in BACKENDS]
+            if trees[0] != trees[1]:
+                sys.exit("backends disagree on %r" % expr)
+        timings = []
+        for (name, factory) in BACKENDS:
+            best = min(
+                timeit.repeat(
+                    lambda: Compile(factory, exprs), number=1, repeat=args.repeat
+                )
+            )
+            timings.append((name, best))
+        base = timings[0][1]
+        print(
+            "%-10s "
+            % label
+            + "   ".join(
+                ["%s %8.1f ms (%.2fx)" % (name, t * 1000, base / t) for (name, t) in timings]
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of location paths taken from many context nodes.
+
+Evaluates //sec//p and $secs/p against a document of N sections, each
+nested in the one before it every few sections, with the node-sets
+selected from each context node merged in document order (or joined
+when they cannot overlap), and as they were before: the union of the
+result so far with the nodes of each context node in turn, best of
+--repeat runs.
+
+    python benchmarks/bench_paths.py [--sections N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Optimizer
+from xpath import Set
+from xpath import TableParser
+
+
+
+def BuildDocument(sections):
+    parts = ["<doc>"]
+    for n in range(sections):
+        parts.append("<sec><p/><p/>")
+        if n % 4 == 3:
+            parts.append("</sec>" * 4)
+    parts.append("</sec>" * (sections % 4))
+    parts.append("</doc>")
+    return minidom.parseString("".join(parts))
+
+
+def Accumulate(stages, nodeList, context):
+    """The stages taken in turn as the path operators evaluated them before"""
+    for stage in stages:
+        result = []
+        size = len(nodeList)
+        for position in range(size):
+            context.setNodePosSize((nodeList[position], position + 1, size))
+            result = Set.Union(result, stage.select(context))
+        nodeList = result
+    return nodeList
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    doc = BuildDocument(args.sections)
+    context = Context.Context(doc, 1, 1)
+    secs = list(doc.getElementsByTagName("sec"))
+    context.varBindings = {(None, "secs"): secs}
+
+    tree = TableParser.ExprParser().parse("//sec//p")
+    stages = [tree._step, tree._rel._left, tree._rel._middle, tree._rel._right]
+    cases = [("//sec//p", tree, lambda: Accumulate(stages, [doc], context))]
+
+    path = Optimizer.Optimize(TableParser.ExprParser().parse("$secs/p"))
+    cases.append(("$secs/p", path, lambda: Accumulate([path._right], secs, context)))
+
+    for (expr, tree, before) in cases:
+        assert sorted(map(id, tree.evaluate(context))) == sorted(map(id, before()))
+        after = min(timeit.repeat(lambda: tree.evaluate(context), number=1, repeat=args.repeat))
+        union = min(timeit.repeat(before, number=1, repeat=args.repeat))
+        print("%-10s %d sections: merged %8.1f ms  accumulated %8.1f ms  (%.2fx)" % (
+            expr, args.sections, after * 1e3, union * 1e3, union / after))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
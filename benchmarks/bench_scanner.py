@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parse throughput of the single-pass XPathScanner.
+
+Tokenizes and parses long, machine-generated expressions and compares the
+scanner against the previous two-pass implementation, reproduced below.
+
+    python benchmarks/bench_scanner.py [--count N] [--terms N]
+"""
+# stdlib
+import argparse
+import random
+import timeit
+
+# firstparty
+from xpath import pyxpath
+from xpath import XPathGrammar
+from xpath.XPathGrammar import AxisName
+from xpath.XPathGrammar import OperatorName
+from xpath.XPathGrammar import SpecialPreceding
+
+
+
+class TwoPassScanner:
+    """The scanner as it was before it was made single pass"""
+
+    def __init__(self, input):
+        self.tokens = tokens = []
+        (exp, follow) = XPathGrammar.ScannerPatterns()
+        pos = 0
+        while pos != len(input):
+            m = exp.match(input, pos)
+            if not m:
+                raise SyntaxError(pos, "Bad Token")
+            type, val = m.lastgroup, m.group()
+            if type == "ExprWhiteSpace":
+                pos = pos + len(val)
+                continue
+            if type in ["SingleOperator", "Operator"]:
+                type = repr(str(val))
+            start = pos
+            pos = pos + len(val)
+            tokens.append((start, pos, type, val))
+        tokens.append((pos, pos, "END", ""))
+
+        for i in range(len(tokens) - 1):
+            start, stop, type, val = tokens[i]
+            if i >= 1 and tokens[i - 1][2] not in SpecialPreceding:
+                if type == "STAR":
+                    type = "MultiplyOperator"
+                    tokens[i] = (start, stop, type, val)
+                elif type == "NCName" and val in OperatorName:
+                    type = repr(str(val))
+                    tokens[i] = (start, stop, type, val)
+            if tokens[i][2] in ["QName", "NCName"] and tokens[i + 1][2] == "LPAREN":
+                if val in ["comment", "text", "processing-instruction", "node"]:
+                    type = "NodeType"
+                elif val == "id":
+                    type = "ID"
+                elif val == "key":
+                    type = "KEY"
+                else:
+                    type = "FunctionName"
+                tokens[i] = (start, stop, type, val)
+            if (
+                tokens[i][2] == "NCName"
+                and tokens[i + 1][3] == "::"
+                and val in AxisName
+            ):
+                tokens[i] = (start, stop, "AxisName", val)
+
+    def token(self, i, expected):
+        return self.tokens[i]
+
+
+NAMES = ["item", "price", "sku", "line", "order", "ns:entry", "title", "div"]
+PREDICATES = [
+    "@id = '{0}'",
+    "position() < {1}",
+    "contains(., '{0}')",
+    "count(line) > {1}",
+    "@qty * {1} >= sum(line/@qty)",
+    "not(@deleted) and string-length(@sku) mod 2 = 0",
+]
+STEPS = [
+    "{n}",
+    "child::{n}",
+    "descendant-or-self::node()/{n}",
+    "@{n}",
+    "{n}[{p}]",
+    "following-sibling::{n}[{p}]",
+    "*",
+    "text()",
+]
+
+
+def GenerateExpressions(count, terms, seed=1):
+    """Return count expressions, each made of terms location paths"""
+    rnd = random.Random(seed)
+    exprs = []
+    for i in range(count):
+        paths = []
+        for t in range(terms):
+            steps = []
+            for s in range(rnd.randint(2, 6)):
+                pred = rnd.choice(PREDICATES).format("v%d" % rnd.randint(0, 99), rnd.randint(1, 9))
+                steps.append(rnd.choice(STEPS).format(n=rnd.choice(NAMES), p=pred))
+            paths.append(rnd.choice(["/", "//", ""]) + "/".join(steps))
+        exprs.append("count(" + " | ".join(paths) + ") > %d" % i)
+    return exprs
+
+
+def Parse(scannerClass, expr):
+    return XPathGrammar.XPath(scannerClass(expr), pyxpath.factory).FullExpr()
+
+
+def Report(label, old, new, units):
+    print("%-10s two-pass %8.1f ms   single-pass %8.1f ms   %.2fx  (%s)" % (
+        label, old * 1000, new * 1000, old / new, units))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--terms", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    exprs = GenerateExpressions(args.count, args.terms)
+    chars = sum(map(len, exprs))
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    units = "%d expressions, %d chars" % (len(exprs), chars)
+    Report(
+        "tokenize",
+        best(lambda: [TwoPassScanner(e) for e in exprs]),
+        best(lambda: [XPathGrammar.XPathScanner(e) for e in exprs]),
+        units,
+    )
+    Report(
+        "parse",
+        best(lambda: [Parse(TwoPassScanner, e) for e in exprs]),
+        best(lambda: [Parse(XPathGrammar.XPathScanner, e) for e in exprs]),
+        units,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the node-set operations of xpath.Set.
+
+Times Union, Intersection, Not and Unique on two half-overlapping lists
+of N nodes each, for N from 10 to --max, best of --repeat runs.  The
+list-scanning implementations they replaced are timed up to
+--old-max nodes; they take time quadratic in N.
+
+    python benchmarks/bench_set.py [--max N] [--old-max N] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from functools import reduce
+
+# firstparty
+from xpath import Set
+
+
+
+class OldSet:
+    """The operations as they were, membership by scanning lists"""
+
+    def Not(original, other):
+        return list(filter(lambda x, other=other: x not in other, original))
+
+    def Union(left, right):
+        if len(left) < len(right):
+            loop = left
+            compare = right
+        else:
+            loop = right
+            compare = left
+        return compare + list(filter(lambda x, compare=compare: x not in compare, loop))
+
+    def Intersection(left, right):
+        if len(left) < len(right):
+            loop = left
+            compare = right
+        else:
+            loop = right
+            compare = left
+        return list(filter(lambda x, compare=compare: x in compare, loop))
+
+    def Unique(left):
+        return reduce(lambda rt, x: x in rt and rt or rt + [x], left, [])
+
+
+class Node:
+    pass
+
+
+def Time(module, left, right, repeat):
+    times = []
+    for (name, args) in [
+        ("Union", (left, right)),
+        ("Intersection", (left, right)),
+        ("Not", (left, right)),
+        ("Unique", (left + right,)),
+    ]:
+        func = getattr(module, name)
+        times.append(min(timeit.repeat(lambda: func(*args), number=1, repeat=repeat)))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max", type=int, default=1000000)
+    parser.add_argument("--old-max", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print("%9s %-13s %12s %12s" % ("nodes", "operation", "hashed", "scanning"))
+    size = 10
+    while size <= args.max:
+        nodes = [Node() for n in range(size + size // 2)]
+        left = nodes[:size]
+        right = nodes[size // 2:]
+        new = Time(Set, left, right, args.repeat)
+        if size <= args.old_max:
+            old = Time(OldSet, left, right, args.repeat)
+        else:
+            old = [None] * len(new)
+        for (name, newTime, oldTime) in zip(["Union", "Intersection", "Not", "Unique"], new, old):
+            print("%9d %-13s %9.3f ms %s" % (
+                size, name, newTime * 1e3,
+                oldTime is None and "           -" or "%9.3f ms" % (oldTime * 1e3)))
+        size = size * 10
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
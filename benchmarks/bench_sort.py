@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of sorting large node-sets in document order.
+
+Sorts node-sets of up to N element and attribute nodes with
+Util.SortDocOrder, and with the comparison function it used before, on
+ranks already computed, best of --repeat runs.
+
+    python benchmarks/bench_sort.py [--nodes N] [--repeat N]
+"""
+# stdlib
+import argparse
+import functools
+import random
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Util
+
+
+
+def BuildDocument(nodes):
+    # Each element has an attribute
+    return minidom.parseString("<doc>%s</doc>" % ("<e a='1'/>" * (nodes // 2)))
+
+
+def IndexSort(ranks):
+    """The comparison of nodes by rank that SortDocOrder used before"""
+
+    def Compare(left, right):
+        ldocId = id(left.ownerDocument or left)
+        rdocId = id(right.ownerDocument or right)
+        if ldocId == rdocId:
+            (lrank, rrank) = (ranks[id(left)], ranks[id(right)])
+            return (lrank > rrank) - (lrank < rrank)
+        return (ldocId > rdocId) - (ldocId < rdocId)
+
+    return functools.cmp_to_key(Compare)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    doc = BuildDocument(args.nodes)
+    nodes = []
+    for element in doc.documentElement.childNodes:
+        nodes.append(element)
+        nodes.append(element.getAttributeNode("a"))
+    ranks = Util.g_documentIndexes.get(doc).ranks
+    key = IndexSort(ranks)
+    shuffled = nodes[:]
+    random.Random(0).shuffle(shuffled)
+    cases = [
+        ("shuffled", shuffled),
+        ("reversed", nodes[::-1]),
+        ("shuffled 1/20", shuffled[: len(shuffled) // 20]),
+    ]
+    for (name, nodeSet) in cases:
+        assert Util.SortDocOrder(nodeSet) == sorted(nodeSet, key=key)
+        times = [
+            min(timeit.repeat(lambda: sorted(nodeSet, key=key), number=1, repeat=args.repeat)),
+            min(timeit.repeat(lambda: Util.SortDocOrder(nodeSet), number=1, repeat=args.repeat)),
+        ]
+        print("%-14s %8d nodes: cmp %8.1f ms  key %8.1f ms  (%.1fx)" % (
+            name, len(nodeSet), times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
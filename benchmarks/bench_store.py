@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Warm-start benchmark of the on-disk compiled expression store.
+
+Simulates a worker restart: compiles a rule set with the parser, then
+loads the same rule set from a freshly opened CompiledStore.
+
+    python benchmarks/bench_store.py [--count N] [--terms N] [--store PATH]
+"""
+# stdlib
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+# firstparty
+from xpath import CompiledStore
+from xpath import pyxpath
+
+# localfolder
+from bench_scanner import GenerateExpressions
+
+
+
+def Parse(factory, exprs):
+    for expr in exprs:
+        factory.new().parse(expr)
+
+
+def Load(path, exprs, flavor):
+    store = CompiledStore.CompiledStore(path)
+    try:
+        for expr in exprs:
+            if store.get(expr, flavor) is None:
+                raise KeyError(expr)
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--terms", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--store", help="store file (default: a temporary file)")
+    args = parser.parse_args(argv)
+
+    factory = pyxpath.ExprParserFactory
+    exprs = GenerateExpressions(args.count, args.terms)
+    path = args.store or os.path.join(tempfile.mkdtemp(), "rules.xpc")
+    written = CompiledStore.Write(path, exprs, factory)
+
+    store = CompiledStore.CompiledStore(path)
+    for expr in exprs[:20]:
+        if repr(store.get(expr, factory.flavor)) != repr(factory.new().parse(expr)):
+            sys.exit("store disagrees with the parser on %r" % expr)
+    store.close()
+
+    parse = min(timeit.repeat(lambda: Parse(factory, exprs), number=1, repeat=args.repeat))
+    load = min(
+        timeit.repeat(lambda: Load(path, exprs, factory.flavor), number=1, repeat=args.repeat)
+    )
+    print(
+        "%d expressions (%d distinct), store %d bytes"
+        % (len(exprs), written, os.path.getsize(path))
+    )
+    print("parse %8.1f ms" % (parse * 1000))
+    print("load  %8.1f ms (%.2fx)" % (load * 1000, parse / load))
+    if not args.store:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of location paths over documents with a structural index.
+
+Evaluates each optimized expression against a document of N sections,
+nested D deep, with and without Util.IndexStructure for a copy of it,
+best of --repeat runs; the time to build the index is shown apart.
+
+    python benchmarks/bench_structure.py [--sections N] [--depth D] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+from xpath import Util
+
+
+
+EXPRESSIONS = [
+    "count(//p)",
+    "count(//sec[@n = '6']/descendant::p)",
+    "count(//sec//p)",
+    "count(/descendant::sec/descendant::p)",
+    "count((//sec)[last() div 2]/following::p)",
+    "count((//sec)[last() div 2]/preceding::p)",
+    "count((//p)[1]/following::node())",
+]
+
+
+def BuildDocument(sections, depth):
+    text = "<sec n='%d'><p>a</p><p>b</p>"
+    section = "".join([text % level for level in range(depth)]) + "</sec>" * depth
+    return minidom.parseString("<doc>%s</doc>" % (section * sections))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    plain = BuildDocument(args.sections, args.depth)
+    indexed = BuildDocument(args.sections, args.depth)
+    build = min(timeit.repeat(
+        lambda: (Util.DocumentChanged(indexed), Util.IndexStructure(indexed)),
+        number=1, repeat=args.repeat))
+    print("index of %d nodes built in %.1f ms" % (
+        len(Util.IndexStructure(indexed)), build * 1e3))
+    for expr in EXPRESSIONS:
+        tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+        (plainContext, indexedContext) = (Context.Context(plain, 1, 1), Context.Context(indexed, 1, 1))
+        assert tree.evaluate(plainContext) == tree.evaluate(indexedContext)
+        times = [
+            min(timeit.repeat(lambda: tree.evaluate(plainContext), number=1, repeat=args.repeat)),
+            min(timeit.repeat(lambda: tree.evaluate(indexedContext), number=1, repeat=args.repeat)),
+        ]
+        print("%-44s walked %8.1f ms  indexed %8.1f ms  (%.1fx)" % (
+            expr, times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Thread-scaling benchmark for compiling cold expressions.
+
+Compiles a fixed set of distinct expressions through a shared
+ExpressionCache from 1, 2, 4, ... threads, with and without a global
+lock around each parse (the way XPathParserBase used to serialize
+parses).  On free-threaded builds the lock-free runs should scale with
+the number of threads; with the GIL, both modes are expected to be flat.
+
+    python benchmarks/bench_threads.py [--count N] [--threads 1,2,4,8]
+"""
+# stdlib
+import argparse
+import sys
+import threading
+import time
+
+# firstparty
+from xpath import pyxpath
+from xpath import TableParser
+from xpath.ExpressionCache import ExpressionCache
+
+# localfolder
+from bench_scanner import GenerateExpressions
+
+
+
+BACKENDS = {
+    "yapps": pyxpath.ExprParserFactory,
+    "table": TableParser.ExprParserFactory,
+}
+
+
+class LockedFactory:
+    """Serializes every parse of factory through one global lock"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+
+    def new(self):
+        return self
+
+    def parse(self, expr):
+        self._lock.acquire()
+        try:
+            return self._factory.new().parse(expr)
+        finally:
+            self._lock.release()
+
+
+def Run(factory, exprs, threads):
+    """Compile exprs split over threads; return the wall time in seconds"""
+    cache = ExpressionCache(len(exprs))
+    chunks = [exprs[i::threads] for i in range(threads)]
+    start = threading.Barrier(threads + 1)
+
+    def Worker(chunk):
+        start.wait()
+        for expr in chunk:
+            cache.compile(expr, factory)
+
+    workers = [threading.Thread(target=Worker, args=(chunk,)) for chunk in chunks]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - began
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="table")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--terms", type=int, default=4)
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    factory = BACKENDS[args.backend]
+    exprs = GenerateExpressions(args.count, args.terms)
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(
+        "%s backend, %d expressions, GIL %s"
+        % (args.backend, len(exprs), gil and "enabled" or "disabled")
+    )
+    modes = [("global lock", LockedFactory(factory)), ("per-parser", factory)]
+    base = {}
+    for threads in [int(n) for n in args.threads.split(",")]:
+        line = "%3d threads" % threads
+        for (label, mode) in modes:
+            best = min([Run(mode, exprs, threads) for i in range(args.repeat)])
+            base.setdefault(label, best)
+            line = line + "   %s %8.1f ms (%.2fx)" % (label, best * 1000, base[label] / best)
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
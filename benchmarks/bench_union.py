@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of unions of many location paths.
+
+Evaluates a|b|c|... of K element names against a generated document,
+with the unions merged in document order at once, and as they were
+before: union with each operand in turn, then sort the whole result
+again, best of --repeat runs.
+
+    python benchmarks/bench_union.py [--elements N] [--paths K] [--repeat N]
+"""
+# stdlib
+import argparse
+import timeit
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import Optimizer
+from xpath import Set
+from xpath import TableParser
+from xpath import Util
+
+
+
+def BuildDocument(elements, names):
+    parts = ["<doc>"]
+    for n in range(elements):
+        parts.append("<e%d/>" % (n % names))
+    parts.append("</doc>")
+    return minidom.parseString("".join(parts))
+
+
+def PairwiseUnion(tree, context):
+    """The union as ParsedUnionExpr evaluated it before"""
+    result = []
+    for operand in tree._operands:
+        result = Set.Union(result, operand.evaluate(context))
+        result.sort(key=Util.DocumentOrderKey)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--elements", type=int, default=20000)
+    parser.add_argument("--paths", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    doc = BuildDocument(args.elements, args.paths)
+    context = Context.Context(doc, 1, 1)
+    expr = " | ".join(["/doc/e%d" % n for n in range(args.paths)])
+    tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+    assert tree.evaluate(context) == PairwiseUnion(tree, context)
+    merged = min(timeit.repeat(lambda: tree.evaluate(context), number=1, repeat=args.repeat))
+    pairwise = min(timeit.repeat(lambda: PairwiseUnion(tree, context), number=1, repeat=args.repeat))
+    print("%d paths, %d elements: merged %8.1f ms  pairwise %8.1f ms  (%.2fx)" % (
+        args.paths, args.elements, merged * 1e3, pairwise * 1e3, pairwise / merged))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Conformance of the closure-compiling engine with the tree-walker."""
+
+# stdlib
+import math
+from xml.dom import minidom
+
+# firstparty
+import xpath
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<catalog>"
+    "<section name='books'>"
+    "<item id='b1' price='12.5'><title>Dune</title><tag>sf</tag></item>"
+    "<item id='b2' price='30'><title>Emma</title></item>"
+    "<item id='b3' price='7'><title>Ubik</title><tag>sf</tag><tag>pkd</tag></item>"
+    "</section>"
+    "<section name='music'>"
+    "<item id='m1' price='15'><title>Kind of Blue</title></item>"
+    "<!-- sold out --><?stock none?>"
+    "</section>"
+    "<meta cutoff='10'/>"
+    "</catalog>"
+)
+
+CORPUS = [
+    # Literals, variables and arithmetic
+    "'text'",
+    "42",
+    "$limit",
+    "$items",
+    "$undefined",
+    "1 + 2 * 3 - 4 div 5",
+    "7 mod 3",
+    "5 mod 0",
+    "1 div 0",
+    "-$limit",
+    "-(-$limit)",
+    "$limit + 'x'",
+    # Comparisons and booleans
+    "$limit = 10",
+    "$limit != '10'",
+    "$limit < 20 and $limit >= 10",
+    "$limit > 20 or $limit <= 1",
+    "$items = 'Dune'",
+    "//item/@price > 20",
+    "20 < //item/@price",
+    "//item/@price = //meta/@cutoff",
+    "true() = 'x'",
+    "not(//item[@id = 'zz'])",
+    # Functions
+    "count(//item)",
+    "sum(//item/@price)",
+    "concat(//title, '-', $limit)",
+    "string-length(//title[2])",
+    "substring('abcdef', 2, 3)",
+    "translate('abc', 'b', 'B')",
+    "normalize-space('  a  b  ')",
+    "round(2.5) + floor(-0.5) + ceiling(0.5)",
+    "boolean(//tag)",
+    "number('12')",
+    "name(//*[@id = 'm1'])",
+    "local-name(/*)",
+    "unknown-function()",
+    "substring()",
+    # Location paths
+    "/",
+    "/catalog",
+    "/catalog/section/item",
+    "/catalog/section[2]/item/title",
+    "//item",
+    "//item[@price > 10]",
+    "//item[2]",
+    "//item[last()]",
+    "//item[position() < 3]/@id",
+    "//item[tag = 'sf'][2]",
+    "//section//title",
+    "//section//item[1]",
+    "//@id",
+    "//comment()",
+    "//processing-instruction('stock')",
+    "//text()",
+    "/catalog/section/..",
+    "//title/ancestor::section/@name",
+    "//item[@id = 'b2']/following::item",
+    "//item[@id = 'b3']/preceding::title[1]",
+    "//item[@id = 'b2']/preceding-sibling::*",
+    "//tag/parent::item/@id",
+    "//item[@price > //meta/@cutoff]/@id",
+    "$items/tag",
+    "$items[2]",
+    "($items | //section)[1]",
+    "$items//text()",
+    "//section[count(item) > 1]/@name",
+    "//item[not(tag)]",
+    "//item[string(@price) = '30']/title",
+    "id('b1')",
+]
+
+
+def Evaluate(tree):
+    context = Context.Context(DOCUMENT.documentElement, 1, 1)
+    context.varBindings = {
+        (None, "limit"): 10.0,
+        (None, "items"): DOCUMENT.getElementsByTagName("item")[:3],
+    }
+    try:
+        return Value(tree.evaluate(context))
+    except Exception as error:
+        return error.__class__
+
+
+def Value(result):
+    if type(result) is float and math.isnan(result):
+        return "NaN"
+    if type(result) is list:
+        return [id(node) for node in result]
+    return result
+
+
+@pytest.mark.parametrize("expr", CORPUS)
+def test_closures_evaluate_like_trees(expr):
+    # Trees cache the functions they call, so each engine gets its own
+    tree = TableParser.ExprParser().parse(expr)
+    compiled = ClosureCompiler.Compile(TableParser.ExprParser().parse(expr))
+    assert Evaluate(compiled) == Evaluate(tree)
+    optimized = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+    compiled = ClosureCompiler.Compile(Optimizer.Optimize(TableParser.ExprParser().parse(expr)))
+    assert Evaluate(compiled) == Evaluate(optimized)
+
+
+def test_compiled_expressions_are_reusable():
+    compiled = ClosureCompiler.Compile(TableParser.ExprParser().parse("//item[@price > $limit]"))
+    first = Evaluate(compiled)
+    assert len(first) == 3
+    assert Evaluate(compiled) == first
+
+
+def test_engine_is_selected_per_expression():
+    compiled = xpath.Compile("count(//item)", engine="closure")
+    assert isinstance(compiled, ClosureCompiler.CompiledExpression)
+    assert compiled.evaluate(Context.Context(DOCUMENT, 1, 1)) == 4
+    assert not isinstance(xpath.Compile("count(//item)"), ClosureCompiler.CompiledExpression)
+    with pytest.raises(ValueError):
+        xpath.Compile("1", engine="jit")
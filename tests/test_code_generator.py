@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.CodeGenerator` and the modules it writes."""
+
+# stdlib
+import os
+import subprocess
+import sys
+
+# firstparty
+from xpath import CodeGenerator
+from xpath import CompiledModule
+from xpath import Optimizer
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+# localfolder
+from test_closure_compiler import CORPUS
+from test_closure_compiler import Evaluate
+
+
+
+def Generate(tmp_path, name, expressions):
+    CodeGenerator.Write(str(tmp_path / (name + ".py")), expressions)
+    sys.path.insert(0, str(tmp_path))
+    try:
+        return CompiledModule.Load(name, expressions)
+    finally:
+        sys.path.remove(str(tmp_path))
+        sys.modules.pop(name, None)
+
+
+def test_generated_code_evaluates_like_trees(tmp_path):
+    module = Generate(tmp_path, "corpus_rules", CORPUS)
+    assert sorted(module.EXPRESSIONS) == sorted(CORPUS)
+    for expr in CORPUS:
+        tree = Optimizer.Optimize(TableParser.ExprParser().parse(expr))
+        assert Evaluate(module.EXPRESSIONS[expr]) == Evaluate(tree), expr
+
+
+def test_rule_files(tmp_path):
+    rules = tmp_path / "rules.txt"
+    rules.write_text("# Catalog rules\n\n//item[@price > 10]\n  count(//item)  \n")
+    assert CompiledModule.ReadRules(str(rules)) == ["//item[@price > 10]", "count(//item)"]
+    module = tmp_path / "rules.py"
+    assert CodeGenerator.main([str(rules), str(module)]) == 0
+    assert "from rules.txt" in module.read_text()
+    rules.write_text("//item[\n")
+    assert CodeGenerator.main([str(rules), str(module)]) == 1
+
+
+def test_other_rules_are_stale(tmp_path):
+    Generate(tmp_path, "stale_rules", ["count(//item)"])
+    sys.path.insert(0, str(tmp_path))
+    try:
+        with pytest.raises(CompiledModule.StaleModuleError):
+            CompiledModule.Load("stale_rules", ["count(//item)", "//title"])
+        assert CompiledModule.Load("stale_rules").EXPRESSIONS
+    finally:
+        sys.path.remove(str(tmp_path))
+        sys.modules.pop("stale_rules", None)
+
+
+def test_other_library_version_is_stale(tmp_path, monkeypatch):
+    path = tmp_path / "old_rules.py"
+    CodeGenerator.Write(str(path), ["count(//item)"])
+    monkeypatch.setattr(CompiledModule, "LIBRARY_VERSION", "0.0.0-other")
+    with pytest.raises(CompiledModule.StaleModuleError):
+        exec(compile(path.read_text(), str(path), "exec"), {"__name__": "old_rules"})
+
+
+def test_import_does_not_load_the_parser(tmp_path):
+    CodeGenerator.Write(str(tmp_path / "worker_rules.py"), CORPUS)
+    code = "import sys, worker_rules; print(' '.join(sorted(sys.modules)))"
+    path = [str(tmp_path)] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path))
+    env.pop("XPATH_EAGER_INIT", None)
+    output = subprocess.check_output([sys.executable, "-c", code], env=env)
+    modules = output.decode().split()
+    for name in ["pyxpath", "XPathGrammar", "XPathParser", "yappsrt", "TableParser"]:
+        assert not [module for module in modules
+                    if module.rsplit(".", 1)[-1] == name and "xpath" in module]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.CommonSubexpressions`."""
+
+# stdlib
+from xml.dom import minidom
+
+# firstparty
+import xpath
+from xpath import ClosureCompiler
+from xpath import CommonSubexpressions
+from xpath import Context
+from xpath import CoreFunctions
+from xpath import Optimizer
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<orders type='retail'>"
+    "<order id='o1'><line qty='1'/><line qty='2'/></order>"
+    "<order id='o2'><line qty='5'/><line qty='4'/><line qty='3'/><line qty='9'/></order>"
+    "<order id='o3' type='bulk'><line qty='20'/><line qty='1'/><line qty='1'/><line qty='1'/></order>"
+    "</orders>"
+)
+
+EXPRESSIONS = [
+    "//order[count(line) > 3 and sum(line/@qty) > count(line) * 2]/@id",
+    "//line[string(../../@type) = 'retail' or string(../../@type) = 'bulk']/@qty",
+    "//order[line[@qty > count(../line)]][count(line) > 2]/@id",
+    "//line[position() * 2 > last()][position() * 2 > last()]/@qty",
+    "sum(//line/@qty) div count(//line) + sum(//line/@qty)",
+    "count(//order) = 3",
+]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+def Evaluate(tree):
+    result = tree.evaluate(Context.Context(DOCUMENT, 1, 1))
+    if type(result) is list:
+        return [node.value for node in result]
+    return result
+
+
+@pytest.mark.parametrize("expr", EXPRESSIONS)
+def test_eliminated_trees_evaluate_alike(expr):
+    optimized = Optimizer.Optimize(Parse(expr))
+    eliminated = CommonSubexpressions.Eliminate(Optimizer.Optimize(Parse(expr)))
+    expected = Evaluate(optimized)
+    assert Evaluate(eliminated) == expected
+    compiled = ClosureCompiler.Compile(CommonSubexpressions.Eliminate(Optimizer.Optimize(Parse(expr))))
+    assert Evaluate(compiled) == expected
+
+
+def test_occurrences_share_one_node():
+    tree = xpath.Compile("//order[count(line) > 3 and sum(line/@qty) > count(line) * 2]")
+    assert isinstance(tree, CommonSubexpressions.ParsedCommonScope)
+    pred = tree._expr._child._predicates._predicates[0]
+    assert pred._left._left is pred._right._right._left
+    assert isinstance(pred._left._left, CommonSubexpressions.ParsedCommonExpr)
+    # Without repeats the tree is left alone
+    assert not isinstance(xpath.Compile("//order[count(line) > 3]"),
+                          CommonSubexpressions.ParsedCommonScope)
+
+
+def test_shared_values_are_computed_once_per_context_node(monkeypatch):
+    calls = []
+    count = CoreFunctions.Count
+
+    def Count(context, nodeSet):
+        calls.append(context.node)
+        return count(context, nodeSet)
+
+    monkeypatch.setitem(CoreFunctions.CoreFunctions, (None, "count"), Count)
+    expr = "//order[count(line) > 1 and count(line) < 5 and count(line) != 3]/@id"
+    tree = CommonSubexpressions.Eliminate(Optimizer.Optimize(Parse(expr)))
+    assert Evaluate(tree) == ["o1", "o2", "o3"]
+    assert len(calls) == 3 and len(set(calls)) == 3
+    # The values are forgotten between evaluations
+    Evaluate(tree)
+    assert len(calls) == 6
+
+
+def test_impure_extension_functions_are_not_shared(monkeypatch):
+    key = (None, "tick")
+    monkeypatch.setitem(xpath.g_extFunctions, key, lambda context, nodeSet: 1.0)
+    expr = "//order[number(tick(line)) + number(tick(line)) = 2]"
+    assert not isinstance(xpath.Compile(expr), CommonSubexpressions.ParsedCommonScope)
+    monkeypatch.setattr(xpath.g_extFunctions, "pure", {key})
+    assert isinstance(xpath.Compile(expr), CommonSubexpressions.ParsedCommonScope)
+    # Prefixed calls are never shared
+    tree = Optimizer.Optimize(Parse("ext:f(1) + ext:f(1)"))
+    assert not CommonSubexpressions.IsPure(tree._left)
+
+
+def test_builtin_pure_extension_functions():
+    xpath.g_extFunctions.load()
+    assert (xpath.FT_EXT_NAMESPACE, "escape-url") in xpath.g_extFunctions.pure
+    assert (xpath.FT_EXT_NAMESPACE, "generate-uuid") not in xpath.g_extFunctions.pure
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.CompiledStore`."""
+
+# firstparty
+import xpath
+from xpath import CompiledStore
+from xpath import pyxpath
+from xpath.ExpressionCache import ExpressionCache
+
+# thirdparty
+import pytest
+
+
+
+EXPRESSIONS = ["/a/b[@c = 'd']", "count(//x) + 1", "concat($v, 'x', 1, 2)", "a | b"]
+
+
+def test_round_trip_without_parser(tmp_path):
+    path = str(tmp_path / "rules.xpc")
+    factory = pyxpath.ExprParserFactory
+    assert CompiledStore.Write(path, EXPRESSIONS * 2, factory) == len(EXPRESSIONS)
+    store = CompiledStore.CompiledStore(path)
+    for expr in EXPRESSIONS:
+        assert (expr, "expr") in store
+        assert repr(store.get(expr, "expr")) == repr(factory.new().parse(expr))
+    assert store.get(EXPRESSIONS[0], "pattern") is None
+    assert store.get("not/stored", "expr") is None
+    assert (store.hits, store.misses) == (len(EXPRESSIONS), 2)
+    store.close()
+
+
+def test_loaded_function_calls_rebind(tmp_path):
+    path = str(tmp_path / "rules.xpc")
+    CompiledStore.Write(path, ["count(a)"], pyxpath.ExprParserFactory)
+    store = CompiledStore.CompiledStore(path)
+    assert store.get("count(a)", "expr")._func is None
+    store.close()
+
+
+def test_other_library_version_is_stale(tmp_path, monkeypatch):
+    path = str(tmp_path / "rules.xpc")
+    CompiledStore.Write(path, EXPRESSIONS, pyxpath.ExprParserFactory)
+    monkeypatch.setattr(CompiledStore, "LIBRARY_VERSION", "0.0.0-other")
+    store = CompiledStore.CompiledStore(path)
+    assert store.stale
+    assert len(store) == 0
+    assert store.get(EXPRESSIONS[0], "expr") is None
+    store.close()
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "rules.xpc"
+    path.write_bytes(b"not a store at all, just some bytes")
+    with pytest.raises(CompiledStore.StoreError):
+        CompiledStore.CompiledStore(str(path))
+
+
+def test_expression_cache_loads_misses_from_store(tmp_path):
+    path = str(tmp_path / "rules.xpc")
+    CompiledStore.Write(path, ["a/b"], pyxpath.ExprParserFactory)
+    cache = ExpressionCache(4, CompiledStore.CompiledStore(path))
+    first = cache.compile("a/b", pyxpath.ExprParserFactory)
+    assert cache.compile("a/b", pyxpath.ExprParserFactory) is first
+    assert cache.store.hits == 1
+    cache.compile("c", pyxpath.ExprParserFactory)
+    assert cache.store.misses == 1
+    cache.store.close()
+
+
+def test_stale_store_is_attached(tmp_path, monkeypatch):
+    path = str(tmp_path / "rules.xpc")
+    CompiledStore.Write(path, EXPRESSIONS, pyxpath.ExprParserFactory)
+    monkeypatch.setattr(CompiledStore, "LIBRARY_VERSION", "0.0.0-other")
+    store = xpath.UseCompiledStore(path)
+    try:
+        assert store is not None and store.stale
+        assert xpath.g_expressionCache.store is store
+    finally:
+        xpath.UseCompiledStore(None)
+    assert xpath.g_expressionCache.store is None
+
+
+def test_replaced_store_stays_readable(tmp_path):
+    path = str(tmp_path / "rules.xpc")
+    CompiledStore.Write(path, EXPRESSIONS, pyxpath.ExprParserFactory)
+    old = xpath.UseCompiledStore(path)
+    try:
+        new = xpath.UseCompiledStore(path)
+        assert xpath.g_expressionCache.store is new
+        assert old.get(EXPRESSIONS[0], "expr") is not None
+    finally:
+        xpath.UseCompiledStore(None)
+    old.close()
+    assert old.get(EXPRESSIONS[0], "expr") is None
+    assert repr(old.compile(EXPRESSIONS[0], pyxpath.ExprParserFactory)) == repr(
+        pyxpath.ExprParserFactory.new().parse(EXPRESSIONS[0]))
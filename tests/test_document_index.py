@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.DocumentIndex`."""
+
+# stdlib
+import gc
+import random
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import DocumentIndex
+from xpath import ParsedAxisSpecifier
+from xpath import Util
+
+
+
+def Document():
+    return minidom.parseString("<doc id='d'><a id='a1'><b id='b1'/></a><c id='c1'/></doc>")
+
+
+def Ids(nodes):
+    return [node.getAttribute("id") for node in nodes]
+
+
+def test_ranks_are_in_document_order():
+    doc = Document()
+    ranks = DocumentIndex.Ranks(doc)
+    a = doc.getElementsByTagName("a")[0]
+    order = [doc, doc.documentElement, doc.documentElement.getAttributeNode("id"),
+             a, a.getAttributeNode("id"), a.firstChild]
+    assert [ranks[id(node)] for node in order] == list(range(6))
+
+
+def test_indexes_go_away_with_their_documents():
+    registry = DocumentIndex.DocumentIndexRegistry()
+    doc = Document()
+    index = registry.get(doc)
+    assert registry.get(doc) is index
+    assert len(registry) == 1
+    del doc, index
+    gc.collect()
+    assert len(registry) == 0
+    # A document at the same address gets an index of its own
+    for count in range(20):
+        doc = Document()
+        assert registry.get(doc).ranks == DocumentIndex.Ranks(doc)
+    assert registry.stats()["builds"] == 21
+
+
+def test_structured_indexes_go_away_with_their_documents():
+    registry = DocumentIndex.DocumentIndexRegistry()
+    docs = [Document() for count in range(5)]
+    for doc in docs:
+        assert registry.indexStructure(doc).nodes[0] is doc
+    assert len(registry) == 5
+    del docs, doc
+    gc.collect()
+    assert len(registry) == 0
+
+
+def test_changed_documents_are_numbered_anew():
+    registry = DocumentIndex.DocumentIndexRegistry()
+    doc = Document()
+    index = registry.get(doc)
+    root = doc.documentElement
+    root.appendChild(root.firstChild)
+    registry.changed(doc)
+    assert registry.version(doc) == 1
+    assert registry.get(doc) is not index
+    assert registry.get(doc).version == 1
+    stats = registry.stats()
+    assert (stats["builds"], stats["invalidations"]) == (2, 1)
+
+
+def test_sorting_follows_changes():
+    doc = Document()
+    nodes = doc.getElementsByTagName("*")
+    assert Ids(Util.SortDocOrder(nodes[::-1])) == ["d", "a1", "b1", "c1"]
+    root = doc.documentElement
+    root.appendChild(root.firstChild)
+    Util.DocumentChanged(doc)
+    assert Ids(Util.SortDocOrder(nodes[::-1])) == ["d", "c1", "a1", "b1"]
+    # Nodes added since are noticed without being reported
+    root.appendChild(doc.createElement("e")).setAttribute("id", "e1")
+    nodes = doc.getElementsByTagName("*")
+    assert Ids(Util.SortDocOrder(nodes[::-1])) == ["d", "c1", "a1", "b1", "e1"]
+
+
+def test_memory_report():
+    registry = DocumentIndex.DocumentIndexRegistry()
+    assert registry.stats()["bytes"] == 0
+    doc = Document()
+    registry.get(doc)
+    stats = registry.stats()
+    assert (stats["documents"], stats["nodes"]) == (1, 9)
+    assert stats["bytes"] > 9 * 8
+    registry.free(doc)
+    assert registry.stats()["documents"] == 0
+
+
+def test_sorting_attributes_and_namespaces():
+    doc = minidom.parseString(
+        "<doc xmlns:p='urn:p' id='d'><a id='a1' xmlns:q='urn:q'><b id='b1'/></a></doc>")
+    a = doc.getElementsByTagName("a")[0]
+    (b,) = a.getElementsByTagName("b")
+    namespaces = ParsedAxisSpecifier.ParsedAxisSpecifier("namespace").select(
+        Context.Context(a, 1, 1), lambda context, node, principalType: 1)[0]
+    assert sorted(node.nodeName for node in namespaces) == ["p", "q", "xml"]
+    nodes = [b, b.getAttributeNode("id"), a.getAttributeNode("id")] + namespaces + [a, doc]
+    result = Util.SortDocOrder(nodes)
+    assert result[:2] == [doc, a]
+    assert [node.nodeName for node in result[2:5]] == ["p", "q", "xml"]
+    assert result[5:] == [a.getAttributeNode("id"), b, b.getAttributeNode("id")]
+
+
+def test_sorting_several_documents():
+    (first, second) = (Document(), Document())
+    Util.IndexDocument(first)
+    Util.IndexDocument(second)
+    nodes = second.getElementsByTagName("*")[::-1] + first.getElementsByTagName("*")[::-1]
+    result = Util.SortDocOrder(nodes)
+    assert result[:4] == first.getElementsByTagName("*")
+    assert result[4:] == second.getElementsByTagName("*")
+
+
+def test_sorting_by_rank_and_by_key_agree(monkeypatch):
+    doc = minidom.parseString("<doc>%s</doc>" % ("<e a='1'><f/></e>" * 50))
+    nodes = doc.getElementsByTagName("*")
+    nodes = nodes + [node.getAttributeNode("a") for node in nodes if node.hasAttribute("a")]
+    random.Random(0).shuffle(nodes)
+    placed = Util.SortDocOrder(nodes)
+    assert [node.nodeName for node in placed[:4]] == ["doc", "e", "a", "f"]
+    # Repeated nodes are kept
+    assert len(Util.SortDocOrder(nodes + nodes)) == 2 * len(nodes)
+    monkeypatch.setattr(Util, "BUCKET_RATIO", 0)
+    assert Util.SortDocOrder(nodes) == placed
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.ExpressionCache`."""
+
+# firstparty
+import xpath
+from xpath.ExpressionCache import ExpressionCache
+
+
+
+class CountingParser:
+    def __init__(self, factory):
+        self.factory = factory
+
+    def parse(self, expr):
+        self.factory.parsed.append(expr)
+        return ("parsed", self.factory.flavor, expr)
+
+
+class CountingFactory:
+    def __init__(self, flavor):
+        self.flavor = flavor
+        self.parsed = []
+
+    def new(self):
+        return CountingParser(self)
+
+
+def test_hit_reuses_compiled_expression():
+    """A second compile of the same text must not re-parse."""
+    cache = ExpressionCache(4)
+    factory = CountingFactory("expr")
+    first = cache.compile("a/b", factory)
+    assert cache.compile("a/b", factory) is first
+    assert factory.parsed == ["a/b"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_parser_flavor_is_part_of_key():
+    """The same text compiled by different parser factories is kept apart."""
+    cache = ExpressionCache(4)
+    exprs = CountingFactory("expr")
+    patterns = CountingFactory("pattern")
+    assert cache.compile("a", exprs) != cache.compile("a", patterns)
+    assert exprs.parsed == patterns.parsed == ["a"]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ExpressionCache(2)
+    factory = CountingFactory("expr")
+    cache.compile("a", factory)
+    cache.compile("b", factory)
+    cache.compile("a", factory)
+    cache.compile("c", factory)
+    cache.compile("a", factory)
+    assert factory.parsed == ["a", "b", "c"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_zero_size_disables_caching():
+    cache = ExpressionCache(0)
+    factory = CountingFactory("expr")
+    cache.compile("a", factory)
+    cache.compile("a", factory)
+    assert factory.parsed == ["a", "a"]
+
+
+def test_compile_simplifies_trees_of_any_cache():
+    for expr in ["1 + 2", "//a[1 = 1]/b", "count(//a) * 2"]:
+        expected = repr(xpath.Compile(expr))
+        assert repr(xpath.Compile(expr, cache=True)) == expected
+        assert repr(xpath.Compile(expr, cache=ExpressionCache())) == expected
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for structural equality and interning of expression trees."""
+
+# stdlib
+import pickle
+
+# firstparty
+from xpath import pyxpath
+from xpath import TableParser
+
+
+
+def Parse(expr, factory=None):
+    return TableParser.ExprParser(factory).parse(expr)
+
+
+def test_structurally_equal_trees_compare_and_hash_equal():
+    first = Parse("//item[@id = $x]/text() | string(.)")
+    second = Parse("//item[@id = $x]/text() | string(.)")
+    assert first is not second
+    assert first == second
+    assert hash(first) == hash(second)
+    assert first != Parse("//item[@id = $y]/text() | string(.)")
+
+
+def test_interning_shares_equal_subexpressions():
+    factory = pyxpath.InterningFtFactory()
+    first = Parse("a[@id = 'x']/text()", factory)
+    second = Parse("b[@id = 'x']/text()", factory)
+    assert first._left._nodeTest is not second._left._nodeTest
+    assert first._left._predicates is second._left._predicates
+    assert first._right is second._right
+    assert Parse("a[@id = 'x']/text()", factory) is first
+
+
+def test_prefixed_function_calls_are_not_shared():
+    factory = pyxpath.InterningFtFactory()
+    first = Parse("ext:f(@id)", factory)
+    second = Parse("ext:f(@id)", factory)
+    assert first is not second
+    assert first != second
+    assert first._args[0] is second._args[0]
+
+
+def test_pickled_trees_drop_cached_hash():
+    tree = Parse("count(//a) + 1")
+    hash(tree)
+    clone = pickle.loads(pickle.dumps(tree))
+    assert "_hash" not in vars(clone)
+    assert clone == tree
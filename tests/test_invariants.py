@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.Invariants`."""
+
+# stdlib
+from xml.dom import minidom
+
+# firstparty
+import xpath
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import CoreFunctions
+from xpath import Invariants
+from xpath import Optimizer
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+def Document(cutoff, values):
+    rows = "".join(["<row v='%s'/>" % value for value in values])
+    return minidom.parseString("<doc><meta cutoff='%s'/>%s</doc>" % (cutoff, rows))
+
+
+DOCUMENT = Document(3, [1, 5, 2, 7, 3, 4])
+OTHER = Document(6, [5, 9])
+
+EXPRESSIONS = [
+    "//row[@v > /doc/meta/@cutoff]/@v",
+    "//row[@v > $limit * 2 or @v = count(//row)]/@v",
+    "//row[position() > last() - count(/doc/meta)]/@v",
+    "//row[@v = //row[@v > /doc/meta/@cutoff]/@v][1]/@v",
+    "//row[. = /doc/row[1]/following-sibling::row/@x or @v > sum(/doc/row/@v) div 10]/@v",
+    "//row[@v > string-length(/doc/meta/@cutoff) + 1]/@v",
+    "$rows[@v > /doc/meta/@cutoff]/@v",
+]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+def Evaluate(tree):
+    context = Context.Context(DOCUMENT, 1, 1)
+    context.varBindings = {
+        (None, "limit"): 1.0,
+        (None, "rows"): OTHER.getElementsByTagName("row") + DOCUMENT.getElementsByTagName("row"),
+    }
+    result = tree.evaluate(context)
+    if type(result) is list:
+        return [node.value for node in result]
+    return result
+
+
+@pytest.mark.parametrize("expr", EXPRESSIONS)
+def test_hoisted_trees_evaluate_alike(expr):
+    expected = Evaluate(Optimizer.Optimize(Parse(expr)))
+    hoisted = Invariants.Hoist(Optimizer.Optimize(Parse(expr)))
+    assert hoisted is not Optimizer.Optimize(Parse(expr))
+    assert Evaluate(hoisted) == expected
+    assert Evaluate(ClosureCompiler.Compile(Invariants.Hoist(Optimizer.Optimize(Parse(expr))))) == expected
+    assert Evaluate(xpath.Compile(expr)) == expected
+
+
+def test_dependencies():
+    def Dependencies(expr):
+        return Invariants.Dependencies(Optimizer.Optimize(Parse(expr)))
+
+    assert Dependencies("1 + 2") == 0
+    assert Dependencies("$x * 2") == Invariants.VARIABLES
+    assert Dependencies("@v") == Invariants.NODE
+    assert Dependencies("position() < last()") == Invariants.POSITION | Invariants.SIZE
+    assert Dependencies("/doc/row[@v > $x]") == Invariants.DOCUMENT | Invariants.VARIABLES
+    assert Dependencies("count(//row[position() = 2])") == Invariants.DOCUMENT
+    assert Dependencies("string()") == Invariants.NODE
+    assert Dependencies("string(/doc)") == Invariants.DOCUMENT
+    assert Dependencies("$rows/row[last()]") == Invariants.VARIABLES
+    assert Dependencies("ext:f(1)") == Invariants.EVERYTHING
+
+
+def test_invariants_are_evaluated_once(monkeypatch):
+    calls = []
+    count = CoreFunctions.Count
+
+    def Count(context, nodeSet):
+        calls.append(context.node)
+        return count(context, nodeSet)
+
+    monkeypatch.setitem(CoreFunctions.CoreFunctions, (None, "count"), Count)
+    tree = xpath.Compile("//row[@v * 2 > count(//row)]/@v")
+    assert Evaluate(tree) == ["5", "7", "4"]
+    assert len(calls) == 1
+    Evaluate(tree)
+    assert len(calls) == 2
+
+
+def test_node_sets_are_handed_out_as_copies():
+    tree = Invariants.ParsedInvariantExpr(Optimizer.Optimize(Parse("/doc/row")))
+    context = Context.Context(DOCUMENT, 1, 1)
+    context.commonValues = {}
+    first = tree.evaluate(context)
+    first.pop()
+    assert len(tree.evaluate(context)) == 6
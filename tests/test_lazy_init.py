@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the deferred initialization of `xpath`."""
+
+# stdlib
+import os
+import subprocess
+import sys
+
+# firstparty
+import xpath
+
+
+
+def test_import_defers_parser_and_extension_functions():
+    code = "import sys, xpath; print(' '.join(sorted(sys.modules)))"
+    env = dict(os.environ)
+    env.pop("XPATH_EAGER_INIT", None)
+    output = subprocess.check_output([sys.executable, "-c", code], env=env)
+    modules = output.decode().split()
+    for name in ["pyxpath", "ParsedExpr", "XPathGrammar", "BuiltInExtFunctions"]:
+        assert "xpath." + name not in modules
+    assert "urllib.request" not in modules
+
+
+def test_registered_functions_take_precedence_over_builtins():
+    registry = xpath.ExtFunctionRegistry()
+    key = (xpath.FT_EXT_NAMESPACE, "escape-url")
+    func = lambda context, url: url
+    registry[key] = func
+    assert registry.get(key) is func
+    assert (xpath.FT_EXT_NAMESPACE, "version") in registry
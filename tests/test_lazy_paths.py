@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for selecting the nodes of location paths one at a time."""
+
+# stdlib
+from xml.dom import minidom
+
+# firstparty
+import xpath
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import Conversions
+from xpath import Optimizer
+from xpath import ParsedExpr
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<doc id='d'><sec id='s1'><p id='p1'>x</p><p id='p2'>y<b id='b1'/></p></sec>"
+    "<sec id='s2'><p id='p3'>z</p><title id='t1'>T</title></sec><title id='t2'>U</title></doc>"
+)
+
+PATHS = [
+    "//p",
+    "/doc/sec/p",
+    "//sec[p]/@id",
+    "//sec[p = 'z']/p",
+    "//sec/descendant::*",
+    "/doc/sec[1]/following::*",
+    "//p[1]/following-sibling::*",
+    "//@id/following::title",
+    "//p/ancestor::*",
+    "(//sec)/p",
+    "$secs/p",
+]
+
+VALUES = [
+    ("boolean(//b)", 1),
+    ("not(//q)", 1),
+    ("//q or //title", 1),
+    ("//p and //q", 0),
+    ("string(//title)", "T"),
+    ("number(//sec/@id)", "NaN"),
+    ("string-length(//p)", 1.0),
+    ("//p = 'z'", 1),
+    ("'y' != //p", 0),
+    ("(//p)[2]/@id", ["p2"]),
+    ("(//p)[position() < 3]/@id", ["p1", "p2"]),
+    ("count(//sec[p])", 2.0),
+]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+def NewContext():
+    context = Context.Context(DOCUMENT, 1, 1)
+    context.varBindings = {(None, "secs"): list(DOCUMENT.getElementsByTagName("sec"))}
+    return context
+
+
+def Value(result):
+    if type(result) is list:
+        return [node.nodeName == "id" and node.value or node.getAttribute("id")
+                for node in result]
+    if result != result:
+        return "NaN"
+    return result
+
+
+@pytest.mark.parametrize("expr", PATHS)
+def test_iterated_paths_select_alike(expr):
+    for tree in [Parse(expr), Optimizer.Optimize(Parse(expr)), xpath.Compile(expr)]:
+        expected = Value(tree.evaluate(NewContext()))
+        assert Value(list(tree.iterate(NewContext()))) == expected
+
+
+@pytest.mark.parametrize("expr,expected", VALUES)
+def test_lazy_consumers_evaluate_alike(expr, expected):
+    assert Value(Optimizer.Optimize(Parse(expr)).evaluate(NewContext())) == expected
+    assert Value(ClosureCompiler.Compile(Optimizer.Optimize(Parse(expr))).evaluate(NewContext())) == expected
+    assert Value(xpath.Compile(expr).evaluate(NewContext())) == expected
+
+
+def test_node_sets_tested_for_nodes_become_exists():
+    assert isinstance(Optimizer.Optimize(Parse("boolean(//b)")), ParsedExpr.ParsedExistsExpr)
+    tree = Optimizer.Optimize(Parse("//p and $x"))
+    assert isinstance(tree._left, ParsedExpr.ParsedExistsExpr)
+    assert tree._right.__class__ is ParsedExpr.ParsedVariableReferenceExpr
+    assert repr(Optimizer.Optimize(Parse("not(//q)"))) == "not(boolean(/descendant::q))"
+
+
+def test_consumers_stop_at_the_first_node(monkeypatch):
+    doc = minidom.parseString("<doc>%s</doc>" % ("<item>a</item>" * 1000))
+    calls = []
+    StringValue = Conversions.StringValue
+
+    def Counted(node):
+        calls.append(node)
+        return StringValue(node)
+
+    monkeypatch.setattr(Conversions, "StringValue", Counted)
+    for expr in ["//item = 'a'", "string(//item)", "boolean(//item[. = 'a'])"]:
+        calls[:] = []
+        result = Optimizer.Optimize(Parse(expr)).evaluate(Context.Context(doc, 1, 1))
+        assert result
+        assert len(calls) == 1, expr
+    # Without the optimizer every item is looked at
+    calls[:] = []
+    Parse("//item = 'b'").evaluate(Context.Context(doc, 1, 1))
+    assert len(calls) >= 1000
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for constant folding and simplification of expression trees."""
+
+# stdlib
+import math
+import pickle
+from xml.dom import minidom
+
+# firstparty
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import NaN
+from xpath import Optimizer
+from xpath import ParsedNode
+from xpath import TableParser
+from xpath import Util
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString("<doc><a n='1'>x</a><a n='2'>y</a></doc>")
+
+NESTED = minidom.parseString(
+    "<doc><a n='1'><b/><a n='2'><b/><b n='3'/></a></a><c><a n='4'><b/></a></c></doc>"
+)
+
+PATHS = [
+    "//a",
+    "//b[@n]",
+    "//a[b]",
+    "//a[@n = '2' or @n = '4']",
+    "//a[1]",
+    "//b[last()]",
+    "//a[position() > 1]",
+    "//a[$n]",
+    "//@n",
+    "//a/b",
+    "/doc//b",
+    "//a//b",
+    "//a//b[2]",
+    "$a//b",
+    "$a//b[not(@n)]",
+    "//c//node()",
+]
+
+EXPRESSIONS = [
+    "1 + 2 * 3",
+    "7 mod 3 - 10 div 4",
+    "1 div 0",
+    "-1 div 0",
+    "0 div 0",
+    "5 mod 0",
+    "string(0 div 0)",
+    "string(1 div 0 * 1)",
+    "-0",
+    "-(-0)",
+    "1 - 'abc'",
+    "'abc' = 'abc'",
+    "1 = true()",
+    "(0 div 0) = (0 div 0)",
+    "(0 div 0) != (0 div 0)",
+    "2 < 3 and 3 >= 4",
+    "not(not('x'))",
+    "concat('a', 'b', string(1 + 1))",
+    "substring('12345', 1.5, 2.6)",
+    "translate('bar', 'abc', 'ABC')",
+    "normalize-space('  a   b ')",
+    "round(2.5) + floor(-1.5) + ceiling(0.2)",
+    "string-length('abc') * 2",
+    "boolean('') or count(//a) = 2",
+    "count(//a) = 2 or true()",
+    "count(//a) = 3 and false()",
+    "true() and //a",
+    "false() or //b",
+    "-(-count(//a))",
+    "-(-//a)",
+    "//a[1 + 1]/@n",
+    "//a[position() = 3 - 2]",
+    "//a[string(.) = concat('', 'y')]/@n",
+    "//a[@n = 1 and true()]",
+]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+def Value(result):
+    if type(result) is float and math.isnan(result):
+        return "NaN"
+    if type(result) in (int, float):
+        return (result, math.copysign(1, result))
+    if type(result) is list:
+        return [id(node) for node in result]
+    return result
+
+
+@pytest.mark.parametrize("expr", EXPRESSIONS)
+def test_optimized_trees_evaluate_alike(expr):
+    tree = Parse(expr)
+    expected = Value(tree.evaluate(Context.Context(DOCUMENT, 1, 1)))
+    optimized = Optimizer.Optimize(tree)
+    assert Value(optimized.evaluate(Context.Context(DOCUMENT, 1, 1))) == expected
+
+
+def test_constant_expressions_are_folded():
+    for expr in ["1 + 2 * 3", "concat('a', 'b')", "0 div 0", "not(1 = 2)"]:
+        assert isinstance(Optimizer.Optimize(Parse(expr)), Optimizer.ParsedConstantExpr)
+    assert Optimizer.Optimize(Parse("0 div 0")).evaluate(None) is NaN
+
+
+def test_context_dependent_calls_are_not_folded():
+    for expr in ["position() = 1", "string()", "string-length()", "last() + 1"]:
+        optimized = Optimizer.Optimize(Parse(expr))
+        assert not isinstance(optimized, Optimizer.ParsedConstantExpr)
+
+
+def test_dead_branches_are_removed():
+    assert repr(Optimizer.Optimize(Parse("$x or true()"))) == "true()"
+    assert repr(Optimizer.Optimize(Parse("false() and $x"))) == "false()"
+    assert repr(Optimizer.Optimize(Parse("false() or $x"))) == "boolean($x)"
+    assert repr(Optimizer.Optimize(Parse("$x = 1 and 1 < 2"))) == "$x = 1"
+
+
+def test_double_negations_are_removed():
+    assert repr(Optimizer.Optimize(Parse("-(-$x)"))) == "number($x)"
+    assert repr(Optimizer.Optimize(Parse("-(-count($x))"))) == "count($x)"
+    assert repr(Optimizer.Optimize(Parse("not(not($x))"))) == "boolean($x)"
+    assert repr(Optimizer.Optimize(Parse("not(not($x = 1))"))) == "$x = 1"
+
+
+def test_given_trees_are_not_changed():
+    tree = Parse("//a[@n != $x]/text()")
+    optimized = Optimizer.Optimize(tree)
+    assert optimized == tree
+
+    def Annotated(node):
+        return node.__dict__.get("_annotated") or [child for child in node.children()
+                                                   if Annotated(child)]
+
+    assert Annotated(optimized) and not Annotated(tree)
+    # What the optimizer built is not copied again
+    assert Optimizer.Optimize(optimized) is optimized
+
+
+def test_constants_of_equal_value_and_type_compare_equal():
+    zero = Optimizer.Optimize(Parse("0 * 1"))
+    assert zero == Optimizer.Optimize(Parse("1 - 1"))
+    assert zero != Optimizer.Optimize(Parse("-0 * 1"))
+    assert Optimizer.Optimize(Parse("0 div 0")) == Optimizer.Optimize(Parse("1 mod 0"))
+
+
+def test_pickled_nan_constant_keeps_its_string_value():
+    constant = pickle.loads(pickle.dumps(Optimizer.Optimize(Parse("0 div 0"))))
+    assert constant.evaluate(None) is NaN
+
+
+@pytest.mark.parametrize("expr", PATHS)
+def test_descendant_rewrite_selects_the_same_nodes(expr):
+    def Evaluate(tree):
+        context = Context.Context(NESTED, 1, 1)
+        context.varBindings = {
+            (None, "n"): 2.0,
+            (None, "a"): NESTED.getElementsByTagName("a")[:2],
+        }
+        return tree.evaluate(context)
+
+    tree = Parse(expr)
+    expected = Evaluate(tree)
+    result = Evaluate(Optimizer.Optimize(tree))
+    if tree.__class__.__name__ == "ParsedAbbreviatedAbsoluteLocationPath":
+        # In document order
+        assert result == expected
+    assert len(result) == len(expected)
+    assert set(map(id, result)) == set(map(id, expected))
+
+
+def test_descendant_rewrite_skips_positional_predicates():
+    assert repr(Optimizer.Optimize(Parse("//a[@n]"))) == "/descendant::a[attribute::n]"
+    assert repr(Optimizer.Optimize(Parse("$x//a"))) == "$x/descendant::a"
+    assert repr(Optimizer.Optimize(Parse("b//a[c]"))) == "child::b/descendant::a[child::c]"
+    for expr in ["//a[1]", "//a[last()]", "//a[$n]", "//@a", "//a/b", "b//a[ext:f()]"]:
+        tree = Parse(expr)
+        assert repr(Optimizer.Optimize(tree)) == repr(tree)
+
+
+def test_node_set_properties():
+    def Properties(expr):
+        return Optimizer.Optimize(Parse(expr)).nodeSetProperties
+
+    SIBLINGS = ParsedNode.SIBLINGS
+    SINGLE = ParsedNode.SINGLE
+    NORMAL = ParsedNode.NORMAL
+    assert Properties("a") == NORMAL | SIBLINGS
+    assert Properties("..") == NORMAL | SINGLE | SIBLINGS
+    assert Properties("a[1]") == NORMAL | SINGLE | SIBLINGS
+    assert Properties("preceding::a") == NORMAL
+    assert Properties("namespace::*") == ParsedNode.UNIQUE | SIBLINGS
+    assert Properties("/doc") == NORMAL | SIBLINGS
+    assert Properties("../a") == NORMAL | SIBLINGS
+    assert Properties("a/b") == NORMAL
+    assert Properties("(a | b)[2]") == NORMAL
+    assert Properties("$x") == Properties("$x[1]") == Properties("count(a)") == 0
+
+
+def test_first_node_functions_skip_sorting(monkeypatch):
+    tree = Optimizer.Optimize(Parse("name(//a/@n)"))
+    assert isinstance(tree._arg0, Optimizer.ParsedFirstNodeExpr)
+    assert Optimizer.Optimize(tree) == tree
+    sorted = []
+    monkeypatch.setattr(Util, "SortDocOrder", lambda nodeSet: sorted.append(nodeSet) or nodeSet)
+    assert tree.evaluate(Context.Context(DOCUMENT, 1, 1)) == "n"
+    assert [len(nodeSet) for nodeSet in sorted] == [1]
+    # Unordered node-sets are still sorted
+    tree = Optimizer.Optimize(Parse("local-name($x)"))
+    assert not isinstance(tree._arg0, Optimizer.ParsedFirstNodeExpr)
+
+
+def test_single_node_sets_are_not_merged(monkeypatch):
+    monkeypatch.setattr(Util, "MergeDocOrder", None)
+    context = Context.Context(DOCUMENT, 1, 1)
+    result = Optimizer.Optimize(Parse("/doc/a | /doc/b")).evaluate(context)
+    assert [node.firstChild.data for node in result] == ["x", "y"]
+    result = ClosureCompiler.Compile(Optimizer.Optimize(Parse("/doc/a[2]/text() | /c"))).evaluate(context)
+    assert [node.data for node in result] == ["y"]
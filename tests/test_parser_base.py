@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `xpath.XPathParserBase`."""
+
+# stdlib
+import threading
+
+# firstparty
+from xpath.XPathParserBase import SyntaxException
+from xpath.XPathParserBase import XPathParserBase
+
+# thirdparty
+import pytest
+
+
+
+def test_error_state_is_per_instance():
+    bad = XPathParserBase()
+    good = XPathParserBase()
+    with pytest.raises(SyntaxException):
+        bad.parse("a/b[")
+    assert bad.errorOccured == 1
+    assert repr(good.parse("a/b")[0]) == "child::a/child::b"
+    assert good.errorOccured == 0
+
+
+def test_concurrent_parses():
+    exprs = ["a[%d]/b | c[@n = %d]" % (i, i) for i in range(200)]
+    expected = [repr(XPathParserBase().parse(expr)[0]) for expr in exprs]
+    results = {}
+
+    def Worker(offset):
+        parser = XPathParserBase()
+        for i in range(offset, len(exprs), 4):
+            results[i] = repr(parser.parse(exprs[i])[0])
+
+    workers = [threading.Thread(target=Worker, args=(i,)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert [results[i] for i in range(len(exprs))] == expected
+
+
+def test_invalid_axis_is_a_syntax_error():
+    parser = XPathParserBase()
+    with pytest.raises(SyntaxException):
+        parser.parse("foo::bar")
+    assert parser.errorOccured == 1
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for location paths selecting from many context nodes."""
+
+# stdlib
+import sys
+from xml.dom import minidom
+
+# firstparty
+from xpath import ClosureCompiler
+from xpath import CodeGenerator
+from xpath import CompiledModule
+from xpath import Context
+from xpath import Optimizer
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<doc id='d'><a id='a1'><b id='b1'/><a id='a2'><b id='b2'><b id='b3'/></b></a>"
+    "<b id='b4'/></a><c id='c1'><a id='a3'><b id='b5'/></a></c></doc>"
+)
+
+EXPRESSIONS = [
+    ("//a//b", ["b1", "b2", "b3", "b4", "b5"]),
+    ("//a/b", ["b1", "b2", "b4", "b5"]),
+    ("//b/..", ["a1", "a2", "b2", "a3"]),
+    ("//b/ancestor::a", ["a1", "a2", "a3"]),
+    ("$as//b", ["b1", "b2", "b3", "b4", "b5"]),
+    ("$as/b/b", ["b3"]),
+    ("($as)/descendant::b", ["b1", "b2", "b3", "b4", "b5"]),
+    ("($as)//b/@id", ["b1", "b2", "b3", "b4", "b5"]),
+    ("/doc/a/a/b", ["b2"]),
+    ("/doc//a/following-sibling::*", ["b4", "c1"]),
+    ("//a/descendant-or-self::a", ["a1", "a2", "a3"]),
+]
+
+
+def Evaluate(tree):
+    context = Context.Context(DOCUMENT, 1, 1)
+    # Out of document order
+    context.varBindings = {(None, "as"): list(DOCUMENT.getElementsByTagName("a"))[::-1]}
+    return [node.nodeName == "id" and node.value or node.getAttribute("id")
+            for node in tree.evaluate(context)]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+@pytest.mark.parametrize("expr,expected", EXPRESSIONS)
+def test_paths_are_in_document_order(expr, expected):
+    assert Evaluate(Parse(expr)) == expected
+    assert Evaluate(Optimizer.Optimize(Parse(expr))) == expected
+    assert Evaluate(ClosureCompiler.Compile(Optimizer.Optimize(Parse(expr)))) == expected
+
+
+def test_generated_paths(tmp_path):
+    expressions = [expr for (expr, expected) in EXPRESSIONS]
+    CodeGenerator.Write(str(tmp_path / "path_rules.py"), expressions)
+    sys.path.insert(0, str(tmp_path))
+    try:
+        module = CompiledModule.Load("path_rules", expressions)
+    finally:
+        sys.path.remove(str(tmp_path))
+        sys.modules.pop("path_rules", None)
+    for (expr, expected) in EXPRESSIONS:
+        assert Evaluate(module.EXPRESSIONS[expr]) == expected, expr
+
+
+def test_disjoint_paths():
+    assert Parse("a/b").disjoint()
+    assert Parse("a/b")._concatenate
+    assert not Parse("a/ancestor::b")._concatenate
+    assert not Parse("a//b").disjoint()
+    assert not Parse("a/descendant::b").disjoint()
+    assert Parse("../b").disjoint() and not Parse("../b").subtree()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for stopping axis traversal at positional predicates."""
+
+# stdlib
+from xml.dom import minidom
+
+# firstparty
+from xpath import Context
+from xpath import ParsedPredicateList
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<doc>"
+    "<a id='1'><b id='2'/><c id='3'><b id='4'/></c><b id='5'/></a>"
+    "<a id='6'><c id='7'/><b id='8'><b id='9'><c id='10'/></b></b></a>"
+    "<a id='11'><b id='12'/><b id='13'/><b id='14'/></a>"
+    "</doc>"
+)
+
+CONTEXTS = ["/doc", "/doc/a[2]", "/doc/a[2]/b/b/c", "/doc/a[3]/b[2]"]
+
+STEPS = [
+    "child::*[1]",
+    "child::b[2]",
+    "descendant::b[1]",
+    "descendant::*[3]",
+    "descendant-or-self::*[1]",
+    "descendant-or-self::*[2]",
+    "following-sibling::*[1]",
+    "following::b[2]",
+    "following::*[position() <= 3]",
+    "ancestor::*[1]",
+    "ancestor-or-self::*[2]",
+    "preceding-sibling::*[1]",
+    "preceding::b[1]",
+    "preceding::*[position() < 4]",
+    "preceding::*[3 >= position()]",
+    "preceding::b[position() = 2]",
+    "preceding::*[$n]",
+    "descendant::*[$n][1]",
+    "descendant::*[0]",
+    "descendant::*[1.5]",
+    "descendant::*[position() < 1]",
+    "descendant::*[position() <= 2.5]",
+    "descendant::*[position() < 2.5]",
+    "descendant::*[position() > 2]",
+    "descendant::*[last()]",
+]
+
+
+def Select(contextPath, step):
+    context = Context.Context(DOCUMENT, 1, 1)
+    context.varBindings = {(None, "n"): 2.0}
+    node = TableParser.ExprParser().parse(contextPath).evaluate(context)[0]
+    context.setNodePosSize((node, 1, 1))
+    return TableParser.ExprParser().parse(step).evaluate(context)
+
+
+@pytest.mark.parametrize("contextPath", CONTEXTS)
+@pytest.mark.parametrize("step", STEPS)
+def test_limited_axes_select_the_same_nodes(contextPath, step, monkeypatch):
+    result = Select(contextPath, step)
+    monkeypatch.setattr(
+        ParsedPredicateList.ParsedPredicateList, "positionLimit", lambda self, context: None
+    )
+    assert result == Select(contextPath, step)
+
+
+def test_traversal_stops_at_the_limit():
+    doc = minidom.parseString("<doc>" + "<x/>" * 1000 + "</doc>")
+    step = TableParser.ExprParser().parse("following-sibling::*[1]")
+    calls = []
+    match = step._nodeTest.match
+    step._nodeTest.match = lambda *args: calls.append(1) or match(*args)
+    context = Context.Context(doc.documentElement.firstChild, 1, 1)
+    assert step.evaluate(context) == [doc.documentElement.childNodes[1]]
+    assert len(calls) == 1
+
+
+def test_position_limits():
+    def Limit(expr):
+        step = TableParser.ExprParser().parse(expr)
+        context = Context.Context(DOCUMENT, 1, 1)
+        context.varBindings = {(None, "n"): 3.0, (None, "s"): "x"}
+        return step._predicates.positionLimit(context)
+
+    assert Limit("x[1]") == 1
+    assert Limit("x[$n]") == 3
+    assert Limit("x[position() = 2]") == 2
+    assert Limit("x[position() <= 4]") == 4
+    assert Limit("x[position() < 4]") == 3
+    assert Limit("x[4 > position()]") == 3
+    assert Limit("x[0]") == 0
+    assert Limit("x[position() > 1]") is None
+    assert Limit("x[@a][1]") is None
+    assert Limit("x[$s]") is None
+    assert Limit("x[last()]") is None
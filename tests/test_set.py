@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the node-set operations of `xpath.Set`."""
+
+# stdlib
+import random
+from functools import reduce
+
+# firstparty
+from xpath import Set
+
+# thirdparty
+import pytest
+
+
+
+class Node:
+    """A node that equals any other, so only identity tells them apart"""
+
+    def __eq__(self, other):
+        return True
+
+    __hash__ = object.__hash__
+
+
+NODES = [Node() for n in range(20)]
+
+
+def Sample(count):
+    return [random.choice(NODES) for n in range(count)]
+
+
+def Identities(nodes):
+    return [id(node) for node in nodes]
+
+
+# The list-scanning definitions the operations replaced, with identity
+# for membership
+def _In(node, nodes):
+    return [other for other in nodes if other is node] and 1 or 0
+
+
+def OldNot(original, other):
+    return [x for x in original if not _In(x, other)]
+
+
+def OldUnion(left, right):
+    (loop, compare) = len(left) < len(right) and (left, right) or (right, left)
+    return compare + [x for x in loop if not _In(x, compare)]
+
+
+def OldIntersection(left, right):
+    (loop, compare) = len(left) < len(right) and (left, right) or (right, left)
+    return [x for x in loop if _In(x, compare)]
+
+
+def OldUnique(left):
+    return reduce(lambda rt, x: _In(x, rt) and rt or rt + [x], left, [])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_operations_agree_with_list_scanning(seed):
+    random.seed(seed)
+    left = Sample(random.randrange(15))
+    right = Sample(random.randrange(15))
+    for (new, old) in [(Set.Not, OldNot), (Set.Union, OldUnion), (Set.Intersection, OldIntersection)]:
+        assert Identities(new(left, right)) == Identities(old(left, right))
+    assert Identities(Set.Unique(left)) == Identities(OldUnique(left))
+
+
+def test_results_are_new_lists():
+    nodes = NODES[:3]
+    for result in [Set.Not(nodes, []), Set.Union(nodes, []), Set.Union([], nodes), Set.Unique(nodes)]:
+        assert result == nodes and result is not nodes
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for structural indexes of documents, `xpath.DocumentIndex.StructureIndex`."""
+
+# stdlib
+from xml.dom import minidom
+
+# firstparty
+import xpath
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import Optimizer
+from xpath import ParsedExpr
+from xpath import ParsedNodeTest
+from xpath import RuntimeException
+from xpath import TableParser
+from xpath import Util
+
+# thirdparty
+import pytest
+
+
+
+TEXT = (
+    "<doc id='d'><a id='a1'><b id='b1'/><a id='a2'><b id='b2'><b id='b3'/></b>text</a>"
+    "<b id='b4'/></a><!-- c --><c id='c1'><a id='a3'><b id='b5'/></a></c><?pi x?></doc>"
+)
+
+EXPRESSIONS = [
+    "//b",
+    "//a//b",
+    "//a/descendant::b/@id",
+    "//a/descendant-or-self::node()",
+    "//b[@id = 'b2']/following::node()",
+    "//b[@id = 'b3']/preceding::*",
+    "//@id[. = 'b2']/following::b",
+    "//@id[. = 'a3']/preceding::b",
+    "//a//b[1]",
+    "//a/descendant::b[last()]",
+    "(//b)[2]/following::*[1]",
+    "//c/preceding::*[1]",
+    "//a//@id",
+    "//a//descendant-or-self::a",
+    "count(//a//b)",
+    "$as//b",
+]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+def Evaluate(tree, doc):
+    context = Context.Context(doc, 1, 1)
+    context.varBindings = {(None, "as"): list(doc.getElementsByTagName("a"))}
+    result = tree.evaluate(context)
+    if type(result) is list:
+        return [node.nodeType for node in result], [
+            getattr(node, "value", None) or getattr(node, "data", None)
+            or node.getAttribute("id") for node in result]
+    return result
+
+
+@pytest.mark.parametrize("expr", EXPRESSIONS)
+def test_indexed_documents_evaluate_alike(expr):
+    (plain, indexed) = (minidom.parseString(TEXT), minidom.parseString(TEXT))
+    Util.IndexStructure(indexed)
+    for tree in [Parse(expr), Optimizer.Optimize(Parse(expr)), xpath.Compile(expr),
+                 ClosureCompiler.Compile(Optimizer.Optimize(Parse(expr)))]:
+        assert Evaluate(tree, indexed) == Evaluate(tree, plain)
+
+
+def test_numbering():
+    doc = minidom.parseString(TEXT)
+    structure = Util.IndexStructure(doc)
+    nodes = structure.nodes
+    assert nodes == Util.SortDocOrder(nodes[::-1])
+    (a1, a2, a3) = doc.getElementsByTagName("a")
+    (b1, b2, b3, b4, b5) = doc.getElementsByTagName("b")
+    assert structure.isAncestor(a1, b3) and structure.isAncestor(doc, b5)
+    assert structure.isAncestor(a1, a1.getAttributeNode("id"))
+    assert not structure.isAncestor(a2, b4) and not structure.isAncestor(b3, b3)
+    assert structure.isFollowing(b3, b4) and structure.isFollowing(a1, a3)
+    assert not structure.isFollowing(a1, b4) and not structure.isFollowing(b4, b3)
+    (start, end) = structure.descendantRange(a2)
+    assert [node for node in nodes[start:end] if node.nodeType == node.ELEMENT_NODE] == [b2, b3]
+    for (pre, node) in enumerate(nodes):
+        parent = structure.parent[pre]
+        if parent >= 0:
+            assert nodes[parent] is (getattr(node, "ownerElement", None) or node.parentNode)
+            assert structure.level[pre] == structure.level[parent] + 1
+    assert structure.outermost([a1, b2, b3, b4, a3, b5]) == [a1, a3]
+    assert structure.outermost([b2, a1]) is None
+
+
+def test_nested_context_nodes_are_skipped(monkeypatch):
+    doc = minidom.parseString(TEXT)
+    Util.IndexStructure(doc)
+    merges = []
+    merge = Util.MergeDocOrder
+    monkeypatch.setattr(Util, "MergeDocOrder", lambda sets: merges.append(sets) or merge(sets))
+    tree = Parse("/descendant::a/descendant::b")
+    assert Evaluate(tree, doc)[1] == ["b1", "b2", "b3", "b4", "b5"]
+    assert not merges
+
+
+def test_changes_are_indexed_again():
+    doc = minidom.parseString(TEXT)
+    structure = Util.IndexStructure(doc)
+    c = doc.getElementsByTagName("c")[0]
+    c.appendChild(doc.createElement("b")).setAttribute("id", "b6")
+    Util.DocumentChanged(doc)
+    assert Util.g_documentIndexes.structure(doc) is not structure
+    assert Evaluate(Parse("//c//b"), doc)[1] == ["b5", "b6"]
+
+
+def test_name_tests_are_answered_from_the_index(monkeypatch):
+    text = (
+        "<doc xmlns:p='urn:p'><p:b id='pb1'/><b id='b0'/><a xmlns='urn:p' id='a0'>"
+        "<b id='pb2'/></a>%s</doc>" % TEXT[TEXT.index("<a"):TEXT.index("</doc>")]
+    )
+    (plain, indexed) = (minidom.parseString(text), minidom.parseString(text))
+    Util.IndexStructure(indexed)
+
+    def Ids(expr, doc):
+        tree = Optimizer.Optimize(Parse(expr))
+        context = Context.Context(doc, 1, 1, processorNss={"q": "urn:p"})
+        return [node.getAttribute("id") for node in tree.evaluate(context)]
+
+    for expr in ["//a/descendant::b[2]", "//a//b[position() > 1]", "//q:a//b", "//q:*",
+                 "//b/descendant-or-self::b", "(//a)[last()]//b"]:
+        assert Ids(expr, indexed) == Ids(expr, plain)
+    expected = (Ids("//b", plain), Ids("//q:b", plain))
+    assert expected[1] == ["pb1", "pb2"]
+    calls = []
+    for name in ["NodeNameTest", "QualifiedNameTest"]:
+        testClass = getattr(ParsedNodeTest, name)
+        monkeypatch.setattr(testClass, "match", lambda *args: calls.append(args) or 0)
+    assert (Ids("//b", indexed), Ids("//q:b", indexed)) == expected
+    assert not calls
+
+
+def test_name_index_follows_changes():
+    doc = minidom.parseString(TEXT)
+    Util.IndexStructure(doc)
+    tree = Parse("//c//b")
+    assert Evaluate(tree, doc)[1] == ["b5"]
+    c = doc.getElementsByTagName("c")[0]
+    c.insertBefore(doc.createElement("b"), c.firstChild).setAttribute("id", "b6")
+    Util.DocumentChanged(doc)
+    assert Evaluate(tree, doc)[1] == ["b6", "b5"]
+    with pytest.raises(RuntimeException):
+        Parse("//q:b").evaluate(Context.Context(doc, 1, 1))
+
+
+LOOKUPS = [
+    "//b[@id = 'b3']",
+    "//*[@id = $r]",
+    "//*[@id = $ids]",
+    "/doc/a[@id = 'a1']",
+    "//a[@id = 'a2']/b[@id = 'b2']",
+    "//a/descendant-or-self::a[@id = 'a2']",
+    "//a[@id = 'a1']/descendant::b[@id = 'b4'][1]",
+    "//b['b4' = @id][last()]",
+    "//b[@id = $n]",
+    "//a/self::*[@id = 'a3']",
+    "//b[@id = 'nothing']",
+]
+
+
+@pytest.mark.parametrize("expr", LOOKUPS)
+def test_lookups_evaluate_alike(expr):
+    (plain, indexed) = (minidom.parseString(TEXT), minidom.parseString(TEXT))
+    Util.IndexAttributes(indexed, ["id"])
+    variables = {(None, "r"): "b2", (None, "n"): 1.0}
+    results = []
+    for doc in [plain, indexed]:
+        context = Context.Context(doc, 1, 1, varBindings=variables)
+        variables[(None, "ids")] = [
+            node.getAttributeNode("id") for node in doc.getElementsByTagName("b")][::-2]
+        results.append([
+            [node.getAttribute("id") for node in tree.evaluate(context)]
+            for tree in [Optimizer.Optimize(Parse(expr)), xpath.Compile(expr),
+                         ClosureCompiler.Compile(Optimizer.Optimize(Parse(expr)))]
+        ])
+    assert results[0] == results[1]
+
+
+def test_attribute_comparisons_are_looked_up(monkeypatch):
+
+    def Lookups(tree):
+        count = isinstance(tree, Optimizer.ParsedAttributeLookupStep)
+        for child in tree.children():
+            count = count + Lookups(child)
+        return count
+
+    assert Lookups(Optimizer.Optimize(Parse("//b[@id = 'b3']"))) == 1
+    assert Lookups(Optimizer.Optimize(Parse("//a[@id = $r]/b[$r = @id]"))) == 2
+    for expr in ["//b[1][@id = 'b3']", "//b[@id = @ref]", "//b[@id != 'b3']",
+                 "//b[@id = name()]", "//b/preceding::*[@id = 'a2']"]:
+        assert not Lookups(Optimizer.Optimize(Parse(expr))), expr
+    doc = minidom.parseString(TEXT)
+    Util.IndexAttributes(doc, ["id"])
+    monkeypatch.setattr(ParsedExpr.ParsedEqualityExpr, "evaluate", None)
+    assert Evaluate(Optimizer.Optimize(Parse("//*[@id = 'b3']")), doc)[1] == ["b3"]
+
+
+def test_attribute_index_follows_changes():
+    doc = minidom.parseString(TEXT)
+    Util.IndexAttributes(doc, ["id"])
+    tree = Optimizer.Optimize(Parse("//*[@id = 'x']"))
+    assert Evaluate(tree, doc)[1] == []
+    doc.getElementsByTagName("c")[0].setAttribute("id", "x")
+    Util.DocumentChanged(doc)
+    assert Evaluate(tree, doc)[1] == ["x"]
+    # Unreported changes of values are not taken for the indexed ones
+    c = doc.getElementsByTagName("c")[0]
+    c.setAttribute("id", "y")
+    assert Evaluate(tree, doc)[1] == []
+    Util.DocumentChanged(doc)
+    assert Evaluate(Optimizer.Optimize(Parse("//*[@id = 'y']")), doc)[1] == ["y"]
+    c.removeAttribute("id")
+    assert Evaluate(Optimizer.Optimize(Parse("//*[@id = 'y']")), doc)[1] == []
+    # Names not chosen are not indexed
+    assert Util.g_documentIndexes.attributeIndex(doc, "ref") is None
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the table driven parser backend in `xpath.TableParser`."""
+
+# firstparty
+from xpath import pyxpath
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+EXPRESSIONS = [
+    "/",
+    "/a/b",
+    "//a/b//c",
+    "a//b[1]",
+    "$x/a",
+    "$x//a",
+    "$p:v",
+    "(a)[1]",
+    "..",
+    ".",
+    "@*",
+    "ns:*",
+    "ns:a/@ns:b",
+    "child::a",
+    "following-sibling::x[position() <= 2]",
+    "text()",
+    "comment()",
+    "node()[1]",
+    "processing-instruction('x')",
+    "count(*)",
+    "a[*]",
+    "concat(a, *)",
+    "concat(1, div)",
+    "f(*, *) * 2",
+    "concat('a', \"b\", 1, 2)",
+    "foo:bar(1, 2)",
+    "id('x')",
+    "a | b | c",
+    "1 + 2",
+    "-3 - -2",
+    "* * 2",
+    "x div 2 mod 3",
+    "1 = 2 or 3 >= 1 and 4 != 5",
+    "a < b",
+]
+
+
+@pytest.mark.parametrize("expr", EXPRESSIONS)
+def test_builds_same_tree_as_yapps_parser(expr):
+    expected = pyxpath.ExprParserFactory.new().parse(expr)
+    actual = TableParser.ExprParserFactory.new().parse(expr)
+    assert type(actual) is type(expected)
+    assert repr(actual) == repr(expected)
+
+
+def test_parser_is_reused_per_thread():
+    assert TableParser.ExprParserFactory.new() is TableParser.ExprParserFactory.new()
+
+
+def test_deep_nesting_grows_stacks():
+    depth = 2000
+    expr = "(" * depth + "1" + ")" * depth
+    assert repr(TableParser.ExprParserFactory.new().parse(expr)) == "1"
+
+
+def test_syntax_error_reports_position():
+    with pytest.raises(SyntaxError) as info:
+        TableParser.ExprParserFactory.new().parse("a/b[")
+    assert info.value.pos == 4
+
+
+def test_rule_errors_report_position():
+    parser = TableParser.ExprParserFactory.new()
+    with pytest.raises(SyntaxError) as info:
+        parser.parse("a/foo::bar")
+    assert (info.value.pos, info.value.msg) == (2, "Invalid axis: foo")
+    with pytest.raises(SyntaxError) as info:
+        parser.parse("a | comment('x')")
+    assert info.value.pos == 4
+    # The parser is still usable afterwards
+    assert repr(parser.parse("a/b")) == "child::a/child::b"
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for result type annotations and the code paths chosen from them."""
+
+# stdlib
+import math
+from xml.dom import minidom
+from xml.utils import boolean
+
+# firstparty
+from xpath import Context
+from xpath import NaN
+from xpath import Optimizer
+from xpath import ParsedExpr
+from xpath import TableParser
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<doc><a n='1'>x</a><a n='2'>y</a><a n='2.0'>10</a><b/></doc>"
+)
+
+# Operands of each type, for the typed comparisons
+VALUES = {
+    "boolean": [boolean.true, boolean.false],
+    "number": [0.0, -0.0, 1.0, 2, 10.0, NaN],
+    "string": ["", "x", "2", "10"],
+    "node-set": [
+        [],
+        list(DOCUMENT.getElementsByTagName("a")),
+        list(DOCUMENT.getElementsByTagName("b")),
+        [node.getAttributeNode("n") for node in DOCUMENT.getElementsByTagName("a")],
+    ],
+}
+
+EXPRESSIONS = [
+    "count(//a) = 3",
+    "count(//a) != 3",
+    "count(//a) = count(//b) * 3",
+    "string(//a) = 'x'",
+    "concat(//a, 'y') != 'xy'",
+    "//a = 'y'",
+    "'y' != //a",
+    "//a/@n = 2",
+    "2 = //a/@n",
+    "//a/@n != 2",
+    "//b = 0",
+    "//a = 10",
+    "true() = (1 < 2)",
+    "not(//b) = boolean(//c)",
+    "count(//a) > 2 and string-length('abc') <= count(//a)",
+    "count(//a) + count(//b) * -count(//a) - sum(//a/@n) div 0",
+    "-count(//a) mod 2",
+    "$n = 2 and $n + 1 > count(//a)",
+    "//a[@n = 2 and string(.) != 'y']/@n = '2.0'",
+]
+
+
+def Parse(expr):
+    return TableParser.ExprParser().parse(expr)
+
+
+def Evaluate(tree):
+    context = Context.Context(DOCUMENT, 1, 1)
+    context.varBindings = {(None, "n"): 2.0}
+    result = tree.evaluate(context)
+    if type(result) is float and math.isnan(result):
+        return "NaN"
+    if type(result) in (int, float):
+        return (result, math.copysign(1, result))
+    if type(result) is list:
+        return [id(node) for node in result]
+    return result
+
+
+@pytest.mark.parametrize("expr", EXPRESSIONS)
+def test_specialized_trees_evaluate_alike(expr):
+    assert Evaluate(Optimizer.Optimize(Parse(expr))) == Evaluate(Parse(expr))
+
+
+@pytest.mark.parametrize("types", sorted(ParsedExpr.g_typedComparisons))
+def test_typed_comparisons_agree_with_compare(types):
+    compare = ParsedExpr.g_typedComparisons[types]
+    for op in ["=", "!="]:
+        for left in VALUES[types[0]]:
+            for right in VALUES[types[1]]:
+                expected = ParsedExpr.Compare(op, left, right)
+                assert compare(op, left, right) == expected, (op, left, right)
+
+
+def test_nodes_are_annotated_with_their_result_type():
+    tree = Optimizer.Optimize(Parse("count(//a) = 2 and concat(@n, 'x') = //b"))
+    assert tree.resultType == "boolean"
+    assert tree._left._left.resultType == "number"
+    assert tree._right._left.resultType == "string"
+    assert tree._right._right.resultType == "node-set"
+    assert tree._left._compare is ParsedExpr.CompareValues
+    assert tree._right._compare is ParsedExpr.CompareNodeSetString
+    assert tree._leftBoolean and tree._rightBoolean
+
+
+def test_variables_and_extension_functions_stay_dynamic():
+    tree = Optimizer.Optimize(Parse("$x = count(//a)"))
+    assert tree._left.resultType is None
+    assert tree._compare is ParsedExpr.Compare
+    tree = Optimizer.Optimize(Parse("ext:f() + count(//a) > $x"))
+    assert tree._leftNumber and not tree._rightNumber
+    assert not tree._left._leftNumber and tree._left._rightNumber
+    # Trees that were not optimized convert everything
+    assert Parse("count(//a) = 2")._compare is ParsedExpr.Compare
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for unions of node-sets, merged in document order."""
+
+# stdlib
+from xml.dom import minidom
+
+# firstparty
+from xpath import ClosureCompiler
+from xpath import Context
+from xpath import Optimizer
+from xpath import ParsedExpr
+from xpath import TableParser
+from xpath import Util
+
+# thirdparty
+import pytest
+
+
+
+DOCUMENT = minidom.parseString(
+    "<doc id='d'><a id='a1'><b id='b1'/><c id='c1'/></a>"
+    "<b id='b2'><a id='a2'/></b><c id='c2'/><d id='d1'/><e id='e1'/></doc>"
+)
+OTHER = minidom.parseString("<doc id='x'><a id='xa'/></doc>")
+
+NODES = dict([(node.getAttribute("id"), node) for node in DOCUMENT.getElementsByTagName("*")])
+
+EXPRESSIONS = [
+    ("//b | //a", ["a1", "b1", "b2", "a2"]),
+    ("//c | //a | //b", ["a1", "b1", "c1", "b2", "a2", "c2"]),
+    ("//a | //a/. | //*[@id = 'a2']", ["a1", "a2"]),
+    ("//e | //d | //c | //b | //a | /doc", ["d", "a1", "b1", "c1", "b2", "a2", "c2", "d1", "e1"]),
+    ("$reversed | //b", ["a1", "b1", "c1", "b2", "a2", "c2", "d1", "e1"]),
+    ("//a/@id | //a", ["a1", "a1", "a2", "a2"]),
+    ("$other | //a", ["a1", "a2", "xa"]),
+    ("(//c | //a)[2]", ["c1"]),
+]
+
+
+def Evaluate(tree):
+    context = Context.Context(DOCUMENT, 1, 1)
+    reversed = DOCUMENT.getElementsByTagName("*")[1:]
+    reversed.reverse()
+    context.varBindings = {
+        (None, "reversed"): reversed,
+        (None, "other"): list(OTHER.getElementsByTagName("a")),
+    }
+    return [node.nodeName == "id" and node.value or node.getAttribute("id")
+            for node in tree.evaluate(context)]
+
+
+@pytest.mark.parametrize("expr,expected", EXPRESSIONS)
+def test_unions_are_in_document_order(expr, expected):
+    tree = TableParser.ExprParser().parse(expr)
+    result = Evaluate(tree)
+    if "$other" in expr:
+        # Documents come in an arbitrary, but consistent, order
+        assert sorted(result) == sorted(expected)
+        assert result[:2] == ["a1", "a2"] or result[1:] == ["a1", "a2"]
+    else:
+        assert result == expected
+    assert Evaluate(ClosureCompiler.Compile(Optimizer.Optimize(TableParser.ExprParser().parse(expr)))) == result
+
+
+def test_operands_are_merged_at_once():
+    tree = TableParser.ExprParser().parse("a | b | c | d")
+    assert len(tree._operands) == 4
+    assert tree._operands[3] is tree._right
+
+
+def test_operands_must_be_node_sets():
+    context = Context.Context(DOCUMENT, 1, 1)
+    with pytest.raises(ParsedExpr.StringException):
+        TableParser.ExprParser().parse("//a | //b | 1").evaluate(context)
+
+
+def test_merge_takes_sorted_and_unsorted_runs():
+    nodes = DOCUMENT.getElementsByTagName("*")
+    shuffled = [nodes[4], nodes[0], nodes[6], nodes[0]]
+    result = Util.MergeDocOrder([nodes[1::2], shuffled, [], nodes[::3]])
+    assert result == [node for node in nodes
+                      if node in nodes[1::2] or node in shuffled or node in nodes[::3]]
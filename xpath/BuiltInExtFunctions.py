@@ -16,9 +16,6 @@ import os  # isort:skip
 import re
 import string
 import sys
-import urllib.error
-import urllib.parse
-import urllib.request
 from xml.dom import EMPTY_NAMESPACE
 from xml.dom import Node
 from xml.dom.Text import Text
@@ -167,6 +164,8 @@ def Map(context, funcname, *nodesets):
 
 def EscapeUrl(context, url):
     "Escape illegal characters in a URL"
+    import urllib.parse
+
     return urllib.parse.quote(Conversions.StringValue(url))
 
 
@@ -305,3 +304,13 @@ ExtFunctions = {
     (FT_OLD_EXT_NAMESPACE, "map"): Map,
     (FT_OLD_EXT_NAMESPACE, "version"): Version,
 }
+
+# Those without side effects whose value only depends on their arguments
+# and the context (see CommonSubexpressions); iso-time and generate-uuid
+# differ on each call, evaluate and map call arbitrary functions, and the
+# node-set constructors create new nodes.
+PureExtFunctions = {}
+for _name in ["base-uri", "escape-url", "find", "if", "join", "version"]:
+    PureExtFunctions[(FT_EXT_NAMESPACE, _name)] = None
+    PureExtFunctions[(FT_OLD_EXT_NAMESPACE, _name)] = None
+del _name
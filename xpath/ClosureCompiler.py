@@ -0,0 +1,669 @@
+########################################################################
+#
+# File Name:   ClosureCompiler.py
+#
+#
+"""
+A second execution engine: expression trees are compiled into nested
+Python closures, each with its operand closures, operator and
+conversions bound when it is built, so that evaluating does no
+attribute lookups or type dispatch on the tree.  Results are those of
+the trees' own evaluate methods.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import operator
+from xml.dom import EMPTY_NAMESPACE
+from xml.utils import boolean
+
+# localfolder
+from . import Conversions
+from . import CoreFunctions
+from . import NaN
+from . import RuntimeException
+from . import Util
+from . import g_extFunctions
+from .CommonSubexpressions import ParsedCommonExpr
+from .CommonSubexpressions import ParsedCommonScope
+from .Invariants import ParsedInvariantExpr
+from .Optimizer import ParsedConstantExpr
+from .ParsedAbbreviatedAbsoluteLocationPath import ParsedAbbreviatedAbsoluteLocationPath
+from .ParsedAbbreviatedRelativeLocationPath import ParsedAbbreviatedRelativeLocationPath
+from .ParsedAbsoluteLocationPath import ParsedAbsoluteLocationPath
+from .ParsedExpr import FunctionCall
+from .ParsedExpr import FunctionCall1
+from .ParsedExpr import FunctionCall2
+from .ParsedExpr import FunctionCall3
+from .ParsedExpr import FunctionCallN
+from .ParsedExpr import ParsedAdditiveExpr
+from .ParsedExpr import ParsedAndExpr
+from .ParsedExpr import ParsedEqualityExpr
+from .ParsedExpr import ParsedFilterExpr
+from .ParsedExpr import ParsedLiteralExpr
+from .ParsedExpr import ParsedMultiplicativeExpr
+from .ParsedExpr import ParsedNLiteralExpr
+from .ParsedExpr import ParsedOrExpr
+from .ParsedExpr import ParsedPathExpr
+from .ParsedExpr import ParsedRelationalExpr
+from .ParsedExpr import ParsedUnaryExpr
+from .ParsedExpr import ParsedUnionExpr
+from .ParsedExpr import ParsedVariableReferenceExpr
+from .ParsedExpr import StringException
+from .ParsedNode import NORMAL
+from .ParsedPredicateList import NumberTypes
+from .ParsedRelativeLocationPath import ParsedRelativeLocationPath
+from .ParsedStep import ParsedStep
+
+
+
+class CompiledExpression:
+    """
+    An expression tree compiled into closures.  It is used like the tree:
+    evaluate(context) and, for location paths, select(context).
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.evaluate = self.select = Closure(tree)
+
+    def __repr__(self):
+        return repr(self.tree)
+
+
+def Compile(tree):
+    """Compile the expression tree into a CompiledExpression"""
+    return CompiledExpression(tree)
+
+
+def Closure(expr):
+    """The function of a context that evaluates expr"""
+    compiler = g_compilers.get(expr.__class__)
+    if compiler is None:
+        # Anything else evaluates itself
+        return expr.evaluate
+    return compiler(expr)
+
+
+### Primary Expressions ###
+
+
+def _Literal(expr):
+    value = expr._literal
+
+    def Literal(context):
+        return value
+
+    return Literal
+
+
+def _VariableReference(expr):
+    (prefix, local) = expr._key
+    if prefix:
+        # Depends on the namespaces of the context
+        return expr.evaluate
+    expanded = (EMPTY_NAMESPACE, local)
+
+    def VariableReference(context):
+        try:
+            return context.varBindings[expanded]
+        except:
+            raise RuntimeException(
+                RuntimeException.UNDEFINED_VARIABLE, expanded[0], expanded[1]
+            )
+
+    return VariableReference
+
+
+def _FunctionCall(expr):
+    args = [Closure(arg) for arg in expr._args]
+    (prefix, local) = expr._key
+    # (function, expanded name), resolved on the first call like the tree
+    resolved = []
+
+    def Resolve(context):
+        uri = context.processorNss.get(prefix)
+        if prefix and not uri:
+            raise RuntimeException(RuntimeException.UNDEFINED_PREFIX, prefix)
+        expanded = (prefix and uri or EMPTY_NAMESPACE, local)
+        func = g_extFunctions.get(expanded) or CoreFunctions.CoreFunctions.get(
+            expanded, expr.error
+        )
+        resolved[:] = [func, expanded]
+        return func
+
+    def WrongArguments():
+        raise RuntimeException(RuntimeException.WRONG_ARGUMENTS, str(resolved[1]), "")
+
+    if len(args) == 0:
+
+        def Call(context):
+            func = resolved and resolved[0] or Resolve(context)
+            try:
+                return func(context)
+            except TypeError:
+                WrongArguments()
+
+    elif len(args) == 1:
+        (arg0,) = args
+
+        def Call(context):
+            value0 = arg0(context)
+            func = resolved and resolved[0] or Resolve(context)
+            try:
+                return func(context, value0)
+            except TypeError:
+                WrongArguments()
+
+    elif len(args) == 2:
+        (arg0, arg1) = args
+
+        def Call(context):
+            value0 = arg0(context)
+            value1 = arg1(context)
+            func = resolved and resolved[0] or Resolve(context)
+            try:
+                return func(context, value0, value1)
+            except TypeError:
+                WrongArguments()
+
+    else:
+
+        def Call(context):
+            values = [arg(context) for arg in args]
+            func = resolved and resolved[0] or Resolve(context)
+            try:
+                return func(context, *values)
+            except TypeError:
+                WrongArguments()
+
+    return Call
+
+
+### Node Set Expressions ###
+
+
+def _UnionExpr(expr):
+    operands = [
+        (Closure(operand), operand.nodeSetProperties & NORMAL == NORMAL)
+        for operand in expr._operands
+    ]
+    (first, firstNormal) = operands[0]
+    rest = operands[1:]
+    MergeDocOrder = Util.MergeDocOrder
+
+    def UnionExpr(context):
+        set = first(context)
+        if type(set) != list:
+            raise StringException("Left Expression does not evaluate to a node set")
+        sets = set and [set] or []
+        normal = firstNormal
+        for (operand, operandNormal) in rest:
+            set = operand(context)
+            if type(set) != list:
+                raise StringException("Right Expression does not evaluate to a node set")
+            if set:
+                sets.append(set)
+                normal = operandNormal
+        if len(sets) == 1 and normal:
+            # The other operands are empty
+            return sets[0]
+        return MergeDocOrder(sets)
+
+    return UnionExpr
+
+
+def _Select(stage, nodeList, context, concatenate, normal):
+    """
+    Util.Select for the closure stage, normal if its node-sets are in
+    document order; leaves the context to the caller
+    """
+    sets = []
+    size = len(nodeList)
+    position = 0
+    for node in nodeList:
+        position = position + 1
+        context.node = node
+        context.position = position
+        context.size = size
+        nodeSet = stage(context)
+        if type(nodeSet) != list:
+            raise Exception("Right Expression does not evaluate to a Node Set")
+        sets.append(nodeSet)
+    if len(sets) == 1 and (concatenate or normal):
+        return sets[0]
+    if concatenate:
+        result = []
+        for nodeSet in sets:
+            result.extend(nodeSet)
+        return result
+    return Util.MergeDocOrder(sets)
+
+
+def _IsNormal(expr):
+    return expr.nodeSetProperties & NORMAL == NORMAL
+
+
+def _PathExpr(expr):
+    left = Closure(expr._left)
+    right = Closure(expr._right)
+    step = expr._step is not None and Closure(expr._step) or None
+    disjoint = expr._left.disjoint()
+    concatenate = disjoint and not step and expr._right.subtree()
+    stepNormal = step and _IsNormal(expr._step)
+    rightNormal = _IsNormal(expr._right)
+
+    def PathExpr(context):
+        rt = left(context)
+        if type(rt) != list:
+            raise StringException("Invalid Expression for a PathExpr %s" % str(expr._left))
+        state = (context.node, context.position, context.size)
+        if step:
+            rt = _Select(step, rt, context, disjoint, stepNormal)
+        res = _Select(right, rt, context, concatenate, rightNormal)
+        (context.node, context.position, context.size) = state
+        return res
+
+    return PathExpr
+
+
+def _FilterExpr(expr):
+    filter = Closure(expr._filter)
+    predicates = _PredicateList(expr._predicates)
+
+    def FilterExpr(context):
+        node_set = filter(context)
+        if type(node_set) != list:
+            raise StringException(
+                "ParsedFilterExpr: return value must evalute to a node-set"
+            )
+        if node_set and predicates:
+            node_set = predicates(node_set, context, 0)
+        return node_set
+
+    return FilterExpr
+
+
+def _PredicateList(expr):
+    """The filter function of a predicate list, None if it is empty"""
+    if expr is None or not len(expr):
+        return None
+    predicates = [Closure(pred) for pred in expr._predicates]
+    BooleanValue = Conversions.BooleanValue
+
+    def Filter(nodeList, context, reverse):
+        state = (context.node, context.position, context.size)
+        for pred in predicates:
+            size = len(nodeList)
+            ctr = 0
+            current = nodeList
+            nodeList = []
+            for node in current:
+                position = (reverse and size - ctr) or (ctr + 1)
+                context.node = node
+                context.position = position
+                context.size = size
+                res = pred(context)
+                if type(res) in NumberTypes:
+                    if res == position:
+                        nodeList.append(node)
+                elif BooleanValue(res):
+                    nodeList.append(node)
+                ctr = ctr + 1
+        (context.node, context.position, context.size) = state
+        return nodeList
+
+    return Filter
+
+
+### Location Paths ###
+
+
+def _Step(expr):
+    select = expr._axis.select
+    match = expr._nodeTest.match
+    predicates = _PredicateList(expr._predicates)
+    if predicates is None:
+
+        def Step(context):
+            return select(context, match)[0]
+
+        return Step
+    positionLimit = expr._predicates.positionLimit
+
+    def Step(context):
+        limit = positionLimit(context)
+        if limit is None:
+            (node_set, reverse) = select(context, match)
+        elif limit == 0:
+            return []
+        else:
+            (node_set, reverse) = select(context, match, limit)
+        if node_set:
+            node_set = predicates(node_set, context, reverse)
+        return node_set
+
+    return Step
+
+
+def _AbsoluteLocationPath(expr):
+    if expr._child is None:
+
+        def Root(context):
+            return [context.node.ownerDocument or context.node]
+
+        return Root
+    child = Closure(expr._child)
+
+    def AbsoluteLocationPath(context):
+        state = (context.node, context.position, context.size)
+        context.node = context.node.ownerDocument or context.node
+        context.position = context.size = 1
+        rt = child(context)
+        (context.node, context.position, context.size) = state
+        return rt
+
+    return AbsoluteLocationPath
+
+
+def _RelativeLocationPath(expr):
+    left = Closure(expr._left)
+    right = Closure(expr._right)
+    concatenate = expr._concatenate
+    normal = _IsNormal(expr._right)
+
+    def RelativeLocationPath(context):
+        rt = left(context)
+        if type(rt) != list:
+            raise Exception("Expected node set from relative expression.  Got %s" % str(rt))
+        state = (context.node, context.position, context.size)
+        result = _Select(right, rt, context, concatenate, normal)
+        (context.node, context.position, context.size) = state
+        return result
+
+    return RelativeLocationPath
+
+
+def _AbbreviatedAbsoluteLocationPath(expr):
+    step = Closure(expr._step)
+    rel = Closure(expr._rel)
+    normal = _IsNormal(expr._rel)
+
+    def AbbreviatedAbsoluteLocationPath(context):
+        state = (context.node, context.position, context.size)
+        context.node = context.node.ownerDocument or context.node
+        context.position = context.size = 1
+        rt = step(context)
+        result = _Select(rel, rt, context, 0, normal)
+        (context.node, context.position, context.size) = state
+        return result
+
+    return AbbreviatedAbsoluteLocationPath
+
+
+def _AbbreviatedRelativeLocationPath(expr):
+    left = Closure(expr._left)
+    middle = Closure(expr._middle)
+    right = Closure(expr._right)
+    disjoint = expr._left.disjoint()
+    middleNormal = _IsNormal(expr._middle)
+    rightNormal = _IsNormal(expr._right)
+
+    def AbbreviatedRelativeLocationPath(context):
+        rt = left(context)
+        state = (context.node, context.position, context.size)
+        rt = _Select(middle, rt, context, disjoint, middleNormal)
+        rt = _Select(right, rt, context, 0, rightNormal)
+        (context.node, context.position, context.size) = state
+        return rt
+
+    return AbbreviatedRelativeLocationPath
+
+
+### Boolean Expressions ###
+
+
+def _Boolean(operand):
+    """A function giving the boolean value of an operand"""
+    value = Closure(operand)
+    if operand.resultType == "boolean":
+        return value
+    BooleanValue = Conversions.BooleanValue
+    BooleanType = boolean.BooleanType
+
+    def Boolean(context):
+        result = value(context)
+        # Booleans are their own boolean value
+        if type(result) is BooleanType:
+            return result
+        return BooleanValue(result)
+
+    return Boolean
+
+
+def _OrExpr(expr):
+    left = _Boolean(expr._left)
+    right = _Boolean(expr._right)
+
+    def OrExpr(context):
+        return left(context) or right(context)
+
+    return OrExpr
+
+
+def _AndExpr(expr):
+    left = _Boolean(expr._left)
+    right = _Boolean(expr._right)
+
+    def AndExpr(context):
+        return left(context) and right(context)
+
+    return AndExpr
+
+
+def _EqualityExpr(expr):
+    left = Closure(expr._left)
+    right = Closure(expr._right)
+    # Chosen for the types of the operands, see ParsedEqualityExpr.specialize
+    compare = expr._compare
+    op = expr._op
+
+    def EqualityExpr(context):
+        return compare(op, left(context), right(context))
+
+    return EqualityExpr
+
+
+g_relationalOps = [operator.lt, operator.le, operator.gt, operator.ge]
+
+
+def _RelationalExpr(expr):
+    compare = g_relationalOps[expr._op]
+    left = _Number(expr._left, expr._leftLit)
+    true = boolean.true
+    false = boolean.false
+    if expr._rightLit:
+        # The common case of e.g. @price > 10
+        value = expr._right
+
+        def RelationalExpr(context):
+            return compare(left(context), value) and true or false
+
+        return RelationalExpr
+    right = _Number(expr._right, 0)
+
+    def RelationalExpr(context):
+        return compare(left(context), right(context)) and true or false
+
+    return RelationalExpr
+
+
+### Number Expressions ###
+
+
+def _Number(operand, literal):
+    """A function giving the number value of an operand"""
+    if literal:
+
+        def Number(context):
+            return operand
+
+        return Number
+    value = Closure(operand)
+    if operand.resultType == "number":
+        return value
+    NumberValue = Conversions.NumberValue
+
+    def Number(context):
+        result = value(context)
+        # Numbers are their own number value
+        if type(result) is float:
+            return result
+        return NumberValue(result)
+
+    return Number
+
+
+def _AdditiveExpr(expr):
+    left = _Number(expr._left, expr._leftLit)
+    right = _Number(expr._right, expr._rightLit)
+    sign = expr._sign
+
+    def AdditiveExpr(context):
+        return left(context) + (right(context) * sign)
+
+    return AdditiveExpr
+
+
+def _MultiplicativeExpr(expr):
+    left = _Number(expr._left, 0)
+    right = _Number(expr._right, 0)
+    if expr._op == 0:
+
+        def MultiplicativeExpr(context):
+            return left(context) * right(context)
+
+    elif expr._op == 1:
+
+        def MultiplicativeExpr(context):
+            lrt = left(context)
+            rrt = right(context)
+            if rrt == 0:
+                return NaN
+            return lrt / rrt
+
+    else:
+
+        def MultiplicativeExpr(context):
+            lrt = left(context)
+            rrt = right(context)
+            if rrt == 0:
+                return NaN
+            return lrt % rrt
+
+    return MultiplicativeExpr
+
+
+def _UnaryExpr(expr):
+    exp = _Number(expr._exp, 0)
+
+    def UnaryExpr(context):
+        return exp(context) * -1.0
+
+    return UnaryExpr
+
+
+### Common Sub-expressions ###
+
+
+def _CommonScope(expr):
+    body = Closure(expr._expr)
+
+    def CommonScope(context):
+        saved = context.commonValues
+        context.commonValues = {}
+        try:
+            return body(context)
+        finally:
+            context.commonValues = saved
+
+    return CommonScope
+
+
+def _CommonExpr(expr):
+    body = Closure(expr._expr)
+    positional = expr._positional
+
+    # The node is the key: all of its occurrences share the values
+    def CommonExpr(context):
+        values = context.commonValues
+        if values is None:
+            return body(context)
+        if positional:
+            key = (expr, context.node, context.position, context.size)
+        else:
+            key = (expr, context.node)
+        try:
+            return values[key]
+        except KeyError:
+            value = values[key] = body(context)
+            return value
+
+    return CommonExpr
+
+
+def _InvariantExpr(expr):
+    body = Closure(expr._expr)
+    document = expr._document
+
+    def InvariantExpr(context):
+        values = context.commonValues
+        if values is None:
+            return body(context)
+        if document:
+            key = (expr, context.node.ownerDocument or context.node)
+        else:
+            key = expr
+        try:
+            value = values[key]
+        except KeyError:
+            value = values[key] = body(context)
+        if type(value) is list:
+            return value[:]
+        return value
+
+    return InvariantExpr
+
+
+g_compilers = {
+    ParsedLiteralExpr: _Literal,
+    ParsedNLiteralExpr: _Literal,
+    ParsedConstantExpr: _Literal,
+    ParsedVariableReferenceExpr: _VariableReference,
+    FunctionCall: _FunctionCall,
+    FunctionCall1: _FunctionCall,
+    FunctionCall2: _FunctionCall,
+    FunctionCall3: _FunctionCall,
+    FunctionCallN: _FunctionCall,
+    ParsedUnionExpr: _UnionExpr,
+    ParsedPathExpr: _PathExpr,
+    ParsedFilterExpr: _FilterExpr,
+    ParsedStep: _Step,
+    ParsedAbsoluteLocationPath: _AbsoluteLocationPath,
+    ParsedRelativeLocationPath: _RelativeLocationPath,
+    ParsedAbbreviatedAbsoluteLocationPath: _AbbreviatedAbsoluteLocationPath,
+    ParsedAbbreviatedRelativeLocationPath: _AbbreviatedRelativeLocationPath,
+    ParsedOrExpr: _OrExpr,
+    ParsedAndExpr: _AndExpr,
+    ParsedEqualityExpr: _EqualityExpr,
+    ParsedRelationalExpr: _RelationalExpr,
+    ParsedAdditiveExpr: _AdditiveExpr,
+    ParsedMultiplicativeExpr: _MultiplicativeExpr,
+    ParsedUnaryExpr: _UnaryExpr,
+    ParsedCommonScope: _CommonScope,
+    ParsedCommonExpr: _CommonExpr,
+    ParsedInvariantExpr: _InvariantExpr,
+}
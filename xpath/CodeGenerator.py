@@ -0,0 +1,663 @@
+########################################################################
+#
+# File Name:   CodeGenerator.py
+#
+#
+"""
+Ahead-of-time compilation of a set of expressions into a Python module.
+Each expression becomes a function of the context, in straight-line code
+calling the conversions, the core functions and the axes directly.
+Processes that import the module never import or run the parser.
+
+    python -m xpath.CodeGenerator rules.txt rules.py
+
+The module records the version of the library and a hash of the
+expressions it was generated from; see CompiledModule.Load.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import argparse
+import os
+import pickle
+import py_compile
+import sys
+from xml.dom import EMPTY_NAMESPACE
+from xml.utils import boolean
+
+# localfolder
+from . import CompiledModule
+from . import Compile
+from . import Context
+from . import CoreFunctions
+from . import Inf
+from . import NaN
+from . import Optimizer
+from . import ParsedAxisSpecifier
+from . import ParsedNodeTest
+from .CommonSubexpressions import ParsedCommonExpr
+from .CommonSubexpressions import ParsedCommonScope
+from .Invariants import ParsedInvariantExpr
+from .Optimizer import ParsedConstantExpr
+from .ParsedAbbreviatedAbsoluteLocationPath import ParsedAbbreviatedAbsoluteLocationPath
+from .ParsedAbbreviatedRelativeLocationPath import ParsedAbbreviatedRelativeLocationPath
+from .ParsedAbsoluteLocationPath import ParsedAbsoluteLocationPath
+from .ParsedExpr import FunctionCall
+from .ParsedExpr import FunctionCall1
+from .ParsedExpr import FunctionCall2
+from .ParsedExpr import FunctionCall3
+from .ParsedExpr import FunctionCallN
+from .ParsedExpr import ParsedAdditiveExpr
+from .ParsedExpr import ParsedAndExpr
+from .ParsedExpr import ParsedEqualityExpr
+from .ParsedExpr import ParsedFilterExpr
+from .ParsedExpr import ParsedLiteralExpr
+from .ParsedExpr import ParsedMultiplicativeExpr
+from .ParsedExpr import ParsedNLiteralExpr
+from .ParsedExpr import ParsedOrExpr
+from .ParsedExpr import ParsedPathExpr
+from .ParsedExpr import ParsedRelationalExpr
+from .ParsedExpr import ParsedUnaryExpr
+from .ParsedExpr import ParsedUnionExpr
+from .ParsedExpr import ParsedVariableReferenceExpr
+from .ParsedNode import NORMAL
+from .ParsedRelativeLocationPath import ParsedRelativeLocationPath
+from .ParsedStep import ParsedAbbreviatedStep
+from .ParsedStep import ParsedStep
+
+
+
+# The package generated modules import from
+PACKAGE = __name__.rpartition(".")[0]
+
+PICKLE_PROTOCOL = 4
+
+g_header = '''\
+# Generated by CodeGenerator from %(source)s: do not edit.
+"""XPath expressions compiled ahead of time"""
+
+from xml.dom import EMPTY_NAMESPACE
+from xml.utils import boolean
+from %(package)s import CompiledModule as _rt
+from %(package)s import Conversions
+from %(package)s import CoreFunctions
+from %(package)s import Inf
+from %(package)s import NaN
+from %(package)s import ParsedAxisSpecifier
+from %(package)s import ParsedExpr
+from %(package)s import ParsedNodeTest
+from %(package)s import Util
+
+FORMAT_VERSION = %(format)d
+LIBRARY_VERSION = %(version)r
+SOURCE_HASH = %(hash)r
+
+_rt.Check(__name__, FORMAT_VERSION, LIBRARY_VERSION)
+'''
+
+
+class ModuleGenerator:
+    """
+    Collects the code of expressions: shared objects such as axes and
+    node tests become module constants, sub-expressions that change the
+    context become functions, and everything else inline Python
+    expressions of the variable context.
+    """
+
+    def __init__(self):
+        self._constants = {}
+        self._constantLines = []
+        self._functionLines = []
+        self._expressions = []
+        self._commonFunctions = {}
+        self._count = 0
+
+    def add(self, expr, tree):
+        """Add the code of the expression text expr, compiled to tree"""
+        name = self.function(tree)
+        self._expressions.append((expr, name))
+        return name
+
+    def source(self, sourceName="<rules>"):
+        """The text of the module"""
+        expressions = [expr for (expr, name) in self._expressions]
+        lines = [
+            g_header
+            % {
+                "source": _Comment(sourceName),
+                "package": PACKAGE,
+                "format": CompiledModule.FORMAT_VERSION,
+                "version": CompiledModule.LIBRARY_VERSION,
+                "hash": CompiledModule.SourceHash(expressions),
+            }
+        ]
+        if self._constantLines:
+            lines.append("")
+            lines.extend(self._constantLines)
+        lines.extend(self._functionLines)
+        lines.append("")
+        lines.append("")
+        lines.append("EXPRESSIONS = {")
+        for (expr, name) in self._expressions:
+            lines.append("    %r: _rt.Expression(%r, %s)," % (expr, expr, name))
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def name(self, kind):
+        self._count = self._count + 1
+        return "_%s%d" % (kind, self._count)
+
+    def constant(self, source, kind="c"):
+        """The name of a module constant with the value of source"""
+        name = self._constants.get(source)
+        if name is None:
+            name = self._constants[source] = self.name(kind)
+            self._constantLines.append("%s = %s" % (name, source))
+        return name
+
+    def define(self, tree, body):
+        """The name of a new function of the context, with the body lines"""
+        name = self.name("f")
+        lines = self._functionLines
+        lines.append("")
+        lines.append("")
+        lines.append("def %s(context):" % name)
+        lines.append("    # %s" % _Comment(repr(tree)))
+        for line in body:
+            lines.append("    " + line)
+        return name
+
+    def function(self, tree):
+        """The name of a function of the context evaluating tree"""
+        generator = g_functions.get(tree.__class__)
+        if generator is not None:
+            return generator(self, tree)
+        return self.define(tree, ["return " + self.expression(tree)])
+
+    def expression(self, tree):
+        """A Python expression of the variable context evaluating tree"""
+        generator = g_expressions.get(tree.__class__)
+        if generator is not None:
+            return generator(self, tree)
+        if tree.__class__ in g_functions:
+            return "%s(context)" % self.function(tree)
+        # No code for it: the tree evaluates itself
+        data = pickle.dumps(tree, PICKLE_PROTOCOL)
+        return "%s.evaluate(context)" % self.constant("_rt.Loads(%r)" % data, "tree")
+
+    def common(self, tree):
+        """
+        The name of the function of the sub-expression a common or
+        invariant expression tree wraps
+        """
+        name = self._commonFunctions.get(tree)
+        if name is None:
+            name = self._commonFunctions[tree] = self.function(tree._expr)
+        return name
+
+    def number(self, tree, literal=0):
+        """A Python expression of the number value of tree"""
+        if literal:
+            return _Value(tree)
+        if Optimizer.ResultType(tree) == "number":
+            return self.expression(tree)
+        return "_rt.Number(%s)" % self.expression(tree)
+
+    def boolean(self, tree):
+        """A Python expression of the boolean value of tree"""
+        if Optimizer.ResultType(tree) == "boolean":
+            return self.expression(tree)
+        return "_rt.Boolean(%s)" % self.expression(tree)
+
+    def predicates(self, predicates):
+        """A Python tuple of the functions of the predicates"""
+        names = [self.function(pred) for pred in predicates._predicates]
+        return "(%s,)" % ", ".join(names)
+
+
+def Generate(expressions, sourceName="<rules>"):
+    """The source of a module of the expressions (a list of strings)"""
+    generator = ModuleGenerator()
+    for expr in expressions:
+        generator.add(expr, Compile(expr))
+    return generator.source(sourceName)
+
+
+def Write(path, expressions, sourceName="<rules>"):
+    """
+    Generate the module of the expressions into path, and byte-compile
+    it.  The file is written next to its final name and renamed into
+    place, so importers never see a partial module.
+    """
+    source = Generate(expressions, sourceName)
+    tempPath = "%s.%d.tmp" % (path, os.getpid())
+    f = open(tempPath, "w", encoding="utf-8")
+    try:
+        f.write(source)
+    finally:
+        f.close()
+    os.replace(tempPath, path)
+    # Large rule sets take seconds to compile: workers load the bytecode
+    py_compile.compile(path, doraise=True)
+    return len(expressions)
+
+
+def _Comment(text):
+    """text on one line"""
+    return text.encode("unicode_escape").decode("ascii")
+
+
+def _Value(value):
+    """The Python source of a literal value"""
+    if boolean.IsBooleanType(value):
+        return value and "boolean.true" or "boolean.false"
+    if type(value) is float:
+        if value is NaN:
+            return "NaN"
+        if value != value:
+            return "float('nan')"
+        if value == Inf:
+            return "Inf"
+        if value == -Inf:
+            return "(-Inf)"
+    return repr(value)
+
+
+### Primary Expressions ###
+
+
+def _Literal(generator, expr):
+    return _Value(expr._literal)
+
+
+def _VariableReference(generator, expr):
+    (prefix, local) = expr._key
+    if prefix:
+        return "_rt.PrefixedVariable(context, %r, %r)" % (prefix, local)
+    expanded = generator.constant("(EMPTY_NAMESPACE, %r)" % local, "var")
+    return "_rt.Variable(context, %s)" % expanded
+
+
+def _FunctionCall(generator, expr):
+    args = [generator.expression(arg) for arg in expr._args]
+    name = Optimizer.CoreFunctionName(expr)
+    attr = name and g_coreFunctions.get(CoreFunctions.CoreFunctions.get((EMPTY_NAMESPACE, name)))
+    if attr:
+        # Core functions are called directly
+        return "_rt.Call(%s)" % ", ".join(["CoreFunctions." + attr, repr(name), "context"] + args)
+    (prefix, local) = expr._key
+    site = generator.constant(
+        "_rt.FunctionCallSite(%r, %r, %r)" % (expr._name, prefix, local), "call"
+    )
+    return "%s(%s)" % (site, ", ".join(["context"] + args))
+
+
+# The names of the core functions in CoreFunctions
+g_coreFunctions = {}
+for (attr, value) in vars(CoreFunctions).items():
+    if value in CoreFunctions.CoreFunctions.values():
+        g_coreFunctions[value] = attr
+
+
+### Node Set Expressions ###
+
+
+def _UnionExpr(generator, expr):
+    body = ["sets = []"]
+    side = "Left"
+    for operand in expr._operands:
+        body.extend(
+            [
+                "set = " + generator.expression(operand),
+                "if type(set) != list:",
+                '    raise ParsedExpr.StringException("%s Expression does not evaluate to a node set")'
+                % side,
+                "if set:",
+                "    sets.append(set)",
+                "    normal = %d" % _IsNormal(operand),
+            ]
+        )
+        side = "Right"
+    body.extend(
+        [
+            "if len(sets) == 1 and normal:",
+            "    return sets[0]",
+            "return Util.MergeDocOrder(sets)",
+        ]
+    )
+    return generator.define(expr, body)
+
+
+def _Each(value, statements):
+    """Lines running statements for each node of the list value"""
+    return [
+        "size = len(%s)" % value,
+        "position = 0",
+        "for node in %s:" % value,
+        "    position = position + 1",
+        "    context.node = node",
+        "    context.position = position",
+        "    context.size = size",
+    ] + ["    " + line for line in statements]
+
+
+def _IsNormal(expr):
+    return expr.nodeSetProperties & NORMAL == NORMAL
+
+
+def _Select(generator, stage, concatenate):
+    """Lines setting rt to the nodes stage selects from those of rt"""
+    lines = ["sets = []"]
+    lines.extend(
+        _Each(
+            "rt",
+            [
+                "subRt = " + generator.expression(stage),
+                "if type(subRt) != list:",
+                '    raise Exception("Right Expression does not evaluate to a Node Set")',
+                "sets.append(subRt)",
+            ],
+        )
+    )
+    if concatenate:
+        merge = ["rt = []", "for subRt in sets:", "    rt.extend(subRt)"]
+    else:
+        merge = ["rt = Util.MergeDocOrder(sets)"]
+    if concatenate or _IsNormal(stage):
+        # From a single node, in document order already
+        lines.extend(["if len(sets) == 1:", "    rt = sets[0]", "else:"])
+        merge = ["    " + line for line in merge]
+    lines.extend(merge)
+    return lines
+
+
+def _PathExpr(generator, expr):
+    body = [
+        "rt = " + generator.expression(expr._left),
+        "if type(rt) != list:",
+        "    raise ParsedExpr.StringException(%r)"
+        % ("Invalid Expression for a PathExpr %s" % str(expr._left)),
+        "state = (context.node, context.position, context.size)",
+    ]
+    disjoint = expr._left.disjoint()
+    if expr._step is not None:
+        body.extend(_Select(generator, expr._step, disjoint))
+        disjoint = 0
+    body.extend(_Select(generator, expr._right, disjoint and expr._right.subtree()))
+    body.append("(context.node, context.position, context.size) = state")
+    body.append("return rt")
+    return generator.define(expr, body)
+
+
+def _FilterExpr(generator, expr):
+    return generator.define(
+        expr,
+        [
+            "nodes = " + generator.expression(expr._filter),
+            "if type(nodes) != list:",
+            "    raise ParsedExpr.StringException(",
+            '        "ParsedFilterExpr: return value must evalute to a node-set"',
+            "    )",
+            "if nodes:",
+            "    nodes = _rt.Filter(nodes, context, 0, %s)"
+            % generator.predicates(expr._predicates),
+            "return nodes",
+        ],
+    )
+
+
+### Location Paths ###
+
+
+def _Step(generator, expr):
+    axis = generator.constant(_AxisSource(expr._axis), "axis")
+    test = generator.constant(_NodeTestSource(expr._nodeTest), "test")
+    match = generator.constant("%s.match" % test, "match")
+    if not expr._predicates:
+        return generator.define(expr, ["return %s.select(context, %s)[0]" % (axis, match)])
+    # Only limits that do not depend on the context are known beforehand
+    limit = expr._predicates.positionLimit(Context.Context(None))
+    if limit == 0:
+        return generator.define(expr, ["return []"])
+    select = "%s.select(context, %s%s)" % (axis, match, limit and ", %d" % limit or "")
+    return generator.define(
+        expr,
+        [
+            "(nodes, reverse) = " + select,
+            "if nodes:",
+            "    nodes = _rt.Filter(nodes, context, reverse, %s)"
+            % generator.predicates(expr._predicates),
+            "return nodes",
+        ],
+    )
+
+
+def _AbbreviatedStep(generator, expr):
+    if expr.parent:
+        return "_rt.Parent(context)"
+    return "[context.node]"
+
+
+def _AxisSource(axis):
+    if axis.__class__ is ParsedAxisSpecifier.g_classMap.get(axis._axis):
+        return "ParsedAxisSpecifier.ParsedAxisSpecifier(%r)" % axis._axis
+    return "_rt.Loads(%r)" % pickle.dumps(axis, PICKLE_PROTOCOL)
+
+
+def _NodeTestSource(test):
+    if test.__class__ is ParsedNodeTest.ProcessingInstructionNodeTest and test.target:
+        return "ParsedNodeTest.ParsedNodeTest('processing-instruction', %r)" % repr(
+            test.target
+        )
+    for (name, testClass) in ParsedNodeTest.g_classMap.items():
+        if test.__class__ is testClass:
+            return "ParsedNodeTest.ParsedNodeTest(%r)" % name
+    if test.__class__ in g_nameTests:
+        return "ParsedNodeTest.ParsedNameTest(%r)" % repr(test)
+    return "_rt.Loads(%r)" % pickle.dumps(test, PICKLE_PROTOCOL)
+
+
+g_nameTests = [
+    ParsedNodeTest.PrincipalTypeTest,
+    ParsedNodeTest.NodeNameTest,
+    ParsedNodeTest.LocalNameTest,
+    ParsedNodeTest.QualifiedNameTest,
+]
+
+
+def _AbsoluteLocationPath(generator, expr):
+    if expr._child is None:
+        return "[context.node.ownerDocument or context.node]"
+    return "%s(context)" % generator.define(
+        expr,
+        [
+            "state = (context.node, context.position, context.size)",
+            "context.node = context.node.ownerDocument or context.node",
+            "context.position = context.size = 1",
+            "rt = " + generator.expression(expr._child),
+            "(context.node, context.position, context.size) = state",
+            "return rt",
+        ],
+    )
+
+
+def _RelativeLocationPath(generator, expr):
+    body = [
+        "rt = " + generator.expression(expr._left),
+        "if type(rt) != list:",
+        '    raise Exception("Expected node set from relative expression.  Got %s" % str(rt))',
+        "state = (context.node, context.position, context.size)",
+    ]
+    body.extend(_Select(generator, expr._right, expr._concatenate))
+    body.append("(context.node, context.position, context.size) = state")
+    body.append("return rt")
+    return generator.define(expr, body)
+
+
+def _AbbreviatedAbsoluteLocationPath(generator, expr):
+    body = [
+        "state = (context.node, context.position, context.size)",
+        "context.node = context.node.ownerDocument or context.node",
+        "context.position = context.size = 1",
+        "rt = " + generator.expression(expr._step),
+    ]
+    body.extend(_Select(generator, expr._rel, 0))
+    body.append("(context.node, context.position, context.size) = state")
+    body.append("return rt")
+    return generator.define(expr, body)
+
+
+def _AbbreviatedRelativeLocationPath(generator, expr):
+    body = [
+        "rt = " + generator.expression(expr._left),
+        "state = (context.node, context.position, context.size)",
+    ]
+    body.extend(_Select(generator, expr._middle, expr._left.disjoint()))
+    body.extend(_Select(generator, expr._right, 0))
+    body.append("(context.node, context.position, context.size) = state")
+    body.append("return rt")
+    return generator.define(expr, body)
+
+
+### Boolean Expressions ###
+
+
+def _OrExpr(generator, expr):
+    return "(%s or %s)" % (generator.boolean(expr._left), generator.boolean(expr._right))
+
+
+def _AndExpr(generator, expr):
+    return "(%s and %s)" % (generator.boolean(expr._left), generator.boolean(expr._right))
+
+
+def _EqualityExpr(generator, expr):
+    # Chosen for the types of the operands, see ParsedEqualityExpr.specialize
+    return "ParsedExpr.%s(%r, %s, %s)" % (
+        expr._compare.__name__,
+        expr._op,
+        generator.expression(expr._left),
+        generator.expression(expr._right),
+    )
+
+
+g_relationalOps = ["<", "<=", ">", ">="]
+
+
+def _RelationalExpr(generator, expr):
+    return "(%s %s %s and boolean.true or boolean.false)" % (
+        generator.number(expr._left, expr._leftLit),
+        g_relationalOps[expr._op],
+        generator.number(expr._right, expr._rightLit),
+    )
+
+
+### Number Expressions ###
+
+
+def _AdditiveExpr(generator, expr):
+    return "(%s + (%s * %d))" % (
+        generator.number(expr._left, expr._leftLit),
+        generator.number(expr._right, expr._rightLit),
+        expr._sign,
+    )
+
+
+def _MultiplicativeExpr(generator, expr):
+    left = generator.number(expr._left)
+    right = generator.number(expr._right)
+    if expr._op == 0:
+        return "(%s * %s)" % (left, right)
+    if expr._op == 1:
+        return "_rt.Divide(%s, %s)" % (left, right)
+    return "_rt.Modulo(%s, %s)" % (left, right)
+
+
+def _UnaryExpr(generator, expr):
+    return "(%s * -1.0)" % generator.number(expr._exp)
+
+
+### Common Sub-expressions ###
+
+
+def _CommonScope(generator, expr):
+    return generator.define(
+        expr,
+        [
+            "saved = context.commonValues",
+            "context.commonValues = {}",
+            "try:",
+            "    return " + generator.expression(expr._expr),
+            "finally:",
+            "    context.commonValues = saved",
+        ],
+    )
+
+
+def _CommonExpr(generator, expr):
+    return "_rt.Common(context, %s, %d)" % (generator.common(expr), expr._positional)
+
+
+def _InvariantExpr(generator, expr):
+    return "_rt.Invariant(context, %s, %d)" % (generator.common(expr), expr._document)
+
+
+# Sub-expressions generated as Python expressions
+g_expressions = {
+    ParsedLiteralExpr: _Literal,
+    ParsedNLiteralExpr: _Literal,
+    ParsedConstantExpr: _Literal,
+    ParsedVariableReferenceExpr: _VariableReference,
+    FunctionCall: _FunctionCall,
+    FunctionCall1: _FunctionCall,
+    FunctionCall2: _FunctionCall,
+    FunctionCall3: _FunctionCall,
+    FunctionCallN: _FunctionCall,
+    ParsedAbbreviatedStep: _AbbreviatedStep,
+    ParsedAbsoluteLocationPath: _AbsoluteLocationPath,
+    ParsedOrExpr: _OrExpr,
+    ParsedAndExpr: _AndExpr,
+    ParsedEqualityExpr: _EqualityExpr,
+    ParsedRelationalExpr: _RelationalExpr,
+    ParsedAdditiveExpr: _AdditiveExpr,
+    ParsedMultiplicativeExpr: _MultiplicativeExpr,
+    ParsedUnaryExpr: _UnaryExpr,
+    ParsedCommonExpr: _CommonExpr,
+    ParsedInvariantExpr: _InvariantExpr,
+}
+
+# Sub-expressions generated as functions of the context
+g_functions = {
+    ParsedUnionExpr: _UnionExpr,
+    ParsedPathExpr: _PathExpr,
+    ParsedFilterExpr: _FilterExpr,
+    ParsedStep: _Step,
+    ParsedRelativeLocationPath: _RelativeLocationPath,
+    ParsedAbbreviatedAbsoluteLocationPath: _AbbreviatedAbsoluteLocationPath,
+    ParsedAbbreviatedRelativeLocationPath: _AbbreviatedRelativeLocationPath,
+    ParsedCommonScope: _CommonScope,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m xpath.CodeGenerator",
+        description="Compile the expressions of a rule file into a Python module.",
+    )
+    parser.add_argument("rules", help="one expression per line, # starts a comment")
+    parser.add_argument("module", help="the Python file to write")
+    args = parser.parse_args(argv)
+    expressions = CompiledModule.ReadRules(args.rules)
+    try:
+        count = Write(args.module, expressions, os.path.basename(args.rules))
+    except Exception as error:
+        sys.stderr.write("%s: %s\n" % (args.rules, error))
+        return 1
+    print("%d expressions written to %s" % (count, args.module))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+########################################################################
+#
+# File Name:   CommonSubexpressions.py
+#
+#
+"""
+Common subexpression elimination.  Sub-expressions that occur more than
+once in an expression, structurally equal, free of side effects and of
+boolean, number or string type, are evaluated once for each context
+node (and position and size, for those using them) while the expression
+is evaluated.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+from xml.dom import EMPTY_NAMESPACE
+
+# localfolder
+from . import CoreFunctions
+from . import g_extFunctions
+from .Optimizer import IsConstant
+from .Optimizer import ResultType
+from .Optimizer import UsesPosition
+from .ParsedExpr import FunctionCall
+from .ParsedExpr import ParsedVariableReferenceExpr
+from .ParsedNode import ParsedNode
+
+
+
+class ParsedCommonScope(ParsedNode):
+    """
+    The root of an expression with common sub-expressions: their values
+    are kept while it is evaluated, and forgotten afterwards.
+    """
+
+    _fields = ("_expr",)
+
+    def __init__(self, expr):
+        self._expr = expr
+        self.resultType = expr.resultType
+        self.nodeSetProperties = expr.nodeSetProperties
+
+    def evaluate(self, context):
+        saved = context.commonValues
+        context.commonValues = {}
+        try:
+            return self._expr.evaluate(context)
+        finally:
+            context.commonValues = saved
+
+    select = evaluate
+
+    def pprint(self, indent=""):
+        print((indent + str(self)))
+        self._expr.pprint(indent + "  ")
+
+    def __str__(self):
+        return "<CommonScope at %x: %s>" % (id(self), repr(self))
+
+    def __repr__(self):
+        return repr(self._expr)
+
+
+class ParsedCommonExpr(ParsedNode):
+    """
+    A sub-expression occurring more than once in its scope.  All of the
+    occurrences are this one node.
+    """
+
+    _fields = ("_expr",)
+
+    def __init__(self, expr):
+        self._expr = expr
+        self._positional = UsesPosition(expr)
+        self.resultType = expr.resultType
+        self.nodeSetProperties = expr.nodeSetProperties
+
+    def evaluate(self, context):
+        values = context.commonValues
+        if values is None:
+            # Outside of its scope, e.g. the tree was taken apart
+            return self._expr.evaluate(context)
+        if self._positional:
+            key = (self, context.node, context.position, context.size)
+        else:
+            key = (self, context.node)
+        try:
+            return values[key]
+        except KeyError:
+            value = values[key] = self._expr.evaluate(context)
+            return value
+
+    def pprint(self, indent=""):
+        print((indent + str(self)))
+        self._expr.pprint(indent + "  ")
+
+    def __str__(self):
+        return "<CommonExpr at %x: %s>" % (id(self), repr(self))
+
+    def __repr__(self):
+        return repr(self._expr)
+
+
+def Eliminate(expr):
+    """
+    Return expr with its common sub-expressions evaluated once, inside a
+    ParsedCommonScope, or expr itself if it has none.
+    """
+    if not isinstance(expr, ParsedNode):
+        return expr
+    common = {}
+    while 1:
+        counts = {}
+        _Count(expr, counts, common, {})
+        candidates = [
+            node
+            for (node, count) in counts.items()
+            if count > 1 and node not in common and _IsCandidate(node)
+        ]
+        if not candidates:
+            break
+        # The largest first: what it contains is then only counted once
+        sizes = [(_Size(node), index) for (index, node) in enumerate(candidates)]
+        common[candidates[max(sizes)[1]]] = None
+    if not common:
+        return expr
+    return ParsedCommonScope(_Rewrite(expr, common))
+
+
+def IsPure(expr):
+    """
+    Whether evaluating expr twice in the same context gives the same value
+    and has no other effect: all of the functions it calls are core
+    functions or extension functions registered as pure.
+    """
+    if isinstance(expr, FunctionCall):
+        (prefix, local) = expr._key
+        if prefix:
+            # What the prefix stands for is only known at run time
+            return 0
+        expanded = (EMPTY_NAMESPACE, local)
+        if expanded in g_extFunctions:
+            if expanded not in g_extFunctions.pure:
+                return 0
+        elif expanded not in CoreFunctions.CoreFunctions:
+            return 0
+    for child in expr.children():
+        if not IsPure(child):
+            return 0
+    return 1
+
+
+def _IsCandidate(expr):
+    if IsConstant(expr) or isinstance(expr, ParsedVariableReferenceExpr):
+        return 0
+    if isinstance(expr, FunctionCall) and not expr._args:
+        # position(), last() and the like cost less than looking them up
+        return 0
+    # Node-sets are lists that the consumers may change
+    if ResultType(expr) not in ("boolean", "number", "string"):
+        return 0
+    return IsPure(expr)
+
+
+def _Count(expr, counts, common, seen):
+    """Count the nodes of expr, those inside a common node only once"""
+    counts[expr] = counts.get(expr, 0) + 1
+    if expr in common:
+        if expr in seen:
+            return
+        seen[expr] = None
+    for child in expr.children():
+        _Count(child, counts, common, seen)
+
+
+def _Size(expr):
+    size = 1
+    for child in expr.children():
+        size = size + _Size(child)
+    return size
+
+
+def _Rewrite(expr, common):
+    node = expr.copyWith(lambda child: _Rewrite(child, common))
+    if expr in common:
+        shared = common[expr]
+        if shared is None:
+            shared = common[expr] = ParsedCommonExpr(node)
+        return shared
+    return node
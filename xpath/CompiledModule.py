@@ -0,0 +1,259 @@
+########################################################################
+#
+# File Name:   CompiledModule.py
+#
+#
+"""
+Run-time support of the Python modules CodeGenerator writes.  Generated
+modules import this, the conversions, the core functions and the axes,
+but never the expression parser.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import hashlib
+import importlib
+import pickle
+from xml.dom import EMPTY_NAMESPACE
+from xml.dom import Node
+from xml.utils import boolean
+
+# localfolder
+from . import Conversions
+from . import CoreFunctions
+from . import NaN
+from . import RuntimeException
+from . import g_extFunctions
+from .__version__ import __version__
+
+
+
+# Bumped whenever the code CodeGenerator writes changes incompatibly
+FORMAT_VERSION = 1
+
+# Modules generated by another version of the library are never loaded
+LIBRARY_VERSION = __version__
+
+
+class StaleModuleError(ImportError):
+    pass
+
+
+def SourceHash(expressions):
+    """The hash a module generated from the list of expressions carries"""
+    text = "%s\0%d\0%s" % (LIBRARY_VERSION, FORMAT_VERSION, "\0".join(expressions))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def ReadRules(path):
+    """
+    The expressions of a rule file: one per line, ignoring blank lines
+    and lines starting with #
+    """
+    f = open(path, encoding="utf-8")
+    try:
+        lines = [line.strip() for line in f]
+    finally:
+        f.close()
+    return [line for line in lines if line and line[0] != "#"]
+
+
+def Check(name, formatVersion, libraryVersion):
+    """Called by generated modules when they are imported"""
+    if formatVersion != FORMAT_VERSION or libraryVersion != LIBRARY_VERSION:
+        raise StaleModuleError(
+            "%s was generated for version %s of the library (format %d), this is %s"
+            % (name, libraryVersion, formatVersion, LIBRARY_VERSION)
+        )
+
+
+def Load(name, expressions=None):
+    """
+    Import the generated module name.  If the expressions it should have
+    been generated from are given (see ReadRules), a module generated
+    from other expressions is rejected as stale.
+    """
+    module = importlib.import_module(name)
+    if expressions is not None and module.SOURCE_HASH != SourceHash(expressions):
+        raise StaleModuleError("%s was not generated from these rules" % name)
+    return module
+
+
+class Expression:
+    """
+    A generated expression.  It is used like a compiled expression tree:
+    evaluate(context) and, for location paths, select(context).
+    """
+
+    def __init__(self, expr, function):
+        self.expr = expr
+        self.evaluate = self.select = function
+
+    def __repr__(self):
+        return self.expr
+
+
+def Loads(data):
+    """A sub-expression the generator has no code for, as its tree"""
+    return pickle.loads(data)
+
+
+### Values ###
+
+
+def Variable(context, expanded):
+    try:
+        return context.varBindings[expanded]
+    except:
+        raise RuntimeException(RuntimeException.UNDEFINED_VARIABLE, expanded[0], expanded[1])
+
+
+def PrefixedVariable(context, prefix, local):
+    uri = context.processorNss.get(prefix)
+    if not uri:
+        raise RuntimeException(RuntimeException.UNDEFINED_PREFIX, prefix)
+    return Variable(context, (uri, local))
+
+
+def Boolean(value):
+    # Booleans are their own boolean value
+    if type(value) is boolean.BooleanType:
+        return value
+    return Conversions.BooleanValue(value)
+
+
+def Number(value):
+    # Numbers are their own number value
+    if type(value) is float:
+        return value
+    return Conversions.NumberValue(value)
+
+
+def Divide(left, right):
+    if right == 0:
+        return NaN
+    return left / right
+
+
+def Modulo(left, right):
+    if right == 0:
+        return NaN
+    return left % right
+
+
+### Functions ###
+
+
+def Call(func, name, context, *args):
+    """Call the core function func, called name in the expression"""
+    try:
+        return func(context, *args)
+    except TypeError:
+        raise RuntimeException(
+            RuntimeException.WRONG_ARGUMENTS, str((EMPTY_NAMESPACE, name)), ""
+        )
+
+
+class FunctionCallSite:
+    """
+    A call of an extension function, or of a function the library does not
+    know.  Like the expression trees, the function is looked up on the
+    first call.
+    """
+
+    def __init__(self, name, prefix, local):
+        self.name = name
+        self.prefix = prefix
+        self.local = local
+        self._func = None
+        self._expanded = None
+
+    def error(self, *args):
+        raise Exception("Unknown function call: %s" % self.name)
+
+    def __call__(self, context, *args):
+        if not self._func:
+            uri = context.processorNss.get(self.prefix)
+            if self.prefix and not uri:
+                raise RuntimeException(RuntimeException.UNDEFINED_PREFIX, self.prefix)
+            self._expanded = (self.prefix and uri or EMPTY_NAMESPACE, self.local)
+            self._func = g_extFunctions.get(
+                self._expanded
+            ) or CoreFunctions.CoreFunctions.get(self._expanded, self.error)
+        try:
+            return self._func(context, *args)
+        except TypeError:
+            raise RuntimeException(RuntimeException.WRONG_ARGUMENTS, str(self._expanded), "")
+
+
+### Common Sub-expressions ###
+
+
+def Common(context, function, positional):
+    """The value of the common sub-expression evaluated by function"""
+    values = context.commonValues
+    if values is None:
+        return function(context)
+    if positional:
+        key = (function, context.node, context.position, context.size)
+    else:
+        key = (function, context.node)
+    try:
+        return values[key]
+    except KeyError:
+        value = values[key] = function(context)
+        return value
+
+
+def Invariant(context, function, document):
+    """The value of the invariant sub-expression evaluated by function"""
+    values = context.commonValues
+    if values is None:
+        return function(context)
+    if document:
+        key = (function, context.node.ownerDocument or context.node)
+    else:
+        key = function
+    try:
+        value = values[key]
+    except KeyError:
+        value = values[key] = function(context)
+    if type(value) is list:
+        return value[:]
+    return value
+
+
+### Node Sets ###
+
+
+def Parent(context):
+    if context.node.nodeType == Node.ATTRIBUTE_NODE:
+        return [context.node.ownerElement]
+    return context.node.parentNode and [context.node.parentNode] or []
+
+
+def Filter(nodeList, context, reverse, predicates):
+    """Filter nodeList through the predicate functions"""
+    state = (context.node, context.position, context.size)
+    for pred in predicates:
+        size = len(nodeList)
+        ctr = 0
+        current = nodeList
+        nodeList = []
+        for node in current:
+            position = (reverse and size - ctr) or (ctr + 1)
+            context.node = node
+            context.position = position
+            context.size = size
+            res = pred(context)
+            if type(res) in (int, float):
+                if res == position:
+                    nodeList.append(node)
+            elif Conversions.BooleanValue(res):
+                nodeList.append(node)
+            ctr = ctr + 1
+    (context.node, context.position, context.size) = state
+    return nodeList
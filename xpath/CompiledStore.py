@@ -0,0 +1,196 @@
+########################################################################
+#
+# File Name:   CompiledStore.py
+#
+#
+"""
+A versioned on-disk store of compiled expression trees.  A store is
+written once (see Write and StoreWriter) and then memory-mapped by any
+number of processes, which load trees from it without running the parser.
+Stores hold pickles, so only open stores from trusted locations.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+
+# localfolder
+from .__version__ import __version__
+
+
+
+MAGIC = b"4XPC"
+FORMAT_VERSION = 1
+PICKLE_PROTOCOL = 4
+
+# Trees pickled by another version of the library are never loaded
+LIBRARY_VERSION = __version__
+
+# magic, format version, index offset, index length
+g_header = struct.Struct("<4sHQQ")
+
+
+class StoreError(ValueError):
+    pass
+
+
+def Key(expr, flavor):
+    """The digest an expression of the given parser flavor is stored under"""
+    text = "%s\0%s\0%s" % (LIBRARY_VERSION, flavor, expr)
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class StoreWriter:
+    """
+    Collects compiled trees and writes them out as a store.  The file is
+    written next to its final name and renamed into place on close, so
+    readers never see a partial store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tempPath = "%s.%d.tmp" % (path, os.getpid())
+        self._file = open(self._tempPath, "wb")
+        self._file.write(g_header.pack(MAGIC, FORMAT_VERSION, 0, 0))
+        self._index = {}
+
+    def add(self, expr, parser):
+        """Parse expr with parser and append the tree to the store"""
+        return self.addCompiled(expr, parser.flavor, parser.new().parse(expr))
+
+    def addCompiled(self, expr, flavor, compiled):
+        key = Key(expr, flavor)
+        if key not in self._index:
+            data = pickle.dumps(compiled, PICKLE_PROTOCOL)
+            self._index[key] = (self._file.tell(), len(data))
+            self._file.write(data)
+        return compiled
+
+    def close(self):
+        index = pickle.dumps(
+            {"version": LIBRARY_VERSION, "entries": self._index}, PICKLE_PROTOCOL
+        )
+        offset = self._file.tell()
+        self._file.write(index)
+        self._file.seek(0)
+        self._file.write(g_header.pack(MAGIC, FORMAT_VERSION, offset, len(index)))
+        self._file.close()
+        os.replace(self._tempPath, self.path)
+        return len(self._index)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tempPath)
+
+
+def Write(path, expressions, parser):
+    """Compile every expression with parser into a new store at path"""
+    writer = StoreWriter(path)
+    try:
+        for expr in expressions:
+            writer.add(expr, parser)
+    except:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+class CompiledStore:
+    """
+    A read-only view of a store written by StoreWriter.  Only the index is
+    read when the store is opened; each tree is unpickled from the mapping
+    when it is first asked for.  A store written by another version of the
+    library opens as stale and empty, so callers fall back to parsing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stale = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        f = open(path, "rb")
+        try:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        try:
+            self._index = self._readIndex()
+        except:
+            self._map.close()
+            raise
+
+    def _readIndex(self):
+        if len(self._map) < g_header.size:
+            raise StoreError("%s is not a compiled expression store" % self.path)
+        (magic, version, offset, length) = g_header.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise StoreError("%s is not a compiled expression store" % self.path)
+        if version != FORMAT_VERSION:
+            raise StoreError(
+                "%s has store format %d, expected %d" % (self.path, version, FORMAT_VERSION)
+            )
+        if offset + length > len(self._map):
+            raise StoreError("%s is truncated" % self.path)
+        index = pickle.loads(self._map[offset : offset + length])
+        if index["version"] != LIBRARY_VERSION:
+            self.stale = 1
+            return {}
+        return index["entries"]
+
+    def get(self, expr, flavor):
+        """Return the stored tree for expr, or None if it was not stored"""
+        entry = self._index.get(Key(expr, flavor))
+        self._lock.acquire()
+        try:
+            # A store closed under a reader loads nothing; the caller parses
+            if entry is None or self._map.closed:
+                self.misses = self.misses + 1
+                return None
+            self.hits = self.hits + 1
+            (offset, length) = entry
+            data = self._map[offset : offset + length]
+        finally:
+            self._lock.release()
+        return pickle.loads(data)
+
+    def compile(self, expr, parser):
+        """Return the tree for expr, parsing it with parser if not stored"""
+        flavor = getattr(parser, "flavor", None)
+        compiled = None
+        if flavor is not None:
+            compiled = self.get(expr, flavor)
+        if compiled is None:
+            compiled = parser.new().parse(expr)
+        return compiled
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            self._index = {}
+            self._map.close()
+        finally:
+            self._lock.release()
+
+    def __contains__(self, item):
+        (expr, flavor) = item
+        return Key(expr, flavor) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return "<CompiledStore at %x: %s, %d entries%s>" % (
+            id(self),
+            self.path,
+            len(self._index),
+            self.stale and " (stale)" or "",
+        )
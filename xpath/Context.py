@@ -22,6 +22,9 @@ from . import CoreFunctions
 class Context:
     functions = CoreFunctions.CoreFunctions
 
+    # Values of common sub-expressions, see CommonSubexpressions
+    commonValues = None
+
     def __init__(self, node, position=1, size=1, varBindings=None, processorNss=None):
         self.node = node
         self.position = position
@@ -0,0 +1,471 @@
+########################################################################
+#
+# File Name:   DocumentIndex.py
+#
+#
+"""
+Indexes of documents, kept for as long as the documents themselves.  The
+document-order rank of each node is computed once per document and
+looked up by the id of the node; the registry holds a weak reference to
+each document, so its index goes away with it and is never mistaken for
+that of a later document at the same address.  Documents may also be
+given a structural index, numbering their nodes in pre- and post-order,
+which tells in constant time whether a node is under another and lists
+the nodes under one as a range; the elements of each name are listed in
+it too, when first asked for, and those with each value of chosen
+attributes.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import sys
+import threading
+import weakref
+from xml.dom import Node
+
+# localfolder
+from . import g_xpathRecognizedNodes
+
+
+
+# What named gives for names no element has
+g_unnamed = ((), ())
+
+
+class DocumentIndex:
+    """
+    The document-order ranks of the nodes of one document, keyed by
+    id(node): each node is numbered before its attributes, and those
+    before its children.  version is that of the document when the ranks
+    were computed; serial orders the document among the others.
+    """
+
+    def __init__(self, doc, version, serial, structured=0):
+        self.version = version
+        self.serial = serial
+        if structured:
+            structure = StructureIndex(doc)
+            self.ranks = structure.ranks
+            self._structure = _Attach(doc, structure)
+        else:
+            self.ranks = Ranks(doc)
+            self._structure = lambda: None
+
+    def structure(self):
+        """
+        The StructureIndex of the document, if it was built with one;
+        None if not, or if it was replaced by another build since
+        """
+        return self._structure()
+
+    structure = property(structure)
+
+    def __len__(self):
+        return len(self.ranks)
+
+
+class StructureIndex:
+    """
+    The pre- and post-order numbers, level and parent of each node of one
+    document, the attributes of an element numbered as its first
+    children.  The pre-order number of a node is its rank in document
+    order.  The descendants of the node numbered pre are those numbered
+    pre + 1 through pre + size(pre), among them the attributes of the
+    elements under it; a node is before another in document order and
+    not one of its ancestors if both of its numbers are lower.
+    """
+
+    def __init__(self, doc):
+        recognized = set(g_xpathRecognizedNodes)
+        ELEMENT_NODE = Node.ELEMENT_NODE
+        # By pre-order number
+        self.nodes = nodes = []
+        self.post = post = []
+        self.level = level = []
+        self.parent = parent = []
+        count = 0
+        stack = [(iter([doc]), -1)]
+        while stack:
+            (children, parentPre) = stack[-1]
+            for node in children:
+                nodeType = node.nodeType
+                if nodeType not in recognized:
+                    continue
+                pre = len(nodes)
+                nodes.append(node)
+                post.append(None)
+                level.append(len(stack) - 1)
+                parent.append(parentPre)
+                if nodeType == ELEMENT_NODE:
+                    attrs = node.attributes
+                    if attrs:
+                        for attr in list(attrs.values()):
+                            nodes.append(attr)
+                            post.append(count)
+                            count = count + 1
+                            level.append(len(stack))
+                            parent.append(pre)
+                if node.childNodes:
+                    stack.append((iter(node.childNodes), pre))
+                    break
+                post[pre] = count
+                count = count + 1
+            else:
+                stack.pop()
+                if parentPre >= 0:
+                    post[parentPre] = count
+                    count = count + 1
+        self.ranks = dict([(id(node), pre) for (pre, node) in enumerate(nodes)])
+        # Built on first use, see named and valued
+        self._names = None
+        self._values = {}
+
+    def size(self, pre):
+        """How many nodes are under the node numbered pre"""
+        return self.post[pre] - pre + self.level[pre]
+
+    def isAncestor(self, node, other):
+        """Whether node is an ancestor of other, or the element of an attribute"""
+        (pre, otherPre) = (self.ranks[id(node)], self.ranks[id(other)])
+        return pre < otherPre and self.post[otherPre] < self.post[pre]
+
+    def isFollowing(self, node, other):
+        """Whether other follows node in document order and is not under it"""
+        (pre, otherPre) = (self.ranks[id(node)], self.ranks[id(other)])
+        return pre < otherPre and self.post[pre] < self.post[otherPre]
+
+    def descendantRange(self, node):
+        """The first and past the last pre-order number of the nodes under node"""
+        pre = self.ranks[id(node)]
+        return (pre + 1, pre + 1 + self.size(pre))
+
+    def outermost(self, nodes):
+        """
+        The nodes, which are in document order, that are not under
+        another of them; None if they are not all in the index, or one is
+        an attribute, or they are out of order
+        """
+        ranks = self.ranks
+        ATTRIBUTE_NODE = Node.ATTRIBUTE_NODE
+        result = []
+        last = end = -1
+        for node in nodes:
+            pre = ranks.get(id(node))
+            if pre is None or pre <= last or node.nodeType == ATTRIBUTE_NODE:
+                return None
+            last = pre
+            if pre >= end:
+                result.append(node)
+                end = pre + 1 + self.size(pre)
+        return result
+
+    def named(self, key):
+        """
+        The pre-order numbers and the elements with the name key, a node
+        name or a (namespace URI, local name) pair, each list in document
+        order
+        """
+        names = self._names
+        if names is None:
+            # Threads building them at once build the same
+            names = self._names = self._indexNames()
+        return names.get(key, g_unnamed)
+
+    def valued(self, name, value):
+        """
+        The pre-order numbers and the elements whose attribute of node name
+        name has the value value, each list in document order
+        """
+        values = self._values.get(name)
+        if values is None:
+            values = self._values[name] = self._indexValues(name)
+        return values.get(value, g_unnamed)
+
+    def _indexNames(self):
+        ELEMENT_NODE = Node.ELEMENT_NODE
+        names = {}
+        for (pre, node) in enumerate(self.nodes):
+            if node.nodeType == ELEMENT_NODE:
+                for key in (node.nodeName, (node.namespaceURI, node.localName)):
+                    named = names.get(key)
+                    if named is None:
+                        named = names[key] = ([], [])
+                    named[0].append(pre)
+                    named[1].append(node)
+        return names
+
+    def _indexValues(self, name):
+        # The attributes of an element are numbered right after it
+        (nodes, parent) = (self.nodes, self.parent)
+        ATTRIBUTE_NODE = Node.ATTRIBUTE_NODE
+        values = {}
+        for (pre, node) in enumerate(nodes):
+            if node.nodeType == ATTRIBUTE_NODE and node.nodeName == name:
+                valued = values.get(node.value)
+                if valued is None:
+                    valued = values[node.value] = ([], [])
+                element = parent[pre]
+                valued[0].append(element)
+                valued[1].append(nodes[element])
+        return values
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+class DocumentIndexRegistry:
+    """
+    The DocumentIndex of each document, built on first use.
+
+    A document that is changed must be reported with changed(doc), which
+    moves it to a new version; its index is built anew the next time it
+    is asked for.  Documents that cannot be weakly referenced are kept
+    until free(doc) is called for them.  Documents are numbered in the
+    order they are first seen, which is how nodes of different documents
+    are ordered.
+    """
+
+    def __init__(self):
+        # id(doc) -> [reference, version, DocumentIndex or None, serial,
+        #             whether to build a StructureIndex,
+        #             the names of the attributes whose values are indexed]
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._serial = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def get(self, doc):
+        """The current DocumentIndex of doc, building it if need be"""
+        entry = self._entry(doc)
+        index = entry[2]
+        if index is not None:
+            return index
+        # Built outside of the lock; two threads building the index of the
+        # same document at once both do, and the last one in wins
+        (version, structured) = (entry[1], entry[4])
+        index = DocumentIndex(doc, version, entry[3], structured)
+        self._lock.acquire()
+        try:
+            if entry[1] == version and entry[4] == structured:
+                entry[2] = index
+            self.builds = self.builds + 1
+        finally:
+            self._lock.release()
+        return index
+
+    def serial(self, doc):
+        """The number of doc in the order documents were first seen"""
+        return self._entry(doc)[3]
+
+    def indexStructure(self, doc):
+        """Build the StructureIndex of doc, and again whenever it changes"""
+        entry = self._entry(doc)
+        self._lock.acquire()
+        try:
+            if not entry[4]:
+                entry[4] = 1
+                entry[2] = None
+        finally:
+            self._lock.release()
+        return self.get(doc).structure
+
+    def structure(self, doc):
+        """The StructureIndex of doc if indexStructure was called for it"""
+        entry = self._entries.get(id(doc))
+        if entry is None or not entry[4] or entry[0]() is not doc:
+            return None
+        return (entry[2] or self.get(doc)).structure
+
+    def indexAttributes(self, doc, names):
+        """
+        Index the elements of doc by the values of their attributes of each
+        of names, node names, building its StructureIndex
+        """
+        entry = self._entry(doc)
+        self._lock.acquire()
+        try:
+            entry[5] = entry[5] | frozenset(names)
+        finally:
+            self._lock.release()
+        return self.indexStructure(doc)
+
+    def attributeIndex(self, doc, name):
+        """
+        The StructureIndex of doc if indexAttributes was called for it with
+        name among the names
+        """
+        entry = self._entries.get(id(doc))
+        if entry is None or name not in entry[5] or entry[0]() is not doc:
+            return None
+        return self.structure(doc)
+
+    def version(self, doc):
+        """How many times doc has been reported changed"""
+        entry = self._entries.get(id(doc))
+        if entry is None or entry[0]() is not doc:
+            return 0
+        return entry[1]
+
+    def changed(self, doc):
+        """Report that nodes of doc were added, removed or moved"""
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(id(doc))
+            if entry is not None and entry[0]() is doc:
+                entry[1] = entry[1] + 1
+                entry[2] = None
+                _Detach(doc)
+                self.invalidations = self.invalidations + 1
+        finally:
+            self._lock.release()
+
+    def free(self, doc):
+        """Forget the index of doc"""
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(id(doc))
+            if entry is not None and entry[0]() is doc:
+                del self._entries[id(doc)]
+                _Detach(doc)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self.builds = self.invalidations = 0
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """
+        The number of documents indexed, of nodes ranked, an estimate of
+        the bytes their indexes take, and how many indexes were built and
+        invalidated
+        """
+        self._lock.acquire()
+        try:
+            indexes = [entry[2] for entry in self._entries.values() if entry[2] is not None]
+        finally:
+            self._lock.release()
+        nodes = 0
+        size = 0
+        for index in indexes:
+            nodes = nodes + len(index)
+            size = size + _Size(index.ranks)
+        return {
+            "documents": len(indexes),
+            "nodes": nodes,
+            "bytes": size,
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+        }
+
+    def _entry(self, doc):
+        entry = self._entries.get(id(doc))
+        if entry is not None and entry[0]() is doc:
+            return entry
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(id(doc))
+            if entry is None or entry[0]() is not doc:
+                self._serial = self._serial + 1
+                entry = [self._reference(doc), 0, None, self._serial, 0, frozenset()]
+                self._entries[id(doc)] = entry
+            return entry
+        finally:
+            self._lock.release()
+
+    def _reference(self, doc):
+        # Caller must hold the lock
+        key = id(doc)
+
+        def Collected(reference):
+            self._lock.acquire()
+            try:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is reference:
+                    del self._entries[key]
+            finally:
+                self._lock.release()
+
+        try:
+            return weakref.ref(doc, Collected)
+        except TypeError:
+            return lambda: doc
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<DocumentIndexRegistry at %x: %d documents, %d builds>" % (
+            id(self),
+            len(self._entries),
+            self.builds,
+        )
+
+
+def Ranks(doc):
+    """
+    The document-order rank of each node of doc that XPath sees, keyed by
+    id(node)
+    """
+    recognized = set(g_xpathRecognizedNodes)
+    ELEMENT_NODE = Node.ELEMENT_NODE
+    ranks = {}
+    rank = 0
+    stack = [iter([doc])]
+    while stack:
+        for node in stack[-1]:
+            nodeType = node.nodeType
+            if nodeType not in recognized:
+                continue
+            ranks[id(node)] = rank
+            rank = rank + 1
+            if nodeType == ELEMENT_NODE:
+                attrs = node.attributes
+                if attrs:
+                    for attr in list(attrs.values()):
+                        ranks[id(attr)] = rank
+                        rank = rank + 1
+            children = node.childNodes
+            if children:
+                stack.append(iter(children))
+                break
+        else:
+            stack.pop()
+    return ranks
+
+
+def _Attach(doc, structure):
+    """
+    A function giving structure, which doc itself keeps alive: the nodes
+    it lists keep doc alive, so the registry must not hold it
+    """
+    try:
+        doc._xpathStructureIndex = structure
+    except (AttributeError, TypeError):
+        # Kept until the document is freed, as if it could not be weakly
+        # referenced
+        return lambda: structure
+    return weakref.ref(structure)
+
+
+def _Detach(doc):
+    if getattr(doc, "_xpathStructureIndex", None) is not None:
+        doc._xpathStructureIndex = None
+
+
+def _Size(ranks):
+    # The dictionary and the ints in it, those below 257 being shared
+    size = sys.getsizeof(ranks)
+    for (key, rank) in ranks.items():
+        size = size + sys.getsizeof(key)
+        if rank > 256:
+            size = size + sys.getsizeof(rank)
+    return size
@@ -0,0 +1,124 @@
+########################################################################
+#
+# File Name:   ExpressionCache.py
+#
+#
+"""
+A bounded, least-recently-used cache of compiled expressions.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import collections
+import threading
+
+
+
+DEFAULT_SIZE = 1024
+
+
+class ExpressionCache:
+    """
+    Maps (parser factory, expression text) to the parsed expression tree.
+
+    The parser factory is part of the key so that the same text compiled
+    as an expression and as a pattern never share an entry.  Parsing is
+    done outside of the lock; two threads missing on the same key at once
+    both parse, and the last one in wins.
+
+    If a CompiledStore is given, misses are loaded from it before falling
+    back to the parser.  If an optimizer is given, it is applied to each
+    tree before the tree is cached.
+    """
+
+    def __init__(self, maxSize=DEFAULT_SIZE, store=None, optimizer=None):
+        self.maxSize = maxSize
+        self.store = store
+        self.optimizer = optimizer
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compile(self, expr, parser):
+        """Return the parsed form of expr, parsing it with parser on a miss"""
+        key = (parser, expr)
+        compiled = self.get(key)
+        if compiled is None:
+            store = self.store
+            if store is not None:
+                compiled = store.compile(expr, parser)
+            else:
+                compiled = parser.new().parse(expr)
+            if self.optimizer is not None:
+                compiled = self.optimizer(compiled)
+            self.add(key, compiled)
+        return compiled
+
+    def get(self, key):
+        self._lock.acquire()
+        try:
+            compiled = self._entries.get(key)
+            if compiled is None:
+                self.misses = self.misses + 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits = self.hits + 1
+            return compiled
+        finally:
+            self._lock.release()
+
+    def add(self, key, compiled):
+        if self.maxSize <= 0:
+            return
+        self._lock.acquire()
+        try:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            self._trim()
+        finally:
+            self._lock.release()
+
+    def resize(self, maxSize):
+        self._lock.acquire()
+        try:
+            self.maxSize = maxSize
+            self._trim()
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxSize": self.maxSize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _trim(self):
+        # Caller must hold the lock
+        while len(self._entries) > max(self.maxSize, 0):
+            self._entries.popitem(last=False)
+            self.evictions = self.evictions + 1
+
+    def __repr__(self):
+        return "<ExpressionCache at %x: %d/%d entries, %d hits, %d misses>" % (
+            id(self),
+            len(self._entries),
+            self.maxSize,
+            self.hits,
+            self.misses,
+        )
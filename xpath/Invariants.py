@@ -0,0 +1,282 @@
+########################################################################
+#
+# File Name:   Invariants.py
+#
+#
+"""
+Hoisting of the invariant parts of predicates.  Sub-expressions of a
+predicate that depend on neither the context node, nor its position, nor
+the context size, such as /config/threshold, $limit * 2 or
+count(//error), are evaluated once while the expression is evaluated
+rather than once for each node the predicate filters.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# localfolder
+from . import ParsedNodeTest
+from .CommonSubexpressions import IsPure
+from .CommonSubexpressions import ParsedCommonExpr
+from .CommonSubexpressions import ParsedCommonScope
+from .Optimizer import CoreFunctionName
+from .Optimizer import IsConstant
+from .Optimizer import ParsedAttributeLookupStep
+from .Optimizer import ParsedConstantExpr
+from .Optimizer import ParsedFirstNodeExpr
+from .ParsedAbbreviatedAbsoluteLocationPath import ParsedAbbreviatedAbsoluteLocationPath
+from .ParsedAbbreviatedRelativeLocationPath import ParsedAbbreviatedRelativeLocationPath
+from .ParsedAbsoluteLocationPath import ParsedAbsoluteLocationPath
+from .ParsedAxisSpecifier import AxisSpecifier
+from .ParsedExpr import FunctionCall
+from .ParsedExpr import FunctionCall1
+from .ParsedExpr import FunctionCall2
+from .ParsedExpr import FunctionCall3
+from .ParsedExpr import FunctionCallN
+from .ParsedExpr import ParsedAdditiveExpr
+from .ParsedExpr import ParsedAndExpr
+from .ParsedExpr import ParsedEqualityExpr
+from .ParsedExpr import ParsedExistsExpr
+from .ParsedExpr import ParsedFilterExpr
+from .ParsedExpr import ParsedLiteralExpr
+from .ParsedExpr import ParsedMultiplicativeExpr
+from .ParsedExpr import ParsedNLiteralExpr
+from .ParsedExpr import ParsedOrExpr
+from .ParsedExpr import ParsedPathExpr
+from .ParsedExpr import ParsedRelationalExpr
+from .ParsedExpr import ParsedUnaryExpr
+from .ParsedExpr import ParsedUnionExpr
+from .ParsedExpr import ParsedVariableReferenceExpr
+from .ParsedNode import ParsedNode
+from .ParsedPredicateList import ParsedPredicateList
+from .ParsedRelativeLocationPath import ParsedRelativeLocationPath
+from .ParsedStep import ParsedAbbreviatedStep
+from .ParsedStep import ParsedStep
+
+
+
+# What the value of an expression depends on, besides its operands
+NODE = 1
+POSITION = 2
+SIZE = 4
+VARIABLES = 8
+# The document of the context node, e.g. for /a and id('x')
+DOCUMENT = 16
+
+CONTEXT = NODE | POSITION | SIZE
+EVERYTHING = CONTEXT | VARIABLES | DOCUMENT
+
+# What the predicates of a step (or the steps of a path) depend on
+# besides the nodes they are applied to
+OUTER = VARIABLES | DOCUMENT
+
+# Core functions that use the context node when called with fewer than
+# this many arguments
+g_nodeFunctions = {
+    "lang": 2,
+    "local-name": 1,
+    "name": 1,
+    "namespace-uri": 1,
+    "normalize-space": 1,
+    "number": 1,
+    "string": 1,
+    "string-length": 1,
+}
+
+
+class ParsedInvariantExpr(ParsedNode):
+    """
+    A sub-expression of a predicate whose value does not change from one
+    node to the next.  It is evaluated on first use in its
+    ParsedCommonScope, once for each document if it depends on the
+    document of the context node.
+    """
+
+    _fields = ("_expr",)
+
+    def __init__(self, expr):
+        self._expr = expr
+        self._document = Dependencies(expr) & DOCUMENT
+        self.resultType = expr.resultType
+        self.nodeSetProperties = expr.nodeSetProperties
+
+    def evaluate(self, context):
+        values = context.commonValues
+        if values is None:
+            return self._expr.evaluate(context)
+        if self._document:
+            key = (self, context.node.ownerDocument or context.node)
+        else:
+            key = self
+        try:
+            value = values[key]
+        except KeyError:
+            value = values[key] = self._expr.evaluate(context)
+        if type(value) is list:
+            # The callers may change the node-sets they are given
+            return value[:]
+        return value
+
+    select = evaluate
+
+    def pprint(self, indent=""):
+        print((indent + str(self)))
+        self._expr.pprint(indent + "  ")
+
+    def __str__(self):
+        return "<InvariantExpr at %x: %s>" % (id(self), repr(self))
+
+    def __repr__(self):
+        return repr(self._expr)
+
+
+def Hoist(expr):
+    """
+    Return expr with the invariant parts of its predicates evaluated once,
+    inside a ParsedCommonScope, or expr itself if there are none.
+    """
+    if not isinstance(expr, ParsedNode):
+        return expr
+    if isinstance(expr, ParsedCommonScope):
+        return expr.copyWith(lambda child: _Hoist(child, 0))
+    hoisted = _Hoist(expr, 0)
+    if hoisted is expr:
+        return expr
+    return ParsedCommonScope(hoisted)
+
+
+def Dependencies(expr):
+    """
+    What the value of expr depends on: NODE, POSITION, SIZE, VARIABLES
+    and DOCUMENT or'ed together.
+    """
+    dependencies = g_dependencies.get(expr.__class__)
+    if dependencies is None:
+        if isinstance(expr, (AxisSpecifier, ParsedNodeTest.NodeTestBase)):
+            # Only the steps they are part of use them
+            return 0
+        # Anything else may depend on anything
+        return EVERYTHING
+    return dependencies(expr)
+
+
+def IsInvariant(expr):
+    """Whether the value of expr is the same for any context node"""
+    return not Dependencies(expr) & CONTEXT
+
+
+def _Hoist(expr, looping):
+    if looping and _IsHoistable(expr):
+        return ParsedInvariantExpr(expr)
+    # Predicates are evaluated once for each node they filter
+    looping = looping or isinstance(expr, ParsedPredicateList)
+    return expr.copyWith(lambda child: _Hoist(child, looping))
+
+
+def _IsHoistable(expr):
+    if IsConstant(expr) or isinstance(expr, ParsedVariableReferenceExpr):
+        # Looking them up costs as much as looking up a value
+        return 0
+    if isinstance(expr, ParsedInvariantExpr):
+        return 0
+    if isinstance(expr, (AxisSpecifier, ParsedNodeTest.NodeTestBase, ParsedPredicateList)):
+        # Parts of steps, not expressions
+        return 0
+    return IsInvariant(expr) and IsPure(expr)
+
+
+### Dependencies of each kind of expression ###
+
+
+def _Nothing(expr):
+    return 0
+
+
+def _Operands(expr):
+    dependencies = 0
+    for child in expr.children():
+        dependencies = dependencies | Dependencies(child)
+    return dependencies
+
+
+def _Variable(expr):
+    return VARIABLES
+
+
+def _FunctionCall(expr):
+    name = CoreFunctionName(expr)
+    if name is None:
+        # Extension functions see the whole context
+        return EVERYTHING
+    dependencies = _Operands(expr)
+    if name == "position":
+        return dependencies | POSITION
+    if name == "last":
+        return dependencies | SIZE
+    if name == "id":
+        return dependencies | DOCUMENT
+    if len(expr._args) < g_nodeFunctions.get(name, 0):
+        return dependencies | NODE
+    return dependencies
+
+
+def _ContextNode(expr):
+    # Steps are taken from the context node, their predicates and further
+    # steps are evaluated for the nodes they select
+    return NODE | (_Operands(expr) & OUTER)
+
+
+def _Root(expr):
+    return DOCUMENT | (_Operands(expr) & OUTER)
+
+
+def _PathExpr(expr):
+    # The steps are taken from the nodes of the left operand
+    return Dependencies(expr._left) | (_Operands(expr) & OUTER)
+
+
+def _FilterExpr(expr):
+    dependencies = Dependencies(expr._filter)
+    if expr._predicates is not None:
+        dependencies = dependencies | (Dependencies(expr._predicates) & OUTER)
+    return dependencies
+
+
+def _Shared(expr):
+    return Dependencies(expr._expr)
+
+
+g_dependencies = {
+    ParsedLiteralExpr: _Nothing,
+    ParsedNLiteralExpr: _Nothing,
+    ParsedConstantExpr: _Nothing,
+    ParsedVariableReferenceExpr: _Variable,
+    FunctionCall: _FunctionCall,
+    FunctionCall1: _FunctionCall,
+    FunctionCall2: _FunctionCall,
+    FunctionCall3: _FunctionCall,
+    FunctionCallN: _FunctionCall,
+    ParsedUnionExpr: _Operands,
+    ParsedPathExpr: _PathExpr,
+    ParsedFilterExpr: _FilterExpr,
+    ParsedPredicateList: _Operands,
+    ParsedStep: _ContextNode,
+    ParsedAttributeLookupStep: _ContextNode,
+    ParsedAbbreviatedStep: _ContextNode,
+    ParsedRelativeLocationPath: _ContextNode,
+    ParsedAbbreviatedRelativeLocationPath: _ContextNode,
+    ParsedAbsoluteLocationPath: _Root,
+    ParsedAbbreviatedAbsoluteLocationPath: _Root,
+    ParsedOrExpr: _Operands,
+    ParsedAndExpr: _Operands,
+    ParsedEqualityExpr: _Operands,
+    ParsedRelationalExpr: _Operands,
+    ParsedAdditiveExpr: _Operands,
+    ParsedMultiplicativeExpr: _Operands,
+    ParsedUnaryExpr: _Operands,
+    ParsedCommonExpr: _Shared,
+    ParsedInvariantExpr: _Shared,
+    ParsedFirstNodeExpr: _Shared,
+    ParsedExistsExpr: _Shared,
+}
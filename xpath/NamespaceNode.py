@@ -18,11 +18,13 @@ from xml.xpath import NAMESPACE_NODE
 
 
 class NamespaceNode:
-    def __init__(self, prefix, uri, ownerDoc=None):
+    def __init__(self, prefix, uri, ownerDoc=None, parent=None):
         self.prefix = ""
         self.nodeName = self.localName = prefix
         self.namespaceURI = EMPTY_NAMESPACE
         self.value = uri
         self.nodeType = NAMESPACE_NODE
         self.ownerDocument = ownerDoc
+        # The element it is a namespace node of
+        self.parentNode = parent
         return
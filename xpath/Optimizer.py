@@ -0,0 +1,737 @@
+########################################################################
+#
+# File Name:   Optimizer.py
+#
+#
+"""
+Compile-time simplification of expression trees.  Sub-expressions that
+do not depend on the context are evaluated once and replaced by their
+value, and boolean and numeric identities are simplified away.  Values
+are computed by the expression classes themselves, so NaN, Infinity and
+division by zero come out exactly as they do at run time.  Location
+paths of the form //x are turned into descendant steps where that does
+not change their result, and steps that pick elements by the value of
+an attribute into lookups in the attribute index of the document, where
+it has one.  Each node is annotated with its result type
+where that is known, so that operators can skip converting the values
+of their operands, and node-set expressions with what is known of the
+order and number of the nodes they give, so that operators can skip
+sorting them.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import bisect
+import copy
+from xml.dom import EMPTY_NAMESPACE
+from xml.dom import Node
+from xml.utils import boolean
+
+# localfolder
+from . import Context
+from . import Conversions
+from . import Util
+from . import Inf
+from . import NaN
+from . import g_extFunctions
+from .ParsedAbbreviatedAbsoluteLocationPath import ParsedAbbreviatedAbsoluteLocationPath
+from .ParsedAbbreviatedRelativeLocationPath import ParsedAbbreviatedRelativeLocationPath
+from .ParsedAbsoluteLocationPath import ParsedAbsoluteLocationPath
+from .ParsedAxisSpecifier import ParsedAxisSpecifier
+from .ParsedAxisSpecifier import ParsedChildAxisSpecifier
+from .ParsedExpr import FunctionCall
+from .ParsedExpr import FunctionCall1
+from .ParsedExpr import FunctionCall2
+from .ParsedExpr import FunctionCall3
+from .ParsedExpr import FunctionCallN
+from .ParsedExpr import ParsedAdditiveExpr
+from .ParsedExpr import ParsedAndExpr
+from .ParsedExpr import ParsedEqualityExpr
+from .ParsedExpr import ParsedExistsExpr
+from .ParsedExpr import ParsedFilterExpr
+from .ParsedExpr import ParsedFunctionCallExpr
+from .ParsedExpr import ParsedLiteralExpr
+from .ParsedExpr import ParsedMultiplicativeExpr
+from .ParsedExpr import ParsedOrExpr
+from .ParsedExpr import ParsedPathExpr
+from .ParsedExpr import ParsedRelationalExpr
+from .ParsedExpr import ParsedUnaryExpr
+from .ParsedExpr import ParsedUnionExpr
+from .ParsedExpr import ParsedVariableReferenceExpr
+from .ParsedNode import NORMAL
+from .ParsedNode import ORDERED
+from .ParsedNode import ParsedNode
+from .ParsedNode import SIBLINGS
+from .ParsedNode import SINGLE
+from .ParsedNode import UNIQUE
+from .ParsedNodeTest import NodeNameTest
+from .ParsedPredicateList import ParsedPredicateList
+from .ParsedRelativeLocationPath import ParsedRelativeLocationPath
+from .ParsedStep import ParsedAbbreviatedStep
+from .ParsedStep import ParsedStep
+
+
+
+# Core functions whose value only depends on their arguments, given at
+# least this many of them (with fewer, some use the context node)
+g_pureFunctions = {
+    "boolean": 1,
+    "ceiling": 1,
+    "concat": 0,
+    "contains": 2,
+    "false": 0,
+    "floor": 1,
+    "normalize-space": 1,
+    "not": 1,
+    "number": 1,
+    "round": 1,
+    "starts-with": 2,
+    "string": 1,
+    "string-length": 1,
+    "substring": 2,
+    "substring-after": 2,
+    "substring-before": 2,
+    "translate": 3,
+    "true": 0,
+}
+
+# Result types of the core functions
+g_functionTypes = {
+    "boolean": "boolean",
+    "contains": "boolean",
+    "false": "boolean",
+    "lang": "boolean",
+    "not": "boolean",
+    "starts-with": "boolean",
+    "true": "boolean",
+    "ceiling": "number",
+    "count": "number",
+    "floor": "number",
+    "last": "number",
+    "number": "number",
+    "position": "number",
+    "round": "number",
+    "string-length": "number",
+    "sum": "number",
+    "id": "node-set",
+    "concat": "string",
+    "local-name": "string",
+    "name": "string",
+    "namespace-uri": "string",
+    "normalize-space": "string",
+    "string": "string",
+    "substring": "string",
+    "substring-after": "string",
+    "substring-before": "string",
+    "translate": "string",
+}
+
+# Core functions that only use the first node, in document order, of
+# their node-set argument
+g_firstNodeFunctions = [
+    "local-name",
+    "name",
+    "namespace-uri",
+    "normalize-space",
+    "number",
+    "string",
+    "string-length",
+]
+
+# Axes that select nodes with the same parent from a node, and those that
+# select at most one
+g_siblingAxes = [
+    "attribute",
+    "child",
+    "following-sibling",
+    "namespace",
+    "parent",
+    "preceding-sibling",
+    "self",
+]
+g_singleAxes = ["parent", "self"]
+# Axes whose nodes are a range of the pre-order numbers of a
+# StructureIndex, those of the child axis with the context node as parent
+g_lookupAxes = ["child", "descendant", "descendant-or-self", "self"]
+
+
+class ParsedConstantExpr(ParsedLiteralExpr):
+    """The value of a sub-expression, computed at compile time"""
+
+    _fields = ("_literal",)
+
+    def __init__(self, value):
+        self._literal = value
+
+    def structure(self):
+        # NaN is not equal to itself and 0.0 is equal to -0.0
+        return (self.__class__, type(self._literal), repr(self._literal))
+
+    def __getstate__(self):
+        state = ParsedLiteralExpr.__getstate__(self)
+        # The string value of NaN is only "NaN" for the NaN object itself
+        if self._literal is NaN:
+            state["_literal"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._literal is None:
+            self._literal = NaN
+
+    def __str__(self):
+        return "<Constant at %x: %s>" % (id(self), repr(self))
+
+    def __repr__(self):
+        value = self._literal
+        if boolean.IsBooleanType(value):
+            return value and "true()" or "false()"
+        if type(value) in (int, float):
+            if value != value:
+                return "(0 div 0)"
+            if value == Inf:
+                return "number('Infinity')"
+            if value == -Inf:
+                return "-number('Infinity')"
+            return repr(float(value))
+        if '"' in value:
+            return "'" + value + "'"
+        return '"' + value + '"'
+
+
+class ParsedFirstNodeExpr(ParsedNode):
+    """
+    The first node of a node-set known to be in document order, for the
+    core functions that only use that node
+    """
+
+    _fields = ("_expr",)
+
+    resultType = "node-set"
+
+    def __init__(self, expr):
+        self._expr = expr
+        self.nodeSetProperties = _FirstNodeProperties(self)
+
+    def evaluate(self, context):
+        # Only as much of the document is walked as it takes to find it
+        for node in self._expr.iterate(context):
+            return [node]
+        return []
+
+    select = evaluate
+
+    def pprint(self, indent=""):
+        print((indent + str(self)))
+        self._expr.pprint(indent + "  ")
+
+    def __str__(self):
+        return "<FirstNodeExpr at %x: %s>" % (id(self), repr(self))
+
+    def __repr__(self):
+        return repr(self._expr)
+
+
+class ParsedAttributeLookupStep(ParsedStep):
+    """
+    A step whose first predicate compares an attribute with a string or
+    a variable, as in descendant::x[@name = 'value'].  On documents whose
+    attribute name is indexed (see Util.IndexAttributes), the elements
+    with the value are looked up and those the step would select kept;
+    the other predicates filter them as usual.  Elsewhere it is the step.
+    """
+
+    def __init__(self, axis, nodeTest, predicates):
+        ParsedStep.__init__(self, axis, nodeTest, predicates)
+        self._reset()
+
+    def _reset(self):
+        predicates = self._predicates._predicates
+        # None when changed to something else than a comparison it knows
+        self._comparison = _AttributeComparison(predicates[0])
+        self._rest = None
+        if len(predicates) > 1:
+            self._rest = ParsedPredicateList(predicates[1:])
+            self._rest.specialize()
+
+    def evaluate(self, context):
+        nodes = self.lookup(context)
+        if nodes is None:
+            return ParsedStep.evaluate(self, context)
+        if self._rest is not None and nodes:
+            nodes = self._rest.filter(nodes, context, 0)
+        return nodes
+
+    select = evaluate
+
+    def iterate(self, context):
+        nodes = self.lookup(context)
+        if nodes is None:
+            return ParsedStep.iterate(self, context)
+        if self._rest is not None and nodes:
+            nodes = self._rest.filter(nodes, context, 0)
+        return iter(nodes)
+
+    def lookup(self, context):
+        """
+        The nodes the step and its first predicate select, from the
+        attribute index; None if there is none or the value is not a
+        string or a node-set
+        """
+        if self._comparison is None:
+            return None
+        (name, value) = self._comparison
+        node = context.node
+        structure = Util.g_documentIndexes.attributeIndex(node.ownerDocument or node, name)
+        if structure is None:
+            return None
+        pre = structure.ranks.get(id(node))
+        if pre is None:
+            return None
+        value = value.evaluate(context)
+        if isinstance(value, str):
+            values = [value]
+        elif type(value) is list:
+            values = {}
+            for item in value:
+                values[Conversions.StringValue(item)] = 1
+            values = list(values.keys())
+        else:
+            # Numbers and booleans compare otherwise
+            return None
+        axis = self._axis._axis
+        if axis == "self":
+            (start, end) = (pre, pre + 1)
+        elif axis == "descendant-or-self":
+            (start, end) = (pre, pre + 1 + structure.size(pre))
+        else:
+            (start, end) = (pre + 1, pre + 1 + structure.size(pre))
+        found = []
+        for value in values:
+            (pres, elements) = structure.valued(name, value)
+            first = bisect.bisect_left(pres, start)
+            last = bisect.bisect_left(pres, end, first)
+            found.extend([
+                (elementPre, element, value)
+                for (elementPre, element) in zip(pres[first:last], elements[first:last])
+            ])
+        if len(values) > 1:
+            found.sort(key=lambda item: item[0])
+        parent = axis == "child" and structure.parent
+        match = self._nodeTest.match
+        ELEMENT_NODE = Node.ELEMENT_NODE
+        result = []
+        for (elementPre, element, value) in found:
+            if parent and parent[elementPre] != pre:
+                continue
+            # Values changed since the index was built, without being
+            # reported, are not taken for the indexed ones
+            attribute = element.getAttributeNode(name)
+            if attribute is None or attribute.value != value:
+                continue
+            if match(context, element, ELEMENT_NODE):
+                result.append(element)
+        return result
+
+    def __str__(self):
+        return "<AttributeLookupStep at %x: %s>" % (id(self), repr(self))
+
+
+def Optimize(expr):
+    """Return expr with its constant parts folded and simplified"""
+    if not isinstance(expr, ParsedNode):
+        # e.g. trees of the C parser
+        return expr
+    expr = expr.copyWith(Optimize)
+    rule = g_rules.get(expr.__class__)
+    if rule is not None:
+        expr = rule(expr)
+    return _Annotate(expr)
+
+
+def _Annotate(expr):
+    """
+    expr annotated, its sub-expressions being so already.  Nodes given to
+    the optimizer may be shared, so a copy of expr is annotated, unless
+    the optimizer annotated expr itself the same way before.
+    """
+    resultType = ResultType(expr)
+    properties = NodeSetProperties(expr)
+    if expr.__dict__.get("_annotated") and (expr.resultType, expr.nodeSetProperties) == (
+        resultType,
+        properties,
+    ):
+        return expr
+    expr = copy.copy(expr)
+    expr.resultType = resultType
+    expr.nodeSetProperties = properties
+    expr._annotated = 1
+    expr.specialize()
+    return expr
+
+
+def IsConstant(expr):
+    return isinstance(expr, ParsedLiteralExpr)
+
+
+def ResultType(expr):
+    """'boolean', 'number', 'string' or 'node-set' if expr always has that type"""
+    if IsConstant(expr):
+        value = expr.evaluate(None)
+        if boolean.IsBooleanType(value):
+            return "boolean"
+        if type(value) in (int, float):
+            return "number"
+        return "string"
+    if isinstance(expr, FunctionCall):
+        return CoreFunctionName(expr) and g_functionTypes.get(expr._key[1])
+    # Nodes added after optimizing carry the type of what they wrap
+    return g_exprTypes.get(expr.__class__) or expr.resultType
+
+
+def NodeSetProperties(expr):
+    """
+    ORDERED, UNIQUE, SINGLE and SIBLINGS or'ed together for what always
+    holds of the node-sets expr evaluates to
+    """
+    properties = g_nodeSetProperties.get(expr.__class__)
+    if properties is None:
+        # Nodes added after optimizing carry those of what they wrap
+        return expr.nodeSetProperties
+    return properties(expr)
+
+
+def CoreFunctionName(expr):
+    """The local name of the core function expr calls, if it does"""
+    (prefix, local) = expr._key
+    if prefix or (EMPTY_NAMESPACE, local) in g_extFunctions:
+        return None
+    return local
+
+
+def _Fold(expr):
+    """Replace expr by its value if all of its operands are constants"""
+    for child in expr.children():
+        if not IsConstant(child):
+            return expr
+    try:
+        value = expr.evaluate(Context.Context(None))
+    except:
+        # Errors are left to be raised at run time
+        return expr
+    return ParsedConstantExpr(value)
+
+
+def _Convert(expr, name):
+    """expr converted by the core function name, the result type of it"""
+    resultType = ResultType(expr)
+    if resultType == g_functionTypes[name]:
+        return expr
+    if (EMPTY_NAMESPACE, name) in g_extFunctions:
+        return None
+    if name == "boolean" and resultType == "node-set":
+        return ParsedExistsExpr(expr)
+    return _Fold(ParsedFunctionCallExpr(name, [expr]))
+
+
+def _Boolean(expr, default):
+    result = _Convert(expr, "boolean")
+    if result is None:
+        return default
+    return result
+
+
+def _OrExpr(expr):
+    (left, right) = (expr._left, expr._right)
+    if IsConstant(left):
+        if Conversions.BooleanValue(left.evaluate(None)):
+            return ParsedConstantExpr(boolean.true)
+        return _Boolean(right, expr)
+    if IsConstant(right):
+        # The left operand has no side effects, so it need not be evaluated
+        if Conversions.BooleanValue(right.evaluate(None)):
+            return ParsedConstantExpr(boolean.true)
+        return _Boolean(left, expr)
+    return expr.copyWith(_Exists)
+
+
+def _AndExpr(expr):
+    (left, right) = (expr._left, expr._right)
+    if IsConstant(left):
+        if not Conversions.BooleanValue(left.evaluate(None)):
+            return ParsedConstantExpr(boolean.false)
+        return _Boolean(right, expr)
+    if IsConstant(right):
+        if not Conversions.BooleanValue(right.evaluate(None)):
+            return ParsedConstantExpr(boolean.false)
+        return _Boolean(left, expr)
+    return expr.copyWith(_Exists)
+
+
+def _Exists(expr):
+    # Only whether a node-set operand is empty matters
+    if ResultType(expr) == "node-set":
+        return ParsedExistsExpr(expr)
+    return expr
+
+
+def _UnaryExpr(expr):
+    # --x is number(x)
+    if isinstance(expr._exp, ParsedUnaryExpr):
+        result = _Convert(expr._exp._exp, "number")
+        if result is not None:
+            return result
+    return _Fold(expr)
+
+
+def _FunctionCall(expr):
+    name = CoreFunctionName(expr)
+    if name is None:
+        return expr
+    args = expr._args
+    if len(args) == 1:
+        arg = args[0]
+        argType = ResultType(arg)
+        if name in ("boolean", "number", "string") and argType == g_functionTypes[name]:
+            # Conversions to the type the argument already has
+            return arg
+        if name == "boolean" and argType == "node-set":
+            return ParsedExistsExpr(arg)
+        if name == "not":
+            if argType == "node-set":
+                return expr.copyWith(ParsedExistsExpr)
+            # not(not(x)) is boolean(x)
+            if isinstance(arg, FunctionCall1) and CoreFunctionName(arg) == "not":
+                return _Boolean(arg._arg0, expr)
+        if name in g_firstNodeFunctions:
+            # A node-set in document order need not be sorted, nor
+            # selected past its first node, to find the first node
+            properties = arg.nodeSetProperties
+            if properties & ORDERED and not properties & SINGLE:
+                return expr.copyWith(ParsedFirstNodeExpr)
+    if len(args) >= g_pureFunctions.get(name, len(args) + 1):
+        return _Fold(expr)
+    return expr
+
+
+def IsPositional(predicates):
+    """
+    Whether the result of the predicates may depend on the position or
+    size of the context: if one of them may be a number, or calls
+    position(), last() or a function that is not a core function.
+    """
+    for pred in predicates:
+        if ResultType(pred) not in ("boolean", "string", "node-set"):
+            return 1
+        if UsesPosition(pred):
+            return 1
+    return 0
+
+
+def UsesPosition(expr):
+    """Whether expr may depend on the position or size of the context"""
+    if isinstance(expr, FunctionCall):
+        if CoreFunctionName(expr) not in g_functionTypes:
+            return 1
+        if expr._key[1] in ("position", "last"):
+            return 1
+    for child in expr.children():
+        if UsesPosition(child):
+            return 1
+    return 0
+
+
+def _DescendantStep(step):
+    """
+    descendant::x[p] if step is child::x[p] and p is not positional, so
+    that descendant-or-self::node()/step can be replaced by it, else None
+    """
+    if step.__class__ not in (ParsedStep, ParsedAttributeLookupStep):
+        return None
+    if not isinstance(step._axis, ParsedChildAxisSpecifier):
+        return None
+    predicates = step._predicates
+    if predicates is not None and IsPositional(predicates):
+        return None
+    # Made from optimized parts, the step only needs annotating itself
+    step = ParsedStep(ParsedAxisSpecifier("descendant"), step._nodeTest, predicates)
+    return _Annotate(_Step(step))
+
+
+def _AbbreviatedAbsoluteLocationPath(expr):
+    # //x is /descendant::x.  For //x/y the rest of the path may visit
+    # nodes in another order, which the original sorts out; leave it.
+    # Other axes, among them the attribute axis (//@x), are left as well.
+    step = _DescendantStep(expr._rel)
+    if step is None:
+        return expr
+    return ParsedAbsoluteLocationPath(step)
+
+
+def _AbbreviatedRelativeLocationPath(expr):
+    # left//x is the union of descendant::x over the left nodes
+    step = _DescendantStep(expr._right)
+    if step is None:
+        return expr
+    return ParsedPathExpr(0, expr._left, step)
+
+
+def _PathExpr(expr):
+    if expr._step is None:
+        return expr
+    step = _DescendantStep(expr._right)
+    if step is None:
+        return expr
+    return ParsedPathExpr(0, expr._left, step)
+
+
+def _Step(step):
+    """
+    A ParsedAttributeLookupStep for a step of an axis in g_lookupAxes
+    whose first predicate compares an attribute with a string or a
+    variable; the predicates before the comparison would decide which
+    nodes it sees, so it has to be the first
+    """
+    if step.__class__ is not ParsedStep or step._axis._axis not in g_lookupAxes:
+        return step
+    if not step._predicates or _AttributeComparison(step._predicates._predicates[0]) is None:
+        return step
+    return ParsedAttributeLookupStep(step._axis, step._nodeTest, step._predicates)
+
+
+def _AttributeComparison(expr):
+    """
+    The node name of the attribute and the expression of the value, if
+    expr is @name = value or value = @name, value being a string
+    constant or a variable, which are the same for each node; else None
+    """
+    if expr.__class__ is not ParsedEqualityExpr or expr._op != "=":
+        return None
+    for (attribute, value) in [(expr._left, expr._right), (expr._right, expr._left)]:
+        if (
+            attribute.__class__ is ParsedStep
+            and attribute._axis._axis == "attribute"
+            and attribute._nodeTest.__class__ is NodeNameTest
+            and not attribute._predicates
+        ):
+            if value.__class__ is ParsedVariableReferenceExpr:
+                return (attribute._nodeTest._nodeName, value)
+            if IsConstant(value) and ResultType(value) == "string":
+                return (attribute._nodeTest._nodeName, value)
+    return None
+
+
+### Node-set properties of each kind of expression ###
+
+
+def _StepProperties(expr):
+    axis = expr._axis._axis
+    if axis == "namespace":
+        # Namespace nodes are made anew, in no particular order
+        properties = UNIQUE
+    else:
+        properties = NORMAL
+    if axis in g_siblingAxes:
+        properties = properties | SIBLINGS
+    if axis in g_singleAxes:
+        properties = properties | SINGLE
+    elif expr._predicates and expr._predicates.positionLimit(Context.Context(None)) == 1:
+        properties = properties | SINGLE
+    return properties
+
+
+def _AbbreviatedStepProperties(expr):
+    return NORMAL | SINGLE | SIBLINGS
+
+
+def _AbsoluteLocationPathProperties(expr):
+    # The steps are taken from the root node only
+    if expr._child is None:
+        return NORMAL | SINGLE | SIBLINGS
+    return expr._child.nodeSetProperties
+
+
+def _RelativeLocationPathProperties(expr):
+    # Merged in document order; from a single node, the nodes of the right
+    # operand are all there is
+    if expr._left.nodeSetProperties & SINGLE:
+        return NORMAL | (expr._right.nodeSetProperties & (SINGLE | SIBLINGS))
+    return NORMAL
+
+
+def _PathExprProperties(expr):
+    if expr._step is None:
+        return _RelativeLocationPathProperties(expr)
+    return NORMAL
+
+
+def _NormalProperties(expr):
+    return NORMAL
+
+
+def _FilterExprProperties(expr):
+    # Predicates keep some of the nodes, in the same order
+    return expr._filter.nodeSetProperties
+
+
+def _FirstNodeProperties(expr):
+    return expr._expr.nodeSetProperties | NORMAL | SINGLE | SIBLINGS
+
+
+g_nodeSetProperties = {
+    ParsedStep: _StepProperties,
+    ParsedAttributeLookupStep: _StepProperties,
+    ParsedAbbreviatedStep: _AbbreviatedStepProperties,
+    ParsedAbsoluteLocationPath: _AbsoluteLocationPathProperties,
+    ParsedRelativeLocationPath: _RelativeLocationPathProperties,
+    ParsedPathExpr: _PathExprProperties,
+    ParsedAbbreviatedAbsoluteLocationPath: _NormalProperties,
+    ParsedAbbreviatedRelativeLocationPath: _NormalProperties,
+    ParsedUnionExpr: _NormalProperties,
+    ParsedFilterExpr: _FilterExprProperties,
+    ParsedFirstNodeExpr: _FirstNodeProperties,
+}
+
+g_exprTypes = {
+    ParsedOrExpr: "boolean",
+    ParsedAndExpr: "boolean",
+    ParsedEqualityExpr: "boolean",
+    ParsedExistsExpr: "boolean",
+    ParsedRelationalExpr: "boolean",
+    ParsedAdditiveExpr: "number",
+    ParsedMultiplicativeExpr: "number",
+    ParsedUnaryExpr: "number",
+    ParsedAbbreviatedAbsoluteLocationPath: "node-set",
+    ParsedAbbreviatedRelativeLocationPath: "node-set",
+    ParsedAbsoluteLocationPath: "node-set",
+    ParsedRelativeLocationPath: "node-set",
+    ParsedAbbreviatedStep: "node-set",
+    ParsedStep: "node-set",
+    ParsedAttributeLookupStep: "node-set",
+    ParsedFilterExpr: "node-set",
+    ParsedPathExpr: "node-set",
+    ParsedUnionExpr: "node-set",
+    ParsedFirstNodeExpr: "node-set",
+}
+
+g_rules = {
+    ParsedOrExpr: _OrExpr,
+    ParsedAndExpr: _AndExpr,
+    ParsedEqualityExpr: _Fold,
+    ParsedRelationalExpr: _Fold,
+    ParsedAdditiveExpr: _Fold,
+    ParsedMultiplicativeExpr: _Fold,
+    ParsedUnaryExpr: _UnaryExpr,
+    FunctionCall: _FunctionCall,
+    FunctionCall1: _FunctionCall,
+    FunctionCall2: _FunctionCall,
+    FunctionCall3: _FunctionCall,
+    FunctionCallN: _FunctionCall,
+    ParsedAbbreviatedAbsoluteLocationPath: _AbbreviatedAbsoluteLocationPath,
+    ParsedAbbreviatedRelativeLocationPath: _AbbreviatedRelativeLocationPath,
+    ParsedPathExpr: _PathExpr,
+    ParsedStep: _Step,
+}
@@ -16,13 +16,19 @@ from xml.xpath import ParsedAxisSpecifier
 from xml.xpath import ParsedNodeTest
 from xml.xpath import ParsedPredicateList
 from xml.xpath import ParsedStep
+from xml.xpath import Util
+
+# localfolder
+from .ParsedNode import ParsedNode
 
 
 
 LOOKAHEAD_OPTIMIZERS = {}
 
 
-class ParsedAbbreviatedAbsoluteLocationPath:
+class ParsedAbbreviatedAbsoluteLocationPath(ParsedNode):
+    _fields = ("_step", "_rel")
+
     def __init__(self, rel):
         self._rel = rel
         nt = ParsedNodeTest.ParsedNodeTest("node", "")
@@ -37,19 +43,7 @@ class ParsedAbbreviatedAbsoluteLocationPath:
         root = context.node.ownerDocument or context.node
         context.setNodePosSize((root, 1, 1))
         rt = self._step.select(context)
-        res = []
-        l = len(rt)
-
-        sub_rt = []
-        for ctr in range(l):
-            n = rt[ctr]
-            context.setNodePosSize((n, ctr + 1, l))
-            sub_rt.extend(self._rel.select(context))
-
-        if sub_rt and hasattr(sub_rt[0], "ownerElement"):
-            result = sub_rt
-        else:
-            result = list(filter(lambda x, compare=sub_rt: x in compare, rt))
+        result = Util.Select(self._rel, rt, context)
 
         context.setNodePosSize(origState)
         return result
@@ -16,13 +16,16 @@ from xml.xpath import ParsedAxisSpecifier
 from xml.xpath import ParsedNodeTest
 from xml.xpath import ParsedPredicateList
 from xml.xpath import ParsedStep
+from xml.xpath import Util
 
 # localfolder
-from . import Set
+from .ParsedNode import ParsedNode
 
 
 
-class ParsedAbbreviatedRelativeLocationPath:
+class ParsedAbbreviatedRelativeLocationPath(ParsedNode):
+    _fields = ("_left", "_middle", "_right")
+
     def __init__(self, left, right):
         """
         left can be a step or a relative location path
@@ -36,25 +39,13 @@ class ParsedAbbreviatedRelativeLocationPath:
         self._middle = ParsedStep.ParsedStep(axisSpecifier, nt, ppl)
 
     def evaluate(self, context):
-        res = []
         rt = self._left.select(context)
-        l = len(rt)
 
         origState = context.copyNodePosSize()
-
-        for ctr in range(l):
-            context.setNodePosSize((rt[ctr], ctr + 1, l))
-            subRt = self._middle.select(context)
-            res = Set.Union(res, subRt)
-
-        rt = res
-        res = []
-        l = len(rt)
-        for ctr in range(l):
-            context.setNodePosSize((rt[ctr], ctr + 1, l))
-            subRt = self._right.select(context)
-            res = Set.Union(res, subRt)
-
+        # The descendants of nodes none of which contains another follow
+        # one another
+        rt = Util.Select(self._middle, rt, context, self._left.disjoint())
+        res = Util.Select(self._right, rt, context)
         context.setNodePosSize(origState)
         return res
 
@@ -11,8 +11,13 @@ Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
 See  http://4suite.org/COPYRIGHT  for license and copyright information
 """
 
+# localfolder
+from .ParsedNode import ParsedNode
+
+
+class ParsedAbsoluteLocationPath(ParsedNode):
+    _fields = ("_child",)
 
-class ParsedAbsoluteLocationPath:
     def __init__(self, child):
         self._child = child
 
@@ -31,6 +36,19 @@ class ParsedAbsoluteLocationPath:
 
     select = evaluate
 
+    def iterate(self, context):
+        root = context.node.ownerDocument or context.node
+
+        if self._child is None:
+            return iter([root])
+
+        origState = context.copyNodePosSize()
+        context.setNodePosSize((root, 1, 1))
+        nodes = self._child.iterate(context)
+        context.setNodePosSize(origState)
+
+        return nodes
+
     def pprint(self, indent=""):
         print((indent + str(self)))
         self._child and self._child.pprint(indent + "  ")
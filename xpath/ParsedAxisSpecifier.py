@@ -13,6 +13,7 @@ See  http://4suite.org/COPYRIGHT  for license and copyright information
 
 # stdlib
 
+import bisect
 import string
 from xml.dom import Node
 from xml.dom.ext import GetAllNs
@@ -21,6 +22,9 @@ from xml.xpath import NAMESPACE_NODE
 from xml.xpath import NamespaceNode
 from xml.xpath import Util
 
+# localfolder
+from .ParsedNode import ParsedNode
+
 
 
 def ParsedAxisSpecifier(axis):
@@ -30,28 +34,154 @@ def ParsedAxisSpecifier(axis):
         raise SyntaxError("Invalid axis: %s" % axis)
 
 
-class AxisSpecifier:
+class AxisSpecifier(ParsedNode):
+    _fields = ("_axis",)
+
 
     principalType = Node.ELEMENT_NODE
 
+    # Whether none of the nodes selected from a context node is an
+    # ancestor of another
+    disjoint = 0
+
+    # Whether the nodes selected from a context node are in its subtree
+    subtree = 0
+
+    # Whether the nodes selected from a descendant of a node are selected
+    # from that node too
+    nested = 0
+
     def __init__(self, axis):
         self._axis = axis
 
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """
         Always returns a tuple of node-set and 0 if forward, 1 if reverse.
+        If limit is given, axes may stop after the first limit nodes in
+        axis order (the nearest ones for reverse axes); the node-set is
+        still in document order.
         """
         return ([], 0)
 
-    def descendants(self, context, nodeTest, node, nodeSet):
+    def iterate(self, context, nodeTest):
+        """
+        The nodes of select, one at a time in document order.  Forward
+        axes find each node when it is asked for; the others select them
+        all first.
+        """
+        return iter(self.select(context, nodeTest)[0])
+
+    def structureIndex(self, node):
+        """
+        The StructureIndex of the document of node (see
+        Util.IndexStructure) and the pre-order number of node in it, or
+        (None, None) if there is none or node is not in it
+        """
+        structure = Util.g_documentIndexes.structure(node.ownerDocument or node)
+        if structure is None:
+            return (None, None)
+        pre = structure.ranks.get(id(node))
+        if pre is None:
+            return (None, None)
+        return (structure, pre)
+
+    def named(self, context, nodeTest, structure, pre):
+        """
+        The elements under the node numbered pre in structure that
+        nodeTest, the match method of a name test, selects by their name,
+        from its name index; None if nodeTest is not one
+        """
+        test = getattr(nodeTest, "__self__", None)
+        if test is None or self.principalType != Node.ELEMENT_NODE:
+            return None
+        nameKey = getattr(test, "nameKey", None)
+        key = nameKey and nameKey(context)
+        if key is None:
+            return None
+        (pres, nodes) = structure.named(key)
+        start = bisect.bisect_right(pres, pre)
+        end = bisect.bisect_left(pres, pre + 1 + structure.size(pre), start)
+        return nodes[start:end]
+
+    def indexed(self, context, nodeTest, nodes, nodeSet, limit=None):
+        """Select those of nodes, a range of a StructureIndex, that are not attributes"""
+        principalType = self.principalType
+        ATTRIBUTE_NODE = Node.ATTRIBUTE_NODE
+        for node in nodes:
+            if node.nodeType != ATTRIBUTE_NODE and nodeTest(context, node, principalType):
+                nodeSet.append(node)
+                if limit and len(nodeSet) >= limit:
+                    break
+        return nodeSet
+
+    def iterDescendants(self, context, nodeTest, node):
+        """The descendants of node, one at a time in document order"""
+        principalType = self.principalType
+        (structure, pre) = self.structureIndex(node)
+        if structure is not None:
+            named = self.named(context, nodeTest, structure, pre)
+            if named is not None:
+                for descendant in named:
+                    yield descendant
+                return
+            ATTRIBUTE_NODE = Node.ATTRIBUTE_NODE
+            for descendant in structure.nodes[pre + 1 : pre + 1 + structure.size(pre)]:
+                if descendant.nodeType != ATTRIBUTE_NODE and nodeTest(
+                    context, descendant, principalType
+                ):
+                    yield descendant
+            return
+        stack = [iter(node.childNodes)]
+        while stack:
+            for child in stack[-1]:
+                if nodeTest(context, child, principalType):
+                    yield child
+                if child.childNodes:
+                    stack.append(iter(child.childNodes))
+                    break
+            else:
+                stack.pop()
+
+    def descendants(self, context, nodeTest, node, nodeSet, limit=None):
         """Select all of the descendants from the context node"""
+        (structure, pre) = self.structureIndex(node)
+        if structure is not None:
+            named = self.named(context, nodeTest, structure, pre)
+            if named is not None:
+                if limit:
+                    named = named[: max(limit - len(nodeSet), 0)]
+                nodeSet.extend(named)
+                return (nodeSet, 0)
+            nodes = structure.nodes[pre + 1 : pre + 1 + structure.size(pre)]
+            return (self.indexed(context, nodeTest, nodes, nodeSet, limit), 0)
+        return self.walkDescendants(context, nodeTest, node, nodeSet, limit)
+
+    def walkDescendants(self, context, nodeTest, node, nodeSet, limit=None):
+        """descendants, following the child pointers of the nodes"""
         for child in node.childNodes:
             if nodeTest(context, child, self.principalType):
                 nodeSet.append(child)
+                if limit and len(nodeSet) >= limit:
+                    break
             if child.childNodes:
-                self.descendants(context, nodeTest, child, nodeSet)
+                self.walkDescendants(context, nodeTest, child, nodeSet, limit)
+                if limit and len(nodeSet) >= limit:
+                    break
         return (nodeSet, 0)
 
+    def reverseDescendants(self, context, nodeTest, node, nodeSet, limit=None):
+        """
+        Select node and its descendants in reverse document order, the
+        nearest to a following node first
+        """
+        for child in reversed(node.childNodes):
+            self.reverseDescendants(context, nodeTest, child, nodeSet, limit)
+            if limit and len(nodeSet) >= limit:
+                return (nodeSet, 1)
+        if nodeTest(context, node, self.principalType):
+            nodeSet.append(node)
+        return (nodeSet, 1)
+
     def pprint(self, indent=""):
         print((indent + str(self)))
 
@@ -64,7 +194,7 @@ class AxisSpecifier:
 
 
 class ParsedAncestorAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """Select all of the ancestors including the root"""
         nodeSet = []
         parent = (
@@ -75,13 +205,15 @@ class ParsedAncestorAxisSpecifier(AxisSpecifier):
         while parent:
             if nodeTest(context, parent, self.principalType):
                 nodeSet.append(parent)
+                if limit and len(nodeSet) >= limit:
+                    break
             parent = parent.parentNode
         nodeSet.reverse()
         return (nodeSet, 1)
 
 
 class ParsedAncestorOrSelfAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """Select all of the ancestors including ourselves through the root"""
         node = context.node
         if nodeTest(context, node, self.principalType):
@@ -93,7 +225,7 @@ class ParsedAncestorOrSelfAxisSpecifier(AxisSpecifier):
             and node.ownerElement
             or node.parentNode
         )
-        while parent:
+        while parent and not (limit and len(nodeSet) >= limit):
             if nodeTest(context, parent, self.principalType):
                 nodeSet.append(parent)
             parent = parent.parentNode
@@ -104,8 +236,9 @@ class ParsedAncestorOrSelfAxisSpecifier(AxisSpecifier):
 class ParsedAttributeAxisSpecifier(AxisSpecifier):
 
     principalType = Node.ATTRIBUTE_NODE
+    disjoint = subtree = 1
 
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """Select all of the attributes from the context node"""
         attrs = context.node.attributes
         rt = list(
@@ -120,8 +253,19 @@ class ParsedAttributeAxisSpecifier(AxisSpecifier):
 
 
 class ParsedChildAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    disjoint = subtree = 1
+
+    def select(self, context, nodeTest, limit=None):
         """Select all of the children of the context node"""
+        if limit:
+            rt = []
+            for node in context.node.childNodes:
+                if nodeTest(context, node, self.principalType):
+                    rt.append(node)
+                    if len(rt) >= limit:
+                        break
+            return (rt, 0)
         rt = list(
             filter(
                 lambda node, test=nodeTest, context=context, pt=self.principalType: test(
@@ -132,43 +276,97 @@ class ParsedChildAxisSpecifier(AxisSpecifier):
         )
         return (rt, 0)
 
+    def iterate(self, context, nodeTest):
+        return self._iterate(context, nodeTest, context.node)
+
+    def _iterate(self, context, nodeTest, node):
+        principalType = self.principalType
+        for child in node.childNodes:
+            if nodeTest(context, child, principalType):
+                yield child
+
 
 class ParsedDescendantOrSelfAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    subtree = nested = 1
+
+    def select(self, context, nodeTest, limit=None):
         """Select the context node and all of its descendants"""
         if nodeTest(context, context.node, self.principalType):
             nodeSet = [context.node]
+            if limit and limit <= 1:
+                return (nodeSet, 0)
         else:
             nodeSet = []
-        self.descendants(context, nodeTest, context.node, nodeSet)
+        self.descendants(context, nodeTest, context.node, nodeSet, limit)
         return (nodeSet, 0)
 
+    def iterate(self, context, nodeTest):
+        return self._iterate(context, nodeTest, context.node)
+
+    def _iterate(self, context, nodeTest, node):
+        if nodeTest(context, node, self.principalType):
+            yield node
+        for descendant in self.iterDescendants(context, nodeTest, node):
+            yield descendant
+
 
 class ParsedDescendantAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    subtree = nested = 1
+
+    def select(self, context, nodeTest, limit=None):
         nodeSet = []
-        self.descendants(context, nodeTest, context.node, nodeSet)
+        self.descendants(context, nodeTest, context.node, nodeSet, limit)
         return (nodeSet, 0)
 
+    def iterate(self, context, nodeTest):
+        return self.iterDescendants(context, nodeTest, context.node)
+
 
 class ParsedFollowingSiblingAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    disjoint = 1
+
+    def select(self, context, nodeTest, limit=None):
         """Select all of the siblings that follow the context node"""
         result = []
         sibling = context.node.nextSibling
         while sibling:
             if nodeTest(context, sibling, self.principalType):
                 result.append(sibling)
+                if limit and len(result) >= limit:
+                    break
             sibling = sibling.nextSibling
         return (result, 0)
 
+    def iterate(self, context, nodeTest):
+        return self._iterate(context, nodeTest, context.node)
+
+    def _iterate(self, context, nodeTest, node):
+        principalType = self.principalType
+        sibling = node.nextSibling
+        while sibling:
+            if nodeTest(context, sibling, principalType):
+                yield sibling
+            sibling = sibling.nextSibling
+
 
 class ParsedFollowingAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """
         Select all of the nodes the follow the context node,
         not including descendants.
         """
+        node = context.node
+        if node.nodeType == Node.ATTRIBUTE_NODE:
+            # As below, what follows the element of an attribute
+            node = node.ownerElement or node
+        (structure, pre) = self.structureIndex(node)
+        if structure is not None:
+            # All of the nodes after its subtree
+            nodes = structure.nodes[pre + 1 + structure.size(pre) :]
+            return (self.indexed(context, nodeTest, nodes, [], limit), 0)
         result = []
         curr = context.node
         while curr != (context.node.ownerDocument or context.node):
@@ -176,7 +374,10 @@ class ParsedFollowingAxisSpecifier(AxisSpecifier):
             while sibling:
                 if nodeTest(context, sibling, self.principalType):
                     result.append(sibling)
-                self.descendants(context, nodeTest, sibling, result)
+                if not (limit and len(result) >= limit):
+                    self.walkDescendants(context, nodeTest, sibling, result, limit)
+                if limit and len(result) >= limit:
+                    return (result, 0)
                 sibling = sibling.nextSibling
             curr = (
                 (curr.nodeType == Node.ATTRIBUTE_NODE)
@@ -185,12 +386,34 @@ class ParsedFollowingAxisSpecifier(AxisSpecifier):
             )
         return (result, 0)
 
+    def iterate(self, context, nodeTest):
+        return self._iterate(context, nodeTest, context.node)
+
+    def _iterate(self, context, nodeTest, node):
+        principalType = self.principalType
+        root = node.ownerDocument or node
+        curr = node
+        while curr is not None and curr is not root:
+            sibling = curr.nextSibling
+            while sibling:
+                if nodeTest(context, sibling, principalType):
+                    yield sibling
+                for descendant in self.iterDescendants(context, nodeTest, sibling):
+                    yield descendant
+                sibling = sibling.nextSibling
+            curr = (
+                (curr.nodeType == Node.ATTRIBUTE_NODE)
+                and curr.ownerElement
+                or curr.parentNode
+            )
+
 
 class ParsedNamespaceAxisSpecifier(AxisSpecifier):
 
     principalType = NAMESPACE_NODE
+    disjoint = subtree = 1
 
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """Select all of the namespaces from the context"""
         if context.node.nodeType != Node.ELEMENT_NODE:
             return ([], 0)
@@ -199,7 +422,7 @@ class ParsedNamespaceAxisSpecifier(AxisSpecifier):
         nss = GetAllNs(context.node)
         for prefix in list(nss.keys()):
             nsNode = NamespaceNode.NamespaceNode(
-                prefix, nss[prefix], (context.node.ownerDocument or context.node)
+                prefix, nss[prefix], (context.node.ownerDocument or context.node), context.node
             )
             if nodeTest(context, nsNode, self.principalType):
                 result.append(nsNode)
@@ -207,7 +430,10 @@ class ParsedNamespaceAxisSpecifier(AxisSpecifier):
 
 
 class ParsedParentAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    disjoint = 1
+
+    def select(self, context, nodeTest, limit=None):
         """Select the parent of the context node"""
         parent = (
             (context.node.nodeType == Node.ATTRIBUTE_NODE)
@@ -222,13 +448,18 @@ class ParsedParentAxisSpecifier(AxisSpecifier):
 
 
 class ParsedPrecedingSiblingAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    disjoint = 1
+
+    def select(self, context, nodeTest, limit=None):
         """Select all of the siblings that precede the context node"""
         result = []
         sibling = context.node.previousSibling
         while sibling:
             if nodeTest(context, sibling, self.principalType):
                 result.append(sibling)
+                if limit and len(result) >= limit:
+                    break
             sibling = sibling.previousSibling
         # Put the list in document order
         result.reverse()
@@ -236,8 +467,21 @@ class ParsedPrecedingSiblingAxisSpecifier(AxisSpecifier):
 
 
 class ParsedPrecedingAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+    def select(self, context, nodeTest, limit=None):
         """Select all of the nodes the precede the context node, not including ancestors"""
+        if limit:
+            return self.nearest(context, nodeTest, limit)
+
+        (structure, pre) = self.structureIndex(context.node)
+        if structure is not None:
+            # The nodes before it that end before it: not its ancestors
+            post = structure.post
+            last = post[pre]
+            nodes = [
+                node for (index, node) in enumerate(structure.nodes[:pre]) if post[index] < last
+            ]
+            return (self.indexed(context, nodeTest, nodes, []), 1)
+
         # Create a list of lists of descendants of the nodes
         # that precede the context node. (reverse doc order)
         doc_list = []
@@ -248,7 +492,7 @@ class ParsedPrecedingAxisSpecifier(AxisSpecifier):
                 result = []
                 if nodeTest(context, sib, self.principalType):
                     result = [sib]
-                self.descendants(context, nodeTest, sib, result)
+                self.walkDescendants(context, nodeTest, sib, result)
                 doc_list.append(result)
                 sib = sib.previousSibling
             curr = (
@@ -263,9 +507,29 @@ class ParsedPrecedingAxisSpecifier(AxisSpecifier):
             result.extend(doc_list[-i])
         return (result, 1)
 
+    def nearest(self, context, nodeTest, limit):
+        """Select the limit preceding nodes nearest to the context node"""
+        result = []
+        curr = context.node
+        while curr and len(result) < limit:
+            sib = curr.previousSibling
+            while sib and len(result) < limit:
+                self.reverseDescendants(context, nodeTest, sib, result, limit)
+                sib = sib.previousSibling
+            curr = (
+                curr.nodeType == Node.ATTRIBUTE_NODE
+                and curr.ownerElement
+                or curr.parentNode
+            )
+        result.reverse()
+        return (result, 1)
+
 
 class ParsedSelfAxisSpecifier(AxisSpecifier):
-    def select(self, context, nodeTest):
+
+    disjoint = subtree = 1
+
+    def select(self, context, nodeTest, limit=None):
         """Select the context node"""
         if nodeTest(context, context.node, self.principalType):
             return ([context.node], 0)
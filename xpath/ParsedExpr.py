@@ -14,6 +14,7 @@ See  http://4suite.org/COPYRIGHT  for license and copyright information
 # stdlib
 
 import collections
+import itertools
 import string
 import types
 from xml.dom import EMPTY_NAMESPACE
@@ -32,7 +33,8 @@ from xml.xpath import RuntimeException
 from xml.xpath import Util
 
 # localfolder
-from . import Set
+from .ParsedNode import NORMAL
+from .ParsedNode import ParsedNode
 
 
 
@@ -54,7 +56,9 @@ class NodeSet(collections.UserList):
         return st
 
 
-class ParsedLiteralExpr:
+class ParsedLiteralExpr(ParsedNode):
+    _fields = ("_literal",)
+
     def __init__(self, literal):
         if len(literal) >= 2 and (
             literal[0] in ["'", '"'] and literal[0] == literal[-1]
@@ -76,6 +80,8 @@ class ParsedLiteralExpr:
 
 
 class ParsedNLiteralExpr(ParsedLiteralExpr):
+    _fields = ("_nliteral",)
+
     def __init__(self, nliteral):
         ParsedLiteralExpr.__init__(self, "")
         self._nliteral = nliteral
@@ -91,7 +97,9 @@ class ParsedNLiteralExpr(ParsedLiteralExpr):
         return str(self._nliteral)
 
 
-class ParsedVariableReferenceExpr:
+class ParsedVariableReferenceExpr(ParsedNode):
+    _fields = ("_name",)
+
     def __init__(self, name):
         self._name = name
         self._key = SplitQName(name[1:])
@@ -136,7 +144,9 @@ def ParsedFunctionCallExpr(name, args):
     return FunctionCallN(name, key, args)
 
 
-class FunctionCall:
+class FunctionCall(ParsedNode):
+    _fields = ("_name", "_args")
+
     def __init__(self, name, key, args):
         self._name = name
         self._key = key
@@ -171,11 +181,25 @@ class FunctionCall:
     def __getinitargs__(self):
         return (self._name, self._key, self._args)
 
+    def _reset(self):
+        self.__init__(self._name, self._key, self._args)
+
     def __getstate__(self):
-        state = vars(self).copy()
+        state = ParsedNode.__getstate__(self)
         del state["_func"]
         return state
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._func = None
+
+    def structure(self):
+        if self._key[0]:
+            # The function a prefixed name resolves to, which is cached in
+            # _func, depends on the namespaces of the context: never equal
+            return ParsedNode.structure(self) + (id(self),)
+        return ParsedNode.structure(self)
+
     def __str__(self):
         return "<%s at %x: %s>" % (self.__class__.__name__, id(self), repr(self))
 
@@ -289,10 +313,20 @@ class FunctionCallN(FunctionCall):
 # These must return a node set
 
 
-class ParsedUnionExpr:
+class ParsedUnionExpr(ParsedNode):
+    _fields = ("_left", "_right")
+
     def __init__(self, left, right):
         self._left = left
         self._right = right
+        # a | b | c is ((a | b) | c): all of the operands are merged at once
+        if isinstance(left, ParsedUnionExpr):
+            self._operands = left._operands + [right]
+        else:
+            self._operands = [left, right]
+
+    def _reset(self):
+        self.__init__(self._left, self._right)
 
     def pprint(self, indent=""):
         print((indent + str(self)))
@@ -300,15 +334,20 @@ class ParsedUnionExpr:
         self._right.pprint(indent + "  ")
 
     def evaluate(self, context):
-        lSet = self._left.evaluate(context)
-        if type(lSet) != type([]):
-            raise StringException("Left Expression does not evaluate to a node set")
-        rSet = self._right.evaluate(context)
-        if type(rSet) != type([]):
-            raise StringException("Right Expression does not evaluate to a node set")
-        set = Set.Union(lSet, rSet)
-        set = Util.SortDocOrder(set)
-        return set
+        sets = []
+        side = "Left"
+        for expr in self._operands:
+            set = expr.evaluate(context)
+            if type(set) != type([]):
+                raise StringException("%s Expression does not evaluate to a node set" % side)
+            side = "Right"
+            if set:
+                sets.append(set)
+                normal = expr.nodeSetProperties & NORMAL == NORMAL
+        if len(sets) == 1 and normal:
+            # The other operands are empty
+            return sets[0]
+        return Util.MergeDocOrder(sets)
 
     def __str__(self):
         return "<UnionExpr at %x: %s>" % (id(self), repr(self))
@@ -317,7 +356,9 @@ class ParsedUnionExpr:
         return repr(self._left) + " | " + repr(self._right)
 
 
-class ParsedPathExpr:
+class ParsedPathExpr(ParsedNode):
+    _fields = ("_left", "_step", "_right")
+
     def __init__(self, descendant, left, right):
         self._left = left
         self._right = right
@@ -346,29 +387,30 @@ class ParsedPathExpr:
                 "Invalid Expression for a PathExpr %s" % str(self._left)
             )
 
+        # The results from each node are merged in document order, or just
+        # joined if they are known not to overlap (see Util.Select)
+        disjoint = self._left.disjoint()
         origState = context.copyNodePosSize()
         if self._step:
-            res = []
-            l = len(rt)
-            for ctr in range(l):
-                r = rt[ctr]
-                context.setNodePosSize((r, ctr + 1, l))
-                subRt = self._step.select(context)
-                res = Set.Union(res, subRt)
-            rt = res
-        res = []
-        l = len(rt)
-        for ctr in range(l):
-            r = rt[ctr]
-            context.setNodePosSize((r, ctr + 1, l))
-            subRt = self._right.select(context)
-            if type(subRt) != type([]):
-                raise Exception("Right Expression does not evaluate to a Node Set")
-            res = Set.Union(res, subRt)
-
+            rt = Util.Select(self._step, rt, context, disjoint)
+            disjoint = 0
+        res = Util.Select(self._right, rt, context, disjoint and self._right.subtree())
         context.setNodePosSize(origState)
         return res
 
+    select = evaluate
+
+    def iterate(self, context):
+        if self._step or not (self._left.disjoint() and self._right.subtree()):
+            # Only merged in document order once they are all there
+            return iter(self.evaluate(context))
+        rt = self._left.evaluate(context)
+        if type(rt) != type([]):
+            raise StringException(
+                "Invalid Expression for a PathExpr %s" % str(self._left)
+            )
+        return Util.IterSelect(self._right, rt, context)
+
     def __str__(self):
         return "<PathExpr at %x: %s>" % (id(self), repr(self))
 
@@ -377,7 +419,9 @@ class ParsedPathExpr:
         return repr(self._left) + op + repr(self._right)
 
 
-class ParsedFilterExpr:
+class ParsedFilterExpr(ParsedNode):
+    _fields = ("_filter", "_predicates")
+
     def __init__(self, filter, predicates):
         self._filter = filter
         self._predicates = predicates
@@ -387,7 +431,15 @@ class ParsedFilterExpr:
         evaluate(context) -> node-set
         Evaluate our filter into a node set, filter that through the predicates.
         """
-        node_set = self._filter.evaluate(context)
+        limit = None
+        if self._predicates and self._filter.resultType == "node-set":
+            # Only as many nodes as a positional predicate can keep are
+            # selected, e.g. for (//item)[1]
+            limit = self._predicates.positionLimit(context)
+        if limit is None:
+            node_set = self._filter.evaluate(context)
+        else:
+            node_set = list(itertools.islice(self._filter.iterate(context), limit))
         if type(node_set) != type([]):
             raise StringException(
                 "ParsedFilterExpr: return value must evalute to a node-set"
@@ -415,7 +467,9 @@ class ParsedFilterExpr:
 # All will return a boolean value
 
 
-class ParsedOrExpr:
+class ParsedOrExpr(ParsedNode):
+    _fields = ("_left", "_right")
+
     def __init__(self, left, right):
         self._left = left
         self._right = right
@@ -425,10 +479,23 @@ class ParsedOrExpr:
         self._left.pprint(indent + "  ")
         self._right.pprint(indent + "  ")
 
+    # Whether the operands are known to be booleans, see specialize
+    _leftBoolean = _rightBoolean = 0
+
+    def specialize(self):
+        self._leftBoolean = self._left.resultType == "boolean"
+        self._rightBoolean = self._right.resultType == "boolean"
+
     def evaluate(self, context):
-        rt = Conversions.BooleanEvaluate(self._left, context)
+        if self._leftBoolean:
+            rt = self._left.evaluate(context)
+        else:
+            rt = Conversions.BooleanEvaluate(self._left, context)
         if not rt:
-            rt = Conversions.BooleanEvaluate(self._right, context)
+            if self._rightBoolean:
+                rt = self._right.evaluate(context)
+            else:
+                rt = Conversions.BooleanEvaluate(self._right, context)
         return rt
 
     def __str__(self):
@@ -438,15 +505,30 @@ class ParsedOrExpr:
         return repr(self._left) + " or " + repr(self._right)
 
 
-class ParsedAndExpr:
+class ParsedAndExpr(ParsedNode):
+    _fields = ("_left", "_right")
+
     def __init__(self, left, right):
         self._left = left
         self._right = right
 
+    # Whether the operands are known to be booleans, see specialize
+    _leftBoolean = _rightBoolean = 0
+
+    def specialize(self):
+        self._leftBoolean = self._left.resultType == "boolean"
+        self._rightBoolean = self._right.resultType == "boolean"
+
     def evaluate(self, context):
-        rt = Conversions.BooleanEvaluate(self._left, context)
+        if self._leftBoolean:
+            rt = self._left.evaluate(context)
+        else:
+            rt = Conversions.BooleanEvaluate(self._left, context)
         if rt:
-            rt = Conversions.BooleanEvaluate(self._right, context)
+            if self._rightBoolean:
+                rt = self._right.evaluate(context)
+            else:
+                rt = Conversions.BooleanEvaluate(self._right, context)
         return rt
 
     def __str__(self):
@@ -456,69 +538,195 @@ class ParsedAndExpr:
         return repr(self._left) + " and " + repr(self._right)
 
 
+class ParsedExistsExpr(ParsedNode):
+    """
+    Whether a node-set expression selects any node, as boolean() of it;
+    the document is walked no further than to the first node found
+    """
+
+    _fields = ("_expr",)
+
+    resultType = "boolean"
+
+    def __init__(self, expr):
+        self._expr = expr
+
+    def evaluate(self, context):
+        for node in self._expr.iterate(context):
+            return boolean.true
+        return boolean.false
+
+    def pprint(self, indent=""):
+        print((indent + str(self)))
+        self._expr.pprint(indent + "  ")
+
+    def __str__(self):
+        return "<ExistsExpr at %x: %s>" % (id(self), repr(self))
+
+    def __repr__(self):
+        return "boolean(%s)" % repr(self._expr)
+
+
 NumberTypes = [int, float, int]
 
 
-class ParsedEqualityExpr:
+def Compare(op, lrt, rrt):
+    """Compare two values with the equality operator op, "=" or "!="."""
+    if op == "=":
+        true = boolean.true
+        false = boolean.false
+    else:
+        true = boolean.false
+        false = boolean.true
+
+    lType = type(lrt)
+    rType = type(rrt)
+    if lType == list == rType:
+        # Node set to node set
+        for right_curr in rrt:
+            right_curr = Conversions.StringValue(right_curr)
+            for left_curr in lrt:
+                if right_curr == Conversions.StringValue(left_curr):
+                    return true
+        return false
+    elif lType == list or rType == list:
+        func = None
+        if lType == list:
+            set = lrt
+            val = rrt
+        else:
+            set = rrt
+            val = lrt
+        if type(val) in NumberTypes:
+            func = Conversions.NumberValue
+        elif boolean.IsBooleanType(val):
+            func = Conversions.BooleanValue
+        elif type(val) == bytes:
+            func = Conversions.StringValue
+        else:
+            # Deal with e.g. RTFs
+            val = Conversions.StringValue(val)
+            func = Conversions.StringValue
+        for n in set:
+            if func(n) == val:
+                return true
+        return false
+
+    if boolean.IsBooleanType(lrt) or boolean.IsBooleanType(rrt):
+        rt = Conversions.BooleanValue(lrt) == Conversions.BooleanValue(rrt)
+    elif lType in NumberTypes or rType in NumberTypes:
+        rt = Conversions.NumberValue(lrt) == Conversions.NumberValue(rrt)
+    else:
+        rt = Conversions.StringValue(lrt) == Conversions.StringValue(rrt)
+    if rt:
+        # Due to the swapping of true/false, true might evaluate to 0
+        # We cannot compact this to 'rt and true or false'
+        return true
+    return false
+
+
+def CompareValues(op, lrt, rrt):
+    """Compare two booleans, two numbers or two strings"""
+    return _Result(op, lrt == rrt)
+
+
+def CompareNodeSetNumber(op, lrt, rrt):
+    """Compare a node-set with a number"""
+    if type(lrt) == list:
+        return CompareNodesNumber(op, lrt, rrt)
+    return CompareNodesNumber(op, rrt, lrt)
+
+
+def CompareNodeSetString(op, lrt, rrt):
+    """Compare a node-set with a string"""
+    if type(lrt) == list:
+        return CompareNodesString(op, lrt, rrt)
+    return CompareNodesString(op, rrt, lrt)
+
+
+def CompareNodesNumber(op, nodes, value):
+    """Compare the nodes, from any iterable, with a number"""
+    NumberValue = Conversions.NumberValue
+    for node in nodes:
+        if NumberValue(node) == value:
+            return _Result(op, 1)
+    return _Result(op, 0)
+
+
+def CompareNodesString(op, nodes, value):
+    """Compare the nodes, from any iterable, with a string"""
+    StringValue = Conversions.StringValue
+    for node in nodes:
+        if StringValue(node) == value:
+            return _Result(op, 1)
+    return _Result(op, 0)
+
+
+def _Result(op, equal):
+    if equal == (op == "="):
+        return boolean.true
+    return boolean.false
+
+
+# The comparisons for operands of known types, as Compare would do them
+g_typedComparisons = {
+    ("boolean", "boolean"): CompareValues,
+    ("number", "number"): CompareValues,
+    ("string", "string"): CompareValues,
+    ("node-set", "number"): CompareNodeSetNumber,
+    ("number", "node-set"): CompareNodeSetNumber,
+    ("node-set", "string"): CompareNodeSetString,
+    ("string", "node-set"): CompareNodeSetString,
+}
+
+# The same comparisons, of the nodes of the node-set operand as they are
+# selected with the value of the other
+g_nodeComparisons = {
+    ("node-set", "number"): CompareNodesNumber,
+    ("number", "node-set"): CompareNodesNumber,
+    ("node-set", "string"): CompareNodesString,
+    ("string", "node-set"): CompareNodesString,
+}
+
+
+class ParsedEqualityExpr(ParsedNode):
+    _fields = ("_op", "_left", "_right")
+
+    # The comparison of the operand values, see specialize
+    _compare = staticmethod(Compare)
+
+    # The comparison of the nodes of a node-set operand, one at a time,
+    # with the value of the other, and whether that is the right operand
+    _compareNodes = None
+    _nodesRight = 0
+
     def __init__(self, op, left, right):
         self._op = op
         self._left = left
         self._right = right
 
-    def evaluate(self, context):
-        if self._op == "=":
-            true = boolean.true
-            false = boolean.false
-        else:
-            true = boolean.false
-            false = boolean.true
+    def specialize(self):
+        types = (self._left.resultType, self._right.resultType)
+        self._compare = g_typedComparisons.get(types, Compare)
+        self._compareNodes = g_nodeComparisons.get(types)
+        self._nodesRight = types[1] == "node-set"
 
+    def evaluate(self, context):
+        if self._compareNodes is not None:
+            # The nodes are selected only until one of them is equal
+            if self._nodesRight:
+                (nodes, other) = (self._right, self._left)
+            else:
+                (nodes, other) = (self._left, self._right)
+            value = other.evaluate(context)
+            return self._compareNodes(self._op, nodes.iterate(context), value)
         lrt = self._left.evaluate(context)
         rrt = self._right.evaluate(context)
-        lType = type(lrt)
-        rType = type(rrt)
-        if lType == list == rType:
-            # Node set to node set
-            for right_curr in rrt:
-                right_curr = Conversions.StringValue(right_curr)
-                for left_curr in lrt:
-                    if right_curr == Conversions.StringValue(left_curr):
-                        return true
-            return false
-        elif lType == list or rType == list:
-            func = None
-            if lType == list:
-                set = lrt
-                val = rrt
-            else:
-                set = rrt
-                val = lrt
-            if type(val) in NumberTypes:
-                func = Conversions.NumberValue
-            elif boolean.IsBooleanType(val):
-                func = Conversions.BooleanValue
-            elif type(val) == bytes:
-                func = Conversions.StringValue
-            else:
-                # Deal with e.g. RTFs
-                val = Conversions.StringValue(val)
-                func = Conversions.StringValue
-            for n in set:
-                if func(n) == val:
-                    return true
-            return false
+        return self.compare(lrt, rrt)
 
-        if boolean.IsBooleanType(lrt) or boolean.IsBooleanType(rrt):
-            rt = Conversions.BooleanValue(lrt) == Conversions.BooleanValue(rrt)
-        elif lType in NumberTypes or rType in NumberTypes:
-            rt = Conversions.NumberValue(lrt) == Conversions.NumberValue(rrt)
-        else:
-            rt = Conversions.StringValue(lrt) == Conversions.StringValue(rrt)
-        if rt:
-            # Due to the swapping of true/false, true might evaluate to 0
-            # We cannot compact this to 'rt and true or false'
-            return true
-        return false
+    def compare(self, lrt, rrt):
+        """Compare the values of the operands"""
+        return self._compare(self._op, lrt, rrt)
 
     def pprint(self, indent=""):
         print((indent + str(self)))
@@ -536,7 +744,9 @@ class ParsedEqualityExpr:
         return repr(self._left) + op + repr(self._right)
 
 
-class ParsedRelationalExpr:
+class ParsedRelationalExpr(ParsedNode):
+    _fields = ("_op", "_left", "_right")
+
     def __init__(self, opcode, left, right):
         self._op = opcode
 
@@ -554,13 +764,33 @@ class ParsedRelationalExpr:
             self._right = right
             self._rightLit = 0
 
+    def _reset(self):
+        # copyWith may have replaced an operand by a constant
+        if isinstance(self._left, ParsedLiteralExpr):
+            self._left = Conversions.NumberValue(self._left.evaluate(None))
+            self._leftLit = 1
+        if isinstance(self._right, ParsedLiteralExpr):
+            self._right = Conversions.NumberValue(self._right.evaluate(None))
+            self._rightLit = 1
+
+    # Whether the operands are known to be numbers, see specialize
+    _leftNumber = _rightNumber = 0
+
+    def specialize(self):
+        self._leftNumber = not self._leftLit and self._left.resultType == "number"
+        self._rightNumber = not self._rightLit and self._right.resultType == "number"
+
     def evaluate(self, context):
         if self._leftLit:
             lrt = self._left
+        elif self._leftNumber:
+            lrt = self._left.evaluate(context)
         else:
             lrt = Conversions.NumberValue(self._left.evaluate(context))
         if self._rightLit:
             rrt = self._right
+        elif self._rightNumber:
+            rrt = self._right.evaluate(context)
         else:
             rrt = Conversions.NumberValue(self._right.evaluate(context))
 
@@ -603,7 +833,9 @@ class ParsedRelationalExpr:
 # Number Expressions
 
 
-class ParsedAdditiveExpr:
+class ParsedAdditiveExpr(ParsedNode):
+    _fields = ("_sign", "_left", "_right")
+
     def __init__(self, sign, left, right):
         self._sign = sign
         self._leftLit = 0
@@ -620,18 +852,36 @@ class ParsedAdditiveExpr:
             self._right = right
         return
 
+    def _reset(self):
+        # copyWith may have replaced an operand by a constant
+        if isinstance(self._left, ParsedLiteralExpr):
+            self._left = Conversions.NumberValue(self._left.evaluate(None))
+            self._leftLit = 1
+        if isinstance(self._right, ParsedLiteralExpr):
+            self._right = Conversions.NumberValue(self._right.evaluate(None))
+            self._rightLit = 1
+
+    # Whether the operands are known to be numbers, see specialize
+    _leftNumber = _rightNumber = 0
+
+    def specialize(self):
+        self._leftNumber = not self._leftLit and self._left.resultType == "number"
+        self._rightNumber = not self._rightLit and self._right.resultType == "number"
+
     def evaluate(self, context):
         """returns a number"""
         if self._leftLit:
             lrt = self._left
         else:
             lrt = self._left.evaluate(context)
-            lrt = Conversions.NumberValue(lrt)
+            if not self._leftNumber:
+                lrt = Conversions.NumberValue(lrt)
         if self._rightLit:
             rrt = self._right
         else:
             rrt = self._right.evaluate(context)
-            rrt = Conversions.NumberValue(rrt)
+            if not self._rightNumber:
+                rrt = Conversions.NumberValue(rrt)
         return lrt + (rrt * self._sign)
 
     def __str__(self):
@@ -647,18 +897,29 @@ class ParsedAdditiveExpr:
 
 
 
-class ParsedMultiplicativeExpr:
+class ParsedMultiplicativeExpr(ParsedNode):
+    _fields = ("_op", "_left", "_right")
+
     def __init__(self, opcode, left, right):
         self._op = opcode
         self._left = left
         self._right = right
 
+    # Whether the operands are known to be numbers, see specialize
+    _leftNumber = _rightNumber = 0
+
+    def specialize(self):
+        self._leftNumber = self._left.resultType == "number"
+        self._rightNumber = self._right.resultType == "number"
+
     def evaluate(self, context):
         """returns a number"""
         lrt = self._left.evaluate(context)
-        lrt = Conversions.NumberValue(lrt)
+        if not self._leftNumber:
+            lrt = Conversions.NumberValue(lrt)
         rrt = self._right.evaluate(context)
-        rrt = Conversions.NumberValue(rrt)
+        if not self._rightNumber:
+            rrt = Conversions.NumberValue(rrt)
         res = 0
         if self._op == 0:
             res = lrt * rrt
@@ -687,14 +948,23 @@ class ParsedMultiplicativeExpr:
         return repr(self._left) + op + repr(self._right)
 
 
-class ParsedUnaryExpr:
+class ParsedUnaryExpr(ParsedNode):
+    _fields = ("_exp",)
+
     def __init__(self, exp):
         self._exp = exp
 
+    # Whether the operand is known to be a number, see specialize
+    _expNumber = 0
+
+    def specialize(self):
+        self._expNumber = self._exp.resultType == "number"
+
     def evaluate(self, context):
         """returns a number"""
         exp = self._exp.evaluate(context)
-        exp = Conversions.NumberValue(exp)
+        if not self._expNumber:
+            exp = Conversions.NumberValue(exp)
         rt = exp * -1.0
         return rt
 
@@ -0,0 +1,164 @@
+########################################################################
+#
+# File Name:   ParsedNode.py
+#
+#
+"""
+Structural identity for the nodes of parsed expression trees.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import copy
+
+
+
+# What is known of the node-sets an expression evaluates to, without
+# evaluating it; or'ed together in ParsedNode.nodeSetProperties
+ORDERED = 1
+UNIQUE = 2
+# At most one node
+SINGLE = 4
+# All of the nodes have the same parent (or owner element)
+SIBLINGS = 8
+
+# Node-sets as the path operators and unions give them
+NORMAL = ORDERED | UNIQUE
+
+
+class ParsedNode:
+    """
+    Base of the expression tree classes.  _fields names the instance
+    attributes that make up a node's meaning; two nodes are equal when
+    they are of the same class and those attributes are equal, and they
+    hash accordingly.  Trees are shared (see pyxpath.InterningFtFactory),
+    so a node must not be changed once it is built.
+    """
+
+    _fields = ()
+
+    # The type of the node's value when it is known without evaluating it,
+    # 'boolean', 'number', 'string' or 'node-set'; set by the optimizer
+    resultType = None
+
+    # ORDERED, UNIQUE, SINGLE and SIBLINGS or'ed together for the node-sets
+    # it evaluates to; set by the optimizer
+    nodeSetProperties = 0
+
+    def structure(self):
+        """The class and field values of the node, lists as tuples"""
+        result = [self.__class__]
+        for name in self._fields:
+            value = getattr(self, name)
+            if type(value) is list:
+                value = tuple(value)
+            result.append(value)
+        return tuple(result)
+
+    def children(self):
+        """The sub-expressions of the node, in field order"""
+        result = []
+        for name in self._fields:
+            value = getattr(self, name)
+            if isinstance(value, ParsedNode):
+                result.append(value)
+            elif type(value) in (list, tuple):
+                result.extend([v for v in value if isinstance(v, ParsedNode)])
+        return result
+
+    def copyWith(self, func):
+        """
+        Return a node like this one with func applied to each of its
+        sub-expressions, or the node itself if func changed none of them.
+        """
+        changed = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            if isinstance(value, ParsedNode):
+                new = func(value)
+                if new is not value:
+                    changed[name] = new
+            elif type(value) is list:
+                new = []
+                for item in value:
+                    if isinstance(item, ParsedNode):
+                        item = func(item)
+                    new.append(item)
+                if [a for (a, b) in zip(new, value) if a is not b]:
+                    changed[name] = new
+        if not changed:
+            return self
+        node = copy.copy(self)
+        node.__dict__.update(changed)
+        node._reset()
+        return node
+
+    def _reset(self):
+        """Recompute any state derived from the fields after copyWith"""
+        pass
+
+    def iterate(self, context):
+        """
+        The nodes of the node-set the node evaluates to, in the same
+        order, one at a time.  Location paths that can, walk the document
+        no further than the consumer asks for; anything else builds the
+        whole node-set first.
+        """
+        return iter(self.evaluate(context))
+
+    def disjoint(self):
+        """
+        Whether, as a location path, the nodes it selects from a context
+        node are distinct and none of them is an ancestor of another; for
+        other expressions, whether the nodes of its value also are in
+        document order
+        """
+        return self.nodeSetProperties & (NORMAL | SIBLINGS) == NORMAL | SIBLINGS
+
+    def subtree(self):
+        """
+        Whether, as a location path, it only selects nodes in the subtree
+        of the context node
+        """
+        return 0
+
+    def nested(self):
+        """
+        Whether, as a location path, it selects from a descendant of a node
+        only nodes it also selects from that node
+        """
+        return 0
+
+    def specialize(self):
+        """
+        Select the code paths of evaluate for the result types of the
+        sub-expressions.  Only derived state may change, so this is safe
+        on shared nodes.
+        """
+        pass
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if self.__class__ is not other.__class__:
+            return False
+        return self.structure() == other.structure()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self.structure())
+            return self._hash
+
+    def __getstate__(self):
+        # Hashes of classes and strings differ from process to process
+        state = vars(self).copy()
+        state.pop("_hash", None)
+        return state
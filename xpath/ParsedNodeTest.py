@@ -21,6 +21,9 @@ from xml.xpath import NAMESPACE_NODE
 from xml.xpath import NamespaceNode
 from xml.xpath import RuntimeException
 
+# localfolder
+from .ParsedNode import ParsedNode
+
 
 
 def ParsedNameTest(name):
@@ -42,7 +45,7 @@ def ParsedNodeTest(test, literal=None):
     return g_classMap[test]()
 
 
-class NodeTestBase:
+class NodeTestBase(ParsedNode):
     def match(self, context, node, principalType=Node.ELEMENT_NODE):
         """
         The principalType is discussed in section [2.3 Node Tests]
@@ -51,6 +54,13 @@ class NodeTestBase:
         """
         return 0
 
+    def nameKey(self, context):
+        """
+        The key of the elements it matches in the name index of a
+        StructureIndex, or None if it does not match them by name
+        """
+        return None
+
     def pprint(self, indent):
         print((indent + str(self)))
 
@@ -94,6 +104,8 @@ class TextNodeTest(NodeTestBase):
 
 
 class ProcessingInstructionNodeTest(NodeTestBase):
+    _fields = ("target",)
+
     def __init__(self, target=None):
         if target:
             self.priority = 0
@@ -134,6 +146,8 @@ class PrincipalTypeTest(NodeTestBase):
 
 
 class NodeNameTest(NodeTestBase):
+    _fields = ("_nodeName",)
+
     def __init__(self, nodeName):
         self.priority = 0
         self._nodeName = nodeName
@@ -143,11 +157,16 @@ class NodeNameTest(NodeTestBase):
             return node.nodeName == self._nodeName
         return 0
 
+    def nameKey(self, context):
+        return self._nodeName
+
     def __repr__(self):
         return self._nodeName
 
 
 class LocalNameTest(NodeTestBase):
+    _fields = ("_prefix",)
+
     def __init__(self, prefix):
         self.priority = -0.25
         self._prefix = prefix
@@ -166,6 +185,8 @@ class LocalNameTest(NodeTestBase):
 
 
 class QualifiedNameTest(NodeTestBase):
+    _fields = ("_prefix", "_localName")
+
     def __init__(self, prefix, localName):
         self.priority = 0
         self._prefix = prefix
@@ -182,6 +203,11 @@ class QualifiedNameTest(NodeTestBase):
                     )
         return 0
 
+    def nameKey(self, context):
+        # An undefined prefix is reported by match, if a node gets to it
+        uri = context.processorNss.get(self._prefix)
+        return uri is not None and (uri, self._localName) or None
+
     def __repr__(self):
         return self._prefix + ":" + self._localName
 
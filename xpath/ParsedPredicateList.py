@@ -15,7 +15,14 @@ See  http://4suite.org/COPYRIGHT  for license and copyright information
 
 from functools import reduce
 import types
+from xml.dom import EMPTY_NAMESPACE
 from xml.xpath import Conversions
+from xml.xpath import g_extFunctions
+from xml.xpath import Inf
+
+# localfolder
+from . import ParsedExpr
+from .ParsedNode import ParsedNode
 
 
 
@@ -26,7 +33,13 @@ class StringException(Exception):
     pass
 
 
-class ParsedPredicateList:
+class ParsedPredicateList(ParsedNode):
+    _fields = ("_predicates",)
+
+    # Whether the predicates may use the position or size of the context,
+    # unless the optimizer knows better
+    positional = 1
+
     def __init__(self, preds):
         if type(preds) == type(()):
             preds = list(preds)
@@ -35,6 +48,23 @@ class ParsedPredicateList:
 
         self._predicates = preds
         self._length = len(preds)
+        # What is evaluated for each node, see specialize
+        self._tests = preds
+
+    def _reset(self):
+        self._length = len(self._predicates)
+        self._tests = self._predicates
+        self.positional = ParsedPredicateList.positional
+
+    def specialize(self):
+        from .Optimizer import IsPositional
+
+        self.positional = IsPositional(self._predicates)
+        # Node-set predicates only need to find one node
+        self._tests = [
+            pred.resultType == "node-set" and ParsedExpr.ParsedExistsExpr(pred) or pred
+            for pred in self._predicates
+        ]
 
     def append(self, pred):
         self._predicates.append(pred)
@@ -43,7 +73,7 @@ class ParsedPredicateList:
     def filter(self, nodeList, context, reverse):
         if self._length:
             state = context.copyNodePosSize()
-            for pred in self._predicates:
+            for test in self._tests:
                 size = len(nodeList)
                 ctr = 0
                 current = nodeList
@@ -51,7 +81,7 @@ class ParsedPredicateList:
                 for node in current:
                     position = (reverse and size - ctr) or (ctr + 1)
                     context.setNodePosSize((node, position, size))
-                    res = pred.evaluate(context)
+                    res = test.evaluate(context)
                     if type(res) in NumberTypes:
                         # This must be separate to prevent falling into
                         # the boolean check.
@@ -63,6 +93,74 @@ class ParsedPredicateList:
             context.setNodePosSize(state)
         return nodeList
 
+    def iterFilter(self, nodes, context):
+        """
+        The nodes, from any iterable, that all of the predicates keep, one
+        at a time.  Only for predicates that do not use the position or
+        size of the context.
+        """
+        BooleanValue = Conversions.BooleanValue
+        for node in nodes:
+            state = context.copyNodePosSize()
+            context.setNodePosSize((node, 1, 1))
+            keep = 1
+            for test in self._tests:
+                if not BooleanValue(test.evaluate(context)):
+                    keep = 0
+                    break
+            context.setNodePosSize(state)
+            if keep:
+                yield node
+
+    def positionLimit(self, context):
+        """
+        How many nodes, in axis order, the first predicate can keep at
+        most, if that only depends on their position: n for [n],
+        [position() = n] and [position() <= n], n - 1 for
+        [position() < n], where n is a literal or a variable bound to a
+        number.  None if the predicate may keep any node.
+        """
+        if not self._length:
+            return None
+        pred = self._predicates[0]
+        if isinstance(pred, ParsedExpr.ParsedRelationalExpr):
+            # Operators 0 <, 1 <=, 2 >, 3 >=, with position() on the left
+            op = pred._op
+            if _IsPosition(pred._left):
+                bound = _Number(pred._right, pred._rightLit, context)
+            elif _IsPosition(pred._right):
+                bound = _Number(pred._left, pred._leftLit, context)
+                op = (op + 2) % 4
+            else:
+                return None
+            if bound is None or op > 1:
+                return None
+            if bound == Inf:
+                return None
+            if not bound >= 1:
+                # Also NaN
+                return 0
+            if op == 0 and bound == int(bound):
+                return int(bound) - 1
+            return int(bound)
+        if isinstance(pred, ParsedExpr.ParsedEqualityExpr):
+            if pred._op != "=":
+                return None
+            if _IsPosition(pred._left):
+                position = _Number(pred._right, 0, context)
+            elif _IsPosition(pred._right):
+                position = _Number(pred._left, 0, context)
+            else:
+                return None
+        else:
+            position = _Number(pred, 0, context)
+        if position is None:
+            return None
+        if position >= 1 and position != Inf and position == int(position):
+            return int(position)
+        # No node is at that position
+        return 0
+
     def __getitem__(self, index):
         return self._predicates[index]
 
@@ -81,3 +179,33 @@ class ParsedPredicateList:
         return reduce(
             lambda result, pred: result + "[%s]" % repr(pred), self._predicates, ""
         )
+
+
+def _IsPosition(expr):
+    """Whether expr is a call of the core function position()"""
+    return (
+        isinstance(expr, ParsedExpr.FunctionCall)
+        and not expr._key[0]
+        and expr._key[1] == "position"
+        and not expr._args
+        and (EMPTY_NAMESPACE, "position") not in g_extFunctions
+    )
+
+
+def _Number(expr, literal, context):
+    """The number expr is, if it is a literal or a variable bound to one"""
+    if literal:
+        return expr
+    if isinstance(expr, ParsedExpr.ParsedLiteralExpr):
+        value = expr.evaluate(context)
+    elif isinstance(expr, ParsedExpr.ParsedVariableReferenceExpr):
+        try:
+            value = expr.evaluate(context)
+        except:
+            # Raised again by the predicate itself
+            return None
+    else:
+        return None
+    if type(value) in NumberTypes:
+        return value
+    return None
@@ -11,13 +11,25 @@ Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
 See  http://4suite.org/COPYRIGHT  for license and copyright information
 """
 
+# stdlib
+from xml.xpath import Util
+
+# localfolder
+from .ParsedNode import ParsedNode
+
+
+class ParsedRelativeLocationPath(ParsedNode):
+    _fields = ("_left", "_right")
 
-class ParsedRelativeLocationPath:
     def __init__(self, left, right):
         self._left = left
         self._right = right
+        self._concatenate = left.disjoint() and right.subtree()
         return
 
+    def _reset(self):
+        self._concatenate = self._left.disjoint() and self._right.subtree()
+
     def evaluate(self, context):
         rt = self._left.select(context)
         if type(rt) != type([]):
@@ -26,20 +38,30 @@ class ParsedRelativeLocationPath:
             )
 
         origState = context.copyNodePosSize()
-
-        result = []
-        l = len(rt)
-        for ctr in range(l):
-            n = rt[ctr]
-            context.setNodePosSize((n, ctr + 1, l))
-            result.extend(self._right.select(context))
-
+        # Steps into the subtrees of nodes none of which contains another
+        # select nodes that follow one another
+        result = Util.Select(self._right, rt, context, self._concatenate)
         context.setNodePosSize(origState)
 
         return result
 
     select = evaluate
 
+    def iterate(self, context):
+        if not self._concatenate:
+            # Only merged in document order once they are all there
+            return iter(self.evaluate(context))
+        return Util.IterSelect(self._right, self._left.iterate(context), context)
+
+    def disjoint(self):
+        return self._left.disjoint() and self._right.disjoint() and self._right.subtree()
+
+    def subtree(self):
+        return self._left.subtree() and self._right.subtree()
+
+    def nested(self):
+        return self._left.nested()
+
     def pprint(self, indent=""):
         print((indent + str(self)))
         self._left.pprint(indent + "  ")
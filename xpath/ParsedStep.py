@@ -18,9 +18,14 @@ from xml.dom import Node
 from xml.xpath import NamespaceNode
 from xml.xpath import Util
 
+# localfolder
+from .ParsedNode import ParsedNode
 
 
-class ParsedStep:
+
+class ParsedStep(ParsedNode):
+    _fields = ("_axis", "_nodeTest", "_predicates")
+
     def __init__(self, axis, nodeTest, predicates=None):
         self._axis = axis
         self._nodeTest = nodeTest
@@ -32,13 +37,45 @@ class ParsedStep:
         Select a set of nodes from the axis, then filter through the node
         test and the predicates.
         """
-        (node_set, reverse) = self._axis.select(context, self._nodeTest.match)
+        limit = None
+        if self._predicates:
+            # Stop walking the axis once a positional predicate has all
+            # the nodes it can keep
+            limit = self._predicates.positionLimit(context)
+            if limit == 0:
+                return []
+        if limit is None:
+            (node_set, reverse) = self._axis.select(context, self._nodeTest.match)
+        else:
+            (node_set, reverse) = self._axis.select(context, self._nodeTest.match, limit)
         if self._predicates and len(node_set):
             node_set = self._predicates.filter(node_set, context, reverse)
         return node_set
 
     select = evaluate
 
+    def iterate(self, context):
+        """
+        The nodes of the step one at a time, walking the axis as they are
+        asked for, if the predicates do not use their positions
+        """
+        if self._predicates and self._predicates.positional:
+            return iter(self.evaluate(context))
+        nodes = self._axis.iterate(context, self._nodeTest.match)
+        if self._predicates:
+            return self._predicates.iterFilter(nodes, context)
+        return nodes
+
+    def disjoint(self):
+        return self._axis.disjoint
+
+    def nested(self):
+        # Predicates that use positions may keep other nodes
+        return self._axis.nested and not (self._predicates and self._predicates.positional)
+
+    def subtree(self):
+        return self._axis.subtree
+
     def pprint(self, indent=""):
         print((indent + str(self)))
         self._axis.pprint(indent + "  ")
@@ -55,7 +92,9 @@ class ParsedStep:
         return result
 
 
-class ParsedAbbreviatedStep:
+class ParsedAbbreviatedStep(ParsedNode):
+    _fields = ("parent",)
+
     def __init__(self, parent):
         self.parent = parent
 
@@ -68,6 +107,12 @@ class ParsedAbbreviatedStep:
 
     select = evaluate
 
+    def disjoint(self):
+        return 1
+
+    def subtree(self):
+        return not self.parent
+
     def pprint(self, indent=""):
         print((indent + str(self)))
 
@@ -80,7 +125,9 @@ class ParsedAbbreviatedStep:
 
 # From the XPath 2.0 Working Draft
 # Used by XPointer
-class ParsedNodeSetFunction:
+class ParsedNodeSetFunction(ParsedNode):
+    _fields = ("_function", "_predicates")
+
     def __init__(self, function, predicates=None):
         self._function = function
         self._predicates = predicates
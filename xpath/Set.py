@@ -4,39 +4,64 @@
 #
 #
 """
+Operations on node-sets, as lists of nodes.  Nodes are told apart by
+identity, through a dictionary of their ids, so each operation takes
+time linear in the sizes of its operands; the order of the nodes is that
+of the operands.
 WWW: http://4suite.org/         e-mail: support@4suite.org
 
 Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
 See  http://4suite.org/COPYRIGHT  for license and copyright information
 """
-# stdlib
-from functools import reduce
 
 
 
+def Ids(nodes):
+    """A dictionary of the ids of the nodes, to look nodes up in"""
+    return dict.fromkeys(map(id, nodes))
+
+
 def Not(original, other):
-    return list(filter(lambda x, other=other: x not in other, original))
+    """The nodes of original that are not in other"""
+    if not other:
+        return original[:]
+    other = Ids(other)
+    return [node for node in original if id(node) not in other]
 
 
 def Union(left, right):
+    """The nodes of the longer list, then those of the other not in it"""
     if len(left) < len(right):
         loop = left
         compare = right
     else:
         loop = right
         compare = left
-    return compare + list(filter(lambda x, compare=compare: x not in compare, loop))
+    if not loop:
+        return compare[:]
+    ids = Ids(compare)
+    return compare + [node for node in loop if id(node) not in ids]
 
 
 def Intersection(left, right):
+    """The nodes of the shorter list that are in the other"""
     if len(left) < len(right):
         loop = left
         compare = right
     else:
         loop = right
         compare = left
-    return list(filter(lambda x, compare=compare: x in compare, loop))
+    ids = Ids(compare)
+    return [node for node in loop if id(node) in ids]
 
 
 def Unique(left):
-    return reduce(lambda rt, x: x in rt and rt or rt + [x], left, [])
+    """The nodes of left without repeats, each where it first occurs"""
+    seen = {}
+    result = []
+    for node in left:
+        key = id(node)
+        if key not in seen:
+            seen[key] = None
+            result.append(node)
+    return result
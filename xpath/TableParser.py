@@ -0,0 +1,467 @@
+########################################################################
+#
+# File Name:   TableParser.py
+#
+#
+"""
+An expression parser driven by the BisonGen LALR tables in XPathParser.
+It builds its trees through a pyxpath.FtFactory, so the result is the
+same as that of the YAPPS parser in XPathGrammar.
+WWW: http://4suite.org/XPATH        e-mail: support@4suite.org
+
+Copyright (c) 2000-2001 Fourthought Inc, USA.   All Rights Reserved.
+See  http://4suite.org/COPYRIGHT  for license and copyright information
+"""
+
+# stdlib
+import threading
+
+# localfolder
+from . import pyxpath
+from . import XPathParser
+from .XPathParser import action_idx
+from .XPathParser import default_action
+from .XPathParser import default_goto
+from .XPathParser import derives
+from .XPathParser import goto_idx
+from .XPathParser import INITIAL
+from .XPathParser import pattern_actions
+from .XPathParser import patterns
+from .XPathParser import rhs_size
+from .XPathParser import yycheck
+from .XPathParser import YYEMPTY
+from .XPathParser import YYEOF
+from .XPathParser import YYFINAL
+from .XPathParser import YYFLAG
+from .XPathParser import YYINITDEPTH
+from .XPathParser import YYLAST
+from .XPathParser import YYNTBASE
+from .XPathParser import yytable
+from .XPathParser import YYTRANSLATE
+
+
+
+g_axisNames = dict(
+    [(name, axis) for (axis, name) in list(pyxpath.FtFactory.axisMap.items())]
+)
+g_nodeTypes = dict(
+    [(name, type) for (type, name) in list(pyxpath.FtFactory.ntMap.items())]
+)
+g_relationalOps = {
+    "<": pyxpath.LT_OPERATOR,
+    "<=": pyxpath.LE_OPERATOR,
+    ">": pyxpath.GT_OPERATOR,
+    ">=": pyxpath.GE_OPERATOR,
+}
+g_equalityOps = {"=": pyxpath.EQ_OPERATOR, "!=": pyxpath.NEQ_OPERATOR}
+g_multiplyOps = {
+    "*": pyxpath.TIMES_OPERATOR,
+    "div": pyxpath.DIV_OPERATOR,
+    "mod": pyxpath.MOD_OPERATOR,
+}
+
+
+def SplitName(name):
+    index = name.find(":")
+    if index == -1:
+        return (None, name)
+    return (name[:index], name[index + 1 :])
+
+
+# The action code for each rule; rule numbers are those of XPathParser.
+# Each routine receives the factory, the value stack and the stack pointer.
+
+
+def absoluteLocationPath1(f, s, p):
+    return f.createAbsoluteLocationPath(None)
+
+
+def absoluteLocationPath2(f, s, p):
+    return f.createAbsoluteLocationPath(s[p + 2])
+
+
+def relativeLocationPath2(f, s, p):
+    return f.createRelativeLocationPath(s[p + 1], s[p + 3])
+
+
+def step1(f, s, p):
+    return f.createStep(s[p + 1], s[p + 2], [])
+
+
+def step2(f, s, p):
+    return f.createStep(s[p + 1], s[p + 2], s[p + 3])
+
+
+class RuleError(Exception):
+    """
+    Raised by an action routine for what the grammar accepts but XPath
+    does not; the parser reports it as a syntax error at the first token
+    of the rule
+    """
+
+
+def predicateList1(f, s, p):
+    return [s[p + 1]]
+
+
+def predicateList2(f, s, p):
+    s[p + 1].append(s[p + 2])
+    return s[p + 1]
+
+
+def axisSpecifier1(f, s, p):
+    try:
+        axis = g_axisNames[s[p + 1]]
+    except KeyError:
+        raise RuleError("Invalid axis: %s" % s[p + 1])
+    return f.createAxisSpecifier(axis)
+
+
+def nodeTest1(f, s, p):
+    (prefix, local) = SplitName(s[p + 1])
+    return f.createNameTest(prefix, local)
+
+
+def nodeTest2(f, s, p):
+    return f.createNodeTest(g_nodeTypes[s[p + 1]], None)
+
+
+def nodeTest3(f, s, p):
+    if s[p + 1] != "processing-instruction":
+        raise RuleError("parameter not allowed for " + s[p + 1])
+    return f.createNodeTest(pyxpath.PROCESSING_INSTRUCTION, s[p + 3])
+
+
+def predicate1(f, s, p):
+    return s[p + 2]
+
+
+def abbreviatedAbsoluteLocationPath1(f, s, p):
+    return f.createAbbreviatedAbsoluteLocationPath(s[p + 2])
+
+
+def abbreviatedRelativeLocationPath1(f, s, p):
+    return f.createAbbreviatedRelativeLocationPath(s[p + 1], s[p + 3])
+
+
+def abbreviatedStep1(f, s, p):
+    return f.createAbbreviatedStep(0)
+
+
+def abbreviatedStep2(f, s, p):
+    return f.createAbbreviatedStep(1)
+
+
+def abbreviatedAxisSpecifier1(f, s, p):
+    return f.createAxisSpecifier(pyxpath.ATTRIBUTE_AXIS)
+
+
+def abbreviatedAxisSpecifier2(f, s, p):
+    return f.createAxisSpecifier(pyxpath.CHILD_AXIS)
+
+
+def primaryExpr1(f, s, p):
+    (prefix, local) = SplitName(s[p + 1][1:])
+    return f.createVariableReference(prefix, local)
+
+
+def primaryExpr2(f, s, p):
+    return s[p + 2]
+
+
+def primaryExpr3(f, s, p):
+    return f.createLiteral(s[p + 1])
+
+
+def primaryExpr4(f, s, p):
+    return f.createNumber(s[p + 1])
+
+
+def functionCall1(f, s, p):
+    (prefix, local) = SplitName(s[p + 1])
+    return f.createFunctionCall(prefix, local, [])
+
+
+def functionCall2(f, s, p):
+    (prefix, local) = SplitName(s[p + 1])
+    return f.createFunctionCall(prefix, local, s[p + 3])
+
+
+def argumentList1(f, s, p):
+    return [s[p + 1]]
+
+
+def argumentList2(f, s, p):
+    s[p + 1].append(s[p + 3])
+    return s[p + 1]
+
+
+def unionExpr2(f, s, p):
+    return f.createNumericExpr(pyxpath.UNION_OPERATOR, s[p + 1], s[p + 3])
+
+
+def pathExpr3(f, s, p):
+    return f.createPathExpr(s[p + 1], s[p + 3])
+
+
+def pathExpr4(f, s, p):
+    return f.createAbbreviatedPathExpr(s[p + 1], s[p + 3])
+
+
+def filterExpr2(f, s, p):
+    return f.createFilterExpr(s[p + 1], s[p + 2])
+
+
+def orExpr2(f, s, p):
+    return f.createBooleanExpr(pyxpath.OR_OPERATOR, s[p + 1], s[p + 3])
+
+
+def andExpr2(f, s, p):
+    return f.createBooleanExpr(pyxpath.AND_OPERATOR, s[p + 1], s[p + 3])
+
+
+def equalityExpr2(f, s, p):
+    return f.createBooleanExpr(g_equalityOps[s[p + 2]], s[p + 1], s[p + 3])
+
+
+def relationalExpr2(f, s, p):
+    return f.createBooleanExpr(g_relationalOps[s[p + 2]], s[p + 1], s[p + 3])
+
+
+def additiveExpr2(f, s, p):
+    return f.createNumericExpr(pyxpath.PLUS_OPERATOR, s[p + 1], s[p + 3])
+
+
+def additiveExpr3(f, s, p):
+    return f.createNumericExpr(pyxpath.MINUS_OPERATOR, s[p + 1], s[p + 3])
+
+
+def multiplicativeExpr2(f, s, p):
+    return f.createNumericExpr(g_multiplyOps[s[p + 2]], s[p + 1], s[p + 3])
+
+
+def unaryExpr2(f, s, p):
+    return f.createUnaryExpr(s[p + 2])
+
+
+action_routines = [None] * len(rhs_size)
+for (rule, routine) in [
+    (3, absoluteLocationPath1),
+    (4, absoluteLocationPath2),
+    (7, relativeLocationPath2),
+    (9, step1),
+    (10, step2),
+    (12, predicateList1),
+    (13, predicateList2),
+    (14, axisSpecifier1),
+    (16, nodeTest1),
+    (17, nodeTest2),
+    (18, nodeTest3),
+    (19, predicate1),
+    (21, abbreviatedAbsoluteLocationPath1),
+    (22, abbreviatedRelativeLocationPath1),
+    (23, abbreviatedStep1),
+    (24, abbreviatedStep2),
+    (25, abbreviatedAxisSpecifier1),
+    (26, abbreviatedAxisSpecifier2),
+    (28, primaryExpr1),
+    (29, primaryExpr2),
+    (30, primaryExpr3),
+    (31, primaryExpr4),
+    (33, functionCall1),
+    (34, functionCall2),
+    (35, argumentList1),
+    (36, argumentList2),
+    (39, unionExpr2),
+    (42, pathExpr3),
+    (43, pathExpr4),
+    (45, filterExpr2),
+    (47, orExpr2),
+    (49, andExpr2),
+    (51, equalityExpr2),
+    (53, relationalExpr2),
+    (55, additiveExpr2),
+    (56, additiveExpr3),
+    (58, multiplicativeExpr2),
+    (60, unaryExpr2),
+]:
+    action_routines[rule] = routine
+del rule, routine
+
+
+class ExprParser(XPathParser.Parser):
+    """
+    Parses expressions with the LALR tables.  The state and value stacks
+    belong to the instance and are reused from one parse to the next.
+    """
+
+    def __init__(self, factory=None, verbose=0):
+        XPathParser.Parser.__init__(self, verbose)
+        # None builds with whatever pyxpath.factory is at parse time
+        self.factory = factory
+        self._stateStack = [0] * YYINITDEPTH
+        self._valueStack = [0] * (YYINITDEPTH + 1)
+        # The position in the text of each value, that of its first token
+        self._positionStack = [0] * (YYINITDEPTH + 1)
+        self._text = ""
+        self._pos = 0
+        self.busy = 0
+
+    def parse(self, text):
+        self.busy = 1
+        try:
+            return self._parse(text)
+        finally:
+            self.busy = 0
+
+    def _parse(self, text):
+        state_stack = self._stateStack
+        value_stack = self._valueStack
+        position_stack = self._positionStack
+        depth = len(state_stack) - 1
+        factory = self.factory or pyxpath.factory
+
+        lexer_state = INITIAL
+        lexer_last = 0
+        lexer_end = len(text)
+        token_pos = 0
+        yylval = ""
+
+        yystate = 0
+        yychar = YYEMPTY  # cause a token to be read
+
+        # Waste one element of the value stack so that it stays on the
+        # same level as the state stack.
+        state_ptr = -1
+        value_ptr = 0
+
+        while 1:
+            # Push the new state
+            state_ptr = state_ptr + 1
+            if state_ptr >= depth:
+                self._grow()
+                state_stack = self._stateStack
+                value_stack = self._valueStack
+                position_stack = self._positionStack
+                depth = len(state_stack) - 1
+            state_stack[state_ptr] = yystate
+
+            yyn = action_idx[yystate]
+            if yyn == YYFLAG:
+                # Decide without reference to the lookahead token
+                yyn = default_action[yystate]
+                if yyn == 0:
+                    self._report(text, token_pos, yystate, yylval)
+            else:
+                if yychar == YYEMPTY:
+                    # Lexical analysis
+                    while lexer_last < lexer_end:
+                        lexer_pos = lexer_last
+                        match = patterns[lexer_state].match(text, lexer_pos)
+                        group = match.lastgroup
+                        lexer_last = match.end()
+                        lexer_action = pattern_actions[group]
+                        if lexer_action:
+                            lexer_state = lexer_action[0] or lexer_state
+                            if len(lexer_action) > 1:
+                                yylval = match.group(group)
+                                yychar = lexer_action[1] or ord(yylval)
+                                token_pos = lexer_pos
+                                break
+                            # Just a state change, reprocess the text
+                            lexer_last = lexer_pos
+                    else:
+                        yychar = YYEOF
+                        token_pos = lexer_end
+
+                if yychar > 0:
+                    yychar1 = YYTRANSLATE(yychar)
+                    yyn = yyn + yychar1
+                else:
+                    yychar1 = 0
+
+                if yyn < 0 or yyn > YYLAST or yycheck[yyn] != yychar1:
+                    yyn = default_action[yystate]
+                    if yyn == 0:
+                        self._report(text, token_pos, yystate, yylval)
+                else:
+                    yyn = yytable[yyn]
+                    if YYFLAG < yyn < 0:
+                        yyn = -yyn
+                    elif yyn == YYFINAL:
+                        return value_stack[value_ptr - 1]
+                    elif yyn <= 0:
+                        self._report(text, token_pos, yystate, yylval)
+                    else:
+                        # Shift the lookahead token
+                        if yychar != YYEOF:
+                            yychar = YYEMPTY
+                        value_ptr = value_ptr + 1
+                        value_stack[value_ptr] = yylval
+                        position_stack[value_ptr] = token_pos
+                        yystate = yyn
+                        continue
+
+            # Reduce by rule yyn
+            size = rhs_size[yyn]
+            state_ptr = state_ptr - size
+            value_ptr = value_ptr - size
+            if not size:
+                position_stack[value_ptr + 1] = token_pos
+            routine = action_routines[yyn]
+            if routine:
+                try:
+                    value_stack[value_ptr + 1] = routine(factory, value_stack, value_ptr)
+                except RuleError as error:
+                    (self._text, self._pos) = (text, position_stack[value_ptr + 1])
+                    self.error("%s", error.args[0])
+            value_ptr = value_ptr + 1
+
+            # Shift the result of the reduction
+            yyn = derives[yyn] - YYNTBASE
+            yystate = goto_idx[yyn] + state_stack[state_ptr]
+            if 0 <= yystate <= YYLAST and yycheck[yystate] == state_stack[state_ptr]:
+                yystate = yytable[yystate]
+            else:
+                yystate = default_goto[yyn]
+
+    def _grow(self):
+        self._stateStack.extend([0] * len(self._stateStack))
+        self._valueStack.extend([0] * (len(self._stateStack) + 1 - len(self._valueStack)))
+        self._positionStack.extend(
+            [0] * (len(self._stateStack) + 1 - len(self._positionStack))
+        )
+
+    def _report(self, text, pos, state, lval):
+        self._text = text
+        self._pos = pos
+        line = text.count("\n", 0, pos) + 1
+        column = pos - (text.rfind("\n", 0, pos) + 1) + 1
+        self.report_error(state, line, column, lval)
+        # report_error always raises, but be safe
+        self.error("parse error")
+
+    def error(self, format, *args):
+        raise pyxpath.XPathSyntaxError_(self._pos, format % args, self._text)
+
+
+class ParserFactory:
+    """
+    Hands out one parser per thread, so that the stacks are reused.  A
+    parser that is already busy (a parse started from within a parse) is
+    never handed out twice.
+    """
+
+    def __init__(self, cl, flavor=None):
+        self._class = cl
+        self._local = threading.local()
+        self.flavor = flavor
+
+    def new(self):
+        parser = getattr(self._local, "parser", None)
+        if parser is None or parser.busy:
+            parser = self._local.parser = self._class()
+        return parser
+
+
+ExprParserFactory = ParserFactory(ExprParser, "expr")
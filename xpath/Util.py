@@ -22,11 +22,16 @@ from xml.dom import XML_NAMESPACE
 import xml.dom.ext
 from xml.dom.NodeFilter import NodeFilter
 from xml.xpath import Compile
-from xml.xpath import g_xpathRecognizedNodes
+from xml.xpath import NAMESPACE_NODE
 
+# localfolder
+from . import DocumentIndex
+from .ParsedNode import NORMAL
 
 
-g_documentOrderIndex = {}
+
+# The document-order ranks of the nodes of each document
+g_documentIndexes = DocumentIndex.DocumentIndexRegistry()
 
 g_xmlSpaceDescendant = g_xmlSpaceAncestor = None
 
@@ -44,35 +49,228 @@ def ElementsById(element, name):
 
 
 def IndexDocument(doc):
-    global g_documentOrderIndex
-    if id(doc) in g_documentOrderIndex:
-        return
-    mapping = {}
-    count = __IndexNode(doc, 0, mapping)
-    g_documentOrderIndex[id(doc)] = mapping
+    """Number the nodes of doc in document order, if not done already"""
+    g_documentIndexes.get(doc)
 
 
 def FreeDocumentIndex(doc):
-    global g_documentOrderIndex
-    if id(doc) in g_documentOrderIndex:
-        del g_documentOrderIndex[id(doc)]
+    """Forget the document order of the nodes of doc"""
+    g_documentIndexes.free(doc)
+
+
+def DocumentChanged(doc):
+    """
+    Report that nodes were added to, removed from or moved within doc, so
+    that they are numbered anew, or that values of attributes indexed with
+    IndexAttributes changed
+    """
+    g_documentIndexes.changed(doc)
+
+
+def DocumentIndexStats():
+    """How many documents and nodes are indexed, and the memory it takes"""
+    return g_documentIndexes.stats()
+
+
+def IndexStructure(doc):
+    """
+    Give doc a structural index, which the axes and location paths use
+    from then on; the StructureIndex.  Changes to doc must be reported
+    with DocumentChanged.
+    """
+    return g_documentIndexes.indexStructure(doc)
+
+
+def IndexAttributes(doc, names):
+    """
+    Index the elements of doc by the values of their attributes of each
+    of names, node names, for the steps the optimizer turns into
+    lookups; gives doc a structural index as IndexStructure does.
+    Changes to the values of those attributes must be reported with
+    DocumentChanged, like changes to the nodes; elements looked up are
+    checked to still have the value, but those given it since are only
+    found once it is reported.
+    """
+    return g_documentIndexes.indexAttributes(doc, names)
 
 
 def SortDocOrder(nList):
+    """
+    The nodes of nList in document order, those of each document
+    together: a new list, unless nList has fewer than two nodes or they
+    are numbered by the DOM, in which case nList is sorted in place
+    """
     if len(nList) in [0, 1]:
         return nList
     if hasattr(nList[0], "docIndex"):
-        nList.sort(lambda a, b: cmp(a.docIndex, b.docIndex))
+        nList.sort(key=DocumentOrderKey)
         return nList
     doc = nList[0].ownerDocument or nList[0]
-    IndexDocument(doc)
-    global g_documentOrderIndex
-    if id(doc) in g_documentOrderIndex:
-        rt = nList[:]
-        rt.sort(IndexSort)
+    ranks = g_documentIndexes.get(doc).ranks
+    try:
+        keys = [ranks[id(node)] for node in nList]
+    except KeyError:
+        # Nodes of other documents, namespace nodes, or nodes added since
+        keys = DocumentOrderKeys(nList)
     else:
-        rt = __recurseSort([doc], nList)
-    return rt
+        if len(keys) * BUCKET_RATIO >= len(ranks):
+            # Dense enough to place by rank rather than sort
+            result = _PlaceByRank(nList, keys, len(ranks))
+            if result is not None:
+                return result
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return [nList[index] for index in order]
+
+
+# SortDocOrder places the nodes of a document by rank if there are at
+# least 1/BUCKET_RATIO as many as the document has
+BUCKET_RATIO = 8
+
+
+def _PlaceByRank(nodes, ranks, size):
+    slots = [None] * size
+    for (node, rank) in zip(nodes, ranks):
+        if slots[rank] is not None:
+            # The same node twice, which sorting keeps
+            return None
+        slots[rank] = node
+    return [node for node in slots if node is not None]
+
+
+def DocumentOrderKey(node):
+    """
+    A key sorting nodes in document order.  The nodes of each document
+    are kept together, the documents in the order they were first seen.
+    """
+    doc = node.ownerDocument or node
+    if hasattr(node, "docIndex"):
+        return (g_documentIndexes.serial(doc), node.docIndex)
+    index = g_documentIndexes.get(doc)
+    rank = index.ranks.get(id(node))
+    if rank is not None:
+        return (index.serial, rank)
+    if node.nodeType == NAMESPACE_NODE:
+        if node.parentNode is None:
+            return (index.serial, len(index.ranks), id(node))
+        # After their element and before its attributes, by prefix
+        return DocumentOrderKey(node.parentNode) + (node.nodeName,)
+    # Added since the document was numbered
+    DocumentChanged(doc)
+    index = g_documentIndexes.get(doc)
+    try:
+        return (index.serial, index.ranks[id(node)])
+    except KeyError:
+        # Outside of the document tree: after the nodes in it
+        return (index.serial, len(index.ranks), id(node))
+
+
+def DocumentOrderKeys(nodes):
+    """The DocumentOrderKey of each of the nodes"""
+    keys = []
+    lastDoc = None
+    for node in nodes:
+        doc = node.ownerDocument or node
+        if doc is not lastDoc:
+            lastDoc = doc
+            if hasattr(node, "docIndex"):
+                (serial, ranks) = (None, {})
+            else:
+                index = g_documentIndexes.get(doc)
+                (serial, ranks) = (index.serial, index.ranks)
+        try:
+            keys.append((serial, ranks[id(node)]))
+        except KeyError:
+            # Namespace nodes, nodes not numbered yet, or numbered by the
+            # DOM itself
+            keys.append(DocumentOrderKey(node))
+            if ranks:
+                # The document may have been numbered anew
+                index = g_documentIndexes.get(doc)
+                (serial, ranks) = (index.serial, index.ranks)
+    return keys
+
+
+def MergeDocOrder(nodeSets):
+    """
+    The union of the node-sets, in document order and without repeats.
+    The node-sets of location paths are in document order already: the
+    sort finds them as runs and merges them, in linear time if they do
+    not interleave; the others are sorted first.
+    """
+    keys = []
+    nodes = []
+    for nodeSet in nodeSets:
+        keys.extend(DocumentOrderKeys(nodeSet))
+        nodes.extend(nodeSet)
+    result = []
+    last = None
+    for index in sorted(range(len(keys)), key=keys.__getitem__):
+        key = keys[index]
+        if key != last:
+            result.append(nodes[index])
+            last = key
+    return result
+
+
+def Select(expr, nodeList, context, concatenate=0):
+    """
+    The nodes the location path expr selects from each of the nodes of
+    nodeList, in document order and without repeats.  If concatenate is
+    true the node-sets selected are known to follow one another in
+    document order, and are just joined.  Leaves the context node,
+    position and size to the caller.
+    """
+    if not concatenate and len(nodeList) > 1 and expr.nested() and expr.subtree():
+        # What is selected from a node under another is selected from that
+        # one too; from the others, the node-sets follow one another
+        outermost = Outermost(nodeList)
+        if outermost is not None:
+            (nodeList, concatenate) = (outermost, 1)
+    sets = []
+    size = len(nodeList)
+    position = 0
+    for node in nodeList:
+        position = position + 1
+        context.setNodePosSize((node, position, size))
+        nodeSet = expr.select(context)
+        if type(nodeSet) != type([]):
+            raise Exception("Right Expression does not evaluate to a Node Set")
+        sets.append(nodeSet)
+    if len(sets) == 1 and (concatenate or expr.nodeSetProperties & NORMAL == NORMAL):
+        # From a single node, in document order already
+        return sets[0]
+    if concatenate:
+        result = []
+        for nodeSet in sets:
+            result.extend(nodeSet)
+        return result
+    return MergeDocOrder(sets)
+
+
+def Outermost(nodes):
+    """
+    The nodes, a node-set in document order, that are not under another
+    of them, if their document has a structural index; else None
+    """
+    structure = g_documentIndexes.structure(nodes[0].ownerDocument or nodes[0])
+    if structure is None:
+        return None
+    return structure.outermost(nodes)
+
+
+def IterSelect(expr, nodes, context):
+    """
+    The nodes the location path expr selects from each of nodes in turn,
+    one at a time: Select when the node-sets are known to follow one
+    another, for consumers that may not need them all
+    """
+    for node in nodes:
+        state = context.copyNodePosSize()
+        context.setNodePosSize((node, 1, 1))
+        selected = expr.iterate(context)
+        context.setNodePosSize(state)
+        for found in selected:
+            yield found
 
 
 def ExpandQName(qname, refNode=None, namespaces=None):
@@ -94,63 +292,14 @@ def ExpandQName(qname, refNode=None, namespaces=None):
     return split_name
 
 
-def __IndexNode(node, curIndex, mapping):
-    if node.nodeType in g_xpathRecognizedNodes:
-        # Add this node
-        mapping[id(node)] = curIndex
-        curIndex = curIndex + 1
-        if node.nodeType == Node.ELEMENT_NODE:
-            # FIXME how do we get attributes in doc order???
-            for attr in list(node.attributes.values()):
-                mapping[id(attr)] = curIndex
-                curIndex = curIndex + 1
-
-        for childNode in node.childNodes:
-            curIndex = __IndexNode(childNode, curIndex, mapping)
-
-    return curIndex
-
-
-def IndexSort(left, right):
-    ldocId = id(left.ownerDocument or left)
-    rdocId = id(right.ownerDocument or right)
-    if ldocId == rdocId:
-        lid = id(left)
-        rid = id(right)
-        return cmp(g_documentOrderIndex[ldocId][lid], g_documentOrderIndex[rdocId][rid])
-    else:
-        return cmp(ldocId, rdocId)
-
-
-def __recurseSort(test, toSort):
-    """Check whether any of the nodes in toSort are in the list test, and if so, sort them into the result list"""
-    result = []
-    for node in test:
-        toSort = list(filter(lambda x, n=node: x != n, toSort))
-        if node in toSort:
-            result.append(node)
-        # See if node has attributes
-        if node.nodeType == Node.ELEMENT_NODE:
-            attrList = list(node.attributes.values())
-            # FIXME: Optimize by unrolling this level of recursion
-            result = result + __recurseSort(attrList, toSort)
-            if not toSort:
-                # Exit early
-                break
-        # See if any of t's children are in toSort
-        result = result + __recurseSort(node.childNodes, toSort)
-        if not toSort:
-            # Exit early
-            break
-    return result
-
-
 def NormalizeNode(node):
     """NormalizeNode is used to prepare a DOM for XPath evaluation.
 
     1.  Convert CDATA Sections to Text Nodes.
     2.  Normalize all text nodes
     """
+    # Nodes are merged and removed
+    DocumentChanged(node.ownerDocument or node)
     node = node.firstChild
     while node:
         if node.nodeType == Node.CDATA_SECTION_NODE:
@@ -22,69 +22,68 @@
 import re
 import string
 from string import *
-import sys
 
 # firstparty
 # redefine to add additional attributes
 import xpath.pyxpath as pyxpath
 
 # localfolder
+from .exceptions import XPathSyntaxError
 from .yappsrt import *
 
 
 
 class XPathScanner(Scanner):
+    # Compiled by Scanner.__init__, not at import
     patterns = [
-        ("'mod'", re.compile("mod")),
-        ("'div'", re.compile("div")),
-        ("'-'", re.compile("-")),
-        ("'>='", re.compile(">=")),
-        ("'>'", re.compile(">")),
-        ("'<='", re.compile("<=")),
-        ("'<'", re.compile("<")),
-        ("'!='", re.compile("!=")),
-        ("'='", re.compile("=")),
-        ("'and'", re.compile("and")),
-        ("'or'", re.compile("or")),
-        ("','", re.compile(",")),
-        ("'@'", re.compile("@")),
-        ("'::'", re.compile("::")),
-        ("'//'", re.compile("//")),
-        ("'/'", re.compile("/")),
-        ("Literal", re.compile('"[^"]*"|\'[^\']*')),
-        ("Number", re.compile("\\d+(.\\d*)?|.\\d+")),
-        ("VariableReference", re.compile("\\$[a-zA-Z_][:a-zA-Z0-9_.-]*")),
-        ("NodeType", re.compile("comment|text|processing-instruction|node")),
+        ("'mod'", "mod"),
+        ("'div'", "div"),
+        ("'-'", "-"),
+        ("'>='", ">="),
+        ("'>'", ">"),
+        ("'<='", "<="),
+        ("'<'", "<"),
+        ("'!='", "!="),
+        ("'='", "="),
+        ("'and'", "and"),
+        ("'or'", "or"),
+        ("','", ","),
+        ("'@'", "@"),
+        ("'::'", "::"),
+        ("'//'", "//"),
+        ("'/'", "/"),
+        ("Literal", '"[^"]*"|\'[^\']*'),
+        ("Number", "\\d+(.\\d*)?|.\\d+"),
+        ("VariableReference", "\\$[a-zA-Z_][:a-zA-Z0-9_.-]*"),
+        ("NodeType", "comment|text|processing-instruction|node"),
         (
             "AxisName",
-            re.compile(
-                "ancestor|ancestor-or-self|attribute|child|descendant|descendant-or-self|following|following-sibling|namespace|parent|preceding|preceding-sibling|self"
-            ),
+            "ancestor|ancestor-or-self|attribute|child|descendant|descendant-or-self|following|following-sibling|namespace|parent|preceding|preceding-sibling|self",
         ),
-        ("NCName", re.compile("[a-zA-Z_][a-zA-Z0-9_.-]*")),
-        ("NCNameStar", re.compile("[a-zA-Z_][a-zA-Z0-9_.-]*:\\*")),
-        ("QName", re.compile("[a-zA-Z_][a-zA-Z0-9_.-]*(:[a-zA-Z_][a-zA-Z0-9_.-])?")),
-        ("MultiplyOperator", re.compile("\\*")),
-        ("LPAREN", re.compile("\\(")),
-        ("RPAREN", re.compile("\\)")),
-        ("STAR", re.compile("\\*")),
-        ("PLUS", re.compile("\\+")),
-        ("LBRACKET", re.compile("\\[")),
-        ("RBRACKET", re.compile("\\]")),
+        ("NCName", "[a-zA-Z_][a-zA-Z0-9_.-]*"),
+        ("NCNameStar", "[a-zA-Z_][a-zA-Z0-9_.-]*:\\*"),
+        ("QName", "[a-zA-Z_][a-zA-Z0-9_.-]*(:[a-zA-Z_][a-zA-Z0-9_.-])?"),
+        ("MultiplyOperator", "\\*"),
+        ("LPAREN", "\\("),
+        ("RPAREN", "\\)"),
+        ("STAR", "\\*"),
+        ("PLUS", "\\+"),
+        ("LBRACKET", "\\["),
+        ("RBRACKET", "\\]"),
         (
             "FunctionName",
-            re.compile("[a-zA-Z_][a-zA-Z0-9_.-]*(:[a-zA-Z_][a-zA-Z0-9_.-]*)?"),
+            "[a-zA-Z_][a-zA-Z0-9_.-]*(:[a-zA-Z_][a-zA-Z0-9_.-]*)?",
         ),
-        ("DOT", re.compile("\\.")),
-        ("DOTDOT", re.compile("\\.\\.")),
-        ("BAR", re.compile("\\|")),
-        ("END", re.compile("#")),
-        ("ID", re.compile("id")),
-        ("KEY", re.compile("key")),
+        ("DOT", "\\."),
+        ("DOTDOT", "\\.\\."),
+        ("BAR", "\\|"),
+        ("END", "#"),
+        ("ID", "id"),
+        ("KEY", "key"),
     ]
 
     def __init__(self, str):
-        Scanner.__init__(self, None, [], str)
+        Scanner.__init__(self, self.patterns, [], str)
 
 
 class XPath(Parser):
@@ -1001,7 +1000,10 @@ XPathExpr = (
 """
 )
 
-_xpath_exp = re.compile(XPathExpr, re.VERBOSE)
+# The scanner's regular expressions are compiled on first use, see
+# ScannerPatterns
+_xpath_exp = None
+_xpath_follow = None
 
 OperatorName = ["and", "or", "mod", "div"]
 AxisName = [
@@ -1020,106 +1022,107 @@ AxisName = [
     "self",
 ]
 
+# Token types after which "*" and the operator names keep their
+# ordinary meaning (name test / NCName).  "(" and "[" are scanned as
+# LPAREN and LBRACKET, so both spellings are listed.
 SpecialPreceding = list(
     map(
         repr,
-        ["@", "::", "(", "["]
+        ["@", "::", "(", "[", ","]
         + OperatorName
         + ["/", "//", "+", "-", "=", "!=", "<", "<=", ">", ">="],
     )
-) + ["BAR", "MultiplyOperator"]
-
-if sys.hexversion > 0x2000000:
-
-    def _get_type(match):
-        return match.lastgroup, match.group()
-
+) + ["LPAREN", "LBRACKET", "BAR", "MultiplyOperator"]
+
+NodeTypeName = ["comment", "text", "processing-instruction", "node"]
+
+# Lookup tables for the scanner's disambiguation rules
+_specialPreceding = frozenset(SpecialPreceding)
+_operatorNames = frozenset(OperatorName)
+_axisNames = frozenset(AxisName)
+_operatorTypes = dict(
+    [
+        (op, repr(op))
+        for op in OperatorName
+        + ["//", "::", ">=", "<=", "!=", "<", ">", "=", ",", "/", "@", ":", "-"]
+    ]
+)
+_calledNameTypes = dict([(name, "NodeType") for name in NodeTypeName])
+_calledNameTypes["id"] = "ID"
+_calledNameTypes["key"] = "KEY"
 
-else:
 
-    def _get_type(match):
-        type = val = None
-        for t, v in list(match.groupdict().items()):
-            if v is None:
-                continue
-            if val:
-                raise SyntaxError(
-                    pos, "ambiguity:%s could be %s or %s" % (val, type, t)
-                )
-            type = t
-            val = v
-        return type, val
+def ScannerPatterns():
+    """
+    Return the compiled token and follow patterns of XPathScanner,
+    compiling them on the first call.
+    """
+    global _xpath_exp, _xpath_follow
+    if _xpath_exp is None:
+        # What follows a name (possibly after white space): "(" or "::"
+        _xpath_follow = re.compile(r"[ \t\n\r]*(?:(\()|::)")
+        _xpath_exp = re.compile(XPathExpr, re.VERBOSE)
+    return (_xpath_exp, _xpath_follow)
 
 
 class XPathScanner:
     def __init__(self, input):
+        """
+        Tokenize input in a single pass.  The lexical disambiguation rules
+        of [3.7 Lexical Structure] are applied as each token is scanned,
+        using the type of the preceding token and a look at what follows.
+        """
         self.tokens = tokens = []
+        append = tokens.append
+        (tokens_exp, follow_exp) = ScannerPatterns()
+        match = tokens_exp.match
+        follow = follow_exp.match
 
         pos = 0
-
-        # Process all tokens, advancing pos for each one
-        while pos != len(input):
-            m = _xpath_exp.match(input, pos)
+        end = len(input)
+        # The type of the preceding token, None at the start
+        prev = None
+        while pos != end:
+            m = match(input, pos)
             if not m:
-                msg = "Bad Token"
-                raise SyntaxError(pos, msg)
-
-            type, val = _get_type(m)
+                raise XPathSyntaxError(pos, "Bad Token")
+            type = m.lastgroup
+            start = pos
+            pos = m.end()
             if type == "ExprWhiteSpace":
-                # If we got white space, ignore it
-                pos = pos + len(val)
                 continue
+            val = m.group()
+
+            if type == "NCName" or type == "QName":
+                if (
+                    type == "NCName"
+                    and val in _operatorNames
+                    and prev is not None
+                    and prev not in _specialPreceding
+                ):
+                    # An NCName must be recognized as an OperatorName
+                    type = _operatorTypes[val]
+                else:
+                    f = follow(input, pos)
+                    if f is not None:
+                        if f.group(1):
+                            # Followed by "(": a NodeType or a FunctionName
+                            type = _calledNameTypes.get(val, "FunctionName")
+                        elif type == "NCName" and val in _axisNames:
+                            # Followed by "::": an AxisName
+                            type = "AxisName"
+            elif type == "STAR":
+                if prev is not None and prev not in _specialPreceding:
+                    # A * must be recognized as a MultiplyOperator
+                    type = "MultiplyOperator"
+            elif type == "Operator" or type == "SingleOperator":
+                type = _operatorTypes[val]
 
-            if type in ["SingleOperator", "Operator"]:
-                type = repr(str(val))
-            start = pos
-            pos = pos + len(val)
-            tokens.append((start, pos, type, val))
+            append((start, pos, type, val))
+            prev = type
 
         # If we are at the end of the string, add END token
-        tokens.append((pos, pos, "END", ""))
-
-        # Adjust token type according to additional semantic rules
-
-        for i in range(len(tokens) - 1):
-            start, stop, type, val = tokens[i]
-            changed = 0
-            # If there is a preceding token and the preceding token is not
-            # one of @, ::, (, [, , or an Operator
-            if i >= 1 and tokens[i - 1][2] not in SpecialPreceding:
-                if type == "STAR":
-                    #  then a * must be recognized as a MultiplyOperator
-                    type = "MultiplyOperator"
-                    tokens[i] = (start, stop, type, val)
-                elif type == "NCName" and val in OperatorName:
-                    # and an NCName must be recognized as an OperatorName
-                    type = repr(str(val))
-                    tokens[i] = (start, stop, type, val)
-            # If the character following an NCName (possibly after
-            # intervening ExprWhitespace) is (
-            if tokens[i][2] in ["QName", "NCName"] and tokens[i + 1][2] == "LPAREN":
-                # then the token must be recognized as a NodeType or a
-                # FunctionName
-                if val in ["comment", "text", "processing-instruction", "node"]:
-                    type = "NodeType"
-                elif val == "id":
-                    type = "ID"
-                elif val == "key":
-                    type = "KEY"
-                else:
-                    type = "FunctionName"
-                tokens[i] = (start, stop, type, val)
-
-            # If the two characters following an NCName (possibly
-            # after intervening ExprWhitespace) are ::
-            if (
-                tokens[i][2] == "NCName"
-                and tokens[i + 1][3] == "::"
-                and val in AxisName
-            ):
-                # then the token must be recognized as an AxisName.
-                type = "AxisName"
-                tokens[i] = (start, stop, type, val)
+        append((pos, pos, "END", ""))
 
     def token(self, i, expected):
         return self.tokens[i]
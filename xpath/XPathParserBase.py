@@ -1,3 +1,5 @@
+import sys
+
 try:
     import os, gettext
 
@@ -37,35 +39,60 @@ class InternalException(Exception):
 
 
 class XPathParserBase:
+    """
+    Parses expressions onto a result stack.  All parse state, including
+    the error of a failed parse, is kept in the instance, so separate
+    instances can parse concurrently without any lock.
+    """
+
     def __init__(self):
         self.initialize()
 
     def initialize(self):
         self.results = None
         self.__stack = []
-        XPath.cvar.g_errorOccured = 0
+        # 0: no error, 1: syntax error, 2: internal error
+        self.errorOccured = 0
+        self.lineNum = 0
+        self.errorLocation = None
+        self.errorType = None
+        self.errorValue = None
+        self.errorTraceback = None
 
     def parse(self, st):
-        g_parseLock.acquire()
+        self.initialize()
+        self.parseExpr(st)
+        if self.errorOccured == 1:
+            raise SyntaxException(st, self.lineNum, self.errorLocation)
+        if self.errorOccured == 2:
+            raise InternalException(
+                st,
+                self.lineNum,
+                self.errorLocation,
+                self.errorType,
+                self.errorValue,
+                self.errorTraceback,
+            )
+        return self.__stack
+
+    def parseExpr(self, st):
+        """Parse st and push the expression tree, recording any error"""
+        from .TableParser import ExprParserFactory
+
         try:
-            self.initialize()
-            XPath.my_XPathparse(self, st)
-            if XPath.cvar.g_errorOccured == 1:
-                raise SyntaxException(
-                    st, XPath.cvar.lineNum, XPath.cvar.g_errorLocation
-                )
-            if XPath.cvar.g_errorOccured == 2:
-                raise InternalException(
-                    st,
-                    XPath.cvar.lineNum,
-                    XPath.cvar.g_errorLocation,
-                    XPath.cvar.g_errorType,
-                    XPath.cvar.g_errorValue,
-                    XPath.cvar.g_errorTraceback,
-                )
-            return self.__stack
-        finally:
-            g_parseLock.release()
+            self.push(ExprParserFactory.new().parse(st))
+        except SyntaxError as error:
+            # Only the parser's own errors know where they are
+            self.setError(1, st, getattr(error, "pos", 0))
+        except Exception:
+            self.setError(2, st, 0)
+            (self.errorType, self.errorValue, self.errorTraceback) = sys.exc_info()
+
+    def setError(self, kind, st, pos):
+        pos = max(pos, 0)
+        self.errorOccured = kind
+        self.lineNum = st.count("\n", 0, pos) + 1
+        self.errorLocation = st[pos:]
 
     def pop(self):
         if len(self.__stack):
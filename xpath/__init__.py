@@ -20,15 +20,14 @@ Inf = Inf = 1e300 * 1e300
 NaN = Inf - Inf
 
 # stdlib
+import os
+import threading
+import warnings
 from xml.dom import Node
 from xml.FtCore import FtException
 
 # localfolder
-# Allow access to the NormalizeNode function
-from . import Context
-from . import MessageSource
-from .Util import NormalizeNode
-from .XPathParserBase import SyntaxException
+from . import ExpressionCache
 
 
 
@@ -42,7 +41,101 @@ g_xpathRecognizedNodes = [
     Node.COMMENT_NODE,
 ]
 
-g_extFunctions = {}
+
+class ExtFunctionRegistry(dict):
+    """
+    The extension functions, keyed by expanded name.  The built-in
+    extension functions are only imported on the first lookup; functions
+    registered before then take precedence over them.  pure holds the
+    names of those that have no side effects and give the same value
+    whenever they are called with the same arguments in the same context.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.pure = set()
+        self._loaded = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._loaded:
+            return
+        self._lock.acquire()
+        try:
+            if not self._loaded:
+                from xml.xpath import BuiltInExtFunctions
+
+                for (name, func) in BuiltInExtFunctions.ExtFunctions.items():
+                    if self.setdefault(name, func) is func:
+                        if name in BuiltInExtFunctions.PureExtFunctions:
+                            self.pure.add(name)
+                self._loaded = 1
+        finally:
+            self._lock.release()
+
+    def get(self, key, default=None):
+        self._loaded or self.load()
+        return dict.get(self, key, default)
+
+    def __getitem__(self, key):
+        self._loaded or self.load()
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        self._loaded or self.load()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._loaded or self.load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._loaded or self.load()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._loaded or self.load()
+        return dict.keys(self)
+
+    def values(self):
+        self._loaded or self.load()
+        return dict.values(self)
+
+    def items(self):
+        self._loaded or self.load()
+        return dict.items(self)
+
+    def copy(self):
+        self._loaded or self.load()
+        return dict(self)
+
+
+g_extFunctions = ExtFunctionRegistry()
+
+# Whether compiled expressions are simplified, see SetOptimizing
+g_optimize = 1
+
+
+def Optimize(expr):
+    """
+    Fold the constant parts of the compiled expression expr and simplify
+    it (see Optimizer), and have its common sub-expressions and the
+    invariant parts of its predicates evaluated once (see
+    CommonSubexpressions and Invariants), unless optimizing has been
+    switched off.
+    """
+    if not g_optimize:
+        return expr
+    from . import CommonSubexpressions
+    from . import Invariants
+    from . import Optimizer
+
+    return Invariants.Hoist(CommonSubexpressions.Eliminate(Optimizer.Optimize(expr)))
+
+
+# Process-wide cache of compiled expressions used by Evaluate, and by
+# Compile when asked to
+g_expressionCache = ExpressionCache.ExpressionCache(optimizer=Optimize)
 
 
 class CompiletimeException(FtException):
@@ -51,6 +144,8 @@ class CompiletimeException(FtException):
     PROCESSING = 3
 
     def __init__(self, errorCode, *args):
+        from . import MessageSource
+
         FtException.__init__(self, errorCode, MessageSource.COMPILETIME, args)
 
 
@@ -62,14 +157,39 @@ class RuntimeException(FtException):
     WRONG_ARGUMENTS = 200
 
     def __init__(self, errorCode, *args):
+        from . import MessageSource
+
         FtException.__init__(self, errorCode, MessageSource.RUNTIME, args)
 
 
 
 
+# Attributes imported on first access, so that importing the package stays
+# cheap: name -> (module, attribute), or (module, None) for the module
+g_lazyAttributes = {
+    "Context": ("Context", None),
+    "MessageSource": ("MessageSource", None),
+    "NormalizeNode": ("Util", "NormalizeNode"),
+    "SyntaxException": ("XPathParserBase", "SyntaxException"),
+}
+
+
+def __getattr__(name):
+    if name == "parser":
+        return GetParser()
+    try:
+        (module, attr) = g_lazyAttributes[name]
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = __import__(module, globals(), {}, [attr or "__name__"], 1)
+    if attr:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
+
 
 def Evaluate(expr, contextNode=None, context=None):
-    import os
+    from . import Context
 
     if "EXTMODULES" in os.environ:
         RegisterExtensionModules(os.environ["EXTMODULES"].split(":"))
@@ -80,13 +200,31 @@ def Evaluate(expr, contextNode=None, context=None):
         con = Context.Context(contextNode, 0, 0)
     else:
         raise RuntimeException(RuntimeException.NO_CONTEXT_ERROR)
-    retval = parser.new().parse(expr).evaluate(con)
+    retval = g_expressionCache.compile(expr, GetParser()).evaluate(con)
     return retval
 
 
-def Compile(expr):
+def Compile(expr, cache=None, engine="tree"):
+    """
+    Parse expr into an expression tree and simplify it (see
+    SetOptimizing).  If cache is true the process-wide expression cache
+    is consulted; an ExpressionCache instance may also be passed to use
+    that cache instead, and its trees are simplified here if it has no
+    optimizer of its own.  With engine "closure" the tree is compiled
+    further into closures (see ClosureCompiler), which evaluate faster
+    and give the same results.
+    """
+    if engine not in g_engines:
+        raise ValueError("Unknown execution engine: %s" % engine)
+    if cache is not None and not isinstance(cache, ExpressionCache.ExpressionCache):
+        cache = cache and g_expressionCache or None
     try:
-        return parser.new().parse(expr)
+        if cache is not None:
+            compiled = cache.compile(expr, GetParser())
+            if cache.optimizer is None:
+                compiled = Optimize(compiled)
+        else:
+            compiled = Optimize(GetParser().new().parse(expr))
     except SyntaxError as error:
         raise CompiletimeException(CompiletimeException.SYNTAX, str(error))
     except:
@@ -95,9 +233,15 @@ def Compile(expr):
         stream = io.StringIO()
         traceback.print_exc(None, stream)
         raise RuntimeException(RuntimeException.INTERNAL, stream.getvalue())
+    if g_engines[engine]:
+        module = __import__(g_engines[engine], globals(), {}, ["Compile"], 1)
+        compiled = module.Compile(compiled)
+    return compiled
 
 
 def CreateContext(contextNode):
+    from . import Context
+
     return Context.Context(contextNode, 0, 0)
 
 
@@ -109,28 +253,120 @@ def RegisterExtensionModules(moduleNames):
             mod = __import__(mod_name, {}, {}, ["ExtFunctions"])
             if hasattr(mod, "ExtFunctions"):
                 g_extFunctions.update(mod.ExtFunctions)
+                # Names of the functions without side effects, if given
+                g_extFunctions.pure.update(getattr(mod, "PureExtFunctions", ()))
                 mods.append(mod)
     return mods
 
 
+# Execution engines: name -> module whose Compile turns a tree into
+# something evaluated like it, or None to evaluate the tree itself
+g_engines = {
+    "tree": None,
+    "closure": "ClosureCompiler",
+}
 
 
-try:
-    import XPathParserc
-except ImportError:
-    # import XPathParser
-    # parser = XPathParser
-    from .pyxpath import ExprParserFactory
+# Expression parser backends: name -> (module, parser factory)
+g_parserBackends = {
+    "yapps": ("pyxpath", "ExprParserFactory"),
+    "table": ("TableParser", "ExprParserFactory"),
+}
 
-    parser = ExprParserFactory
-else:
-    parser = XPathParserc
 
+def SetParserBackend(name):
+    """
+    Select the parser used by Evaluate and Compile.  'yapps' is the
+    recursive-descent parser of XPathGrammar, 'table' the LALR table
+    driven parser of TableParser.
+    """
+    global parser
+    try:
+        (module, factory) = g_parserBackends[name]
+    except KeyError:
+        raise ValueError("Unknown parser backend: %s" % name)
+    module = __import__(module, globals(), {}, [factory], 1)
+    parser = getattr(module, factory)
+    return parser
+
+
+def SetInterning(flag):
+    """
+    Share structurally equal sub-expressions among all expressions
+    compiled from now on (flag true), or stop doing so.
+    """
+    from . import pyxpath
+
+    pyxpath.SetInterning(flag)
+
+
+def SetOptimizing(flag):
+    """
+    Simplify expressions compiled from now on (flag true, the default),
+    or leave them as parsed.  XPATH_NO_OPTIMIZE switches it off at import.
+    """
+    global g_optimize
+    g_optimize = flag and 1 or 0
+    g_expressionCache.clear()
+
+
+def UseCompiledStore(path):
+    """
+    Load misses of the process-wide expression cache from the compiled
+    expression store at path (see CompiledStore.Write).  None detaches the
+    current store.  A detached store is not closed, as other threads may
+    still be loading from it; it is unmapped once no longer referenced.
+    """
+    from . import CompiledStore
+
+    store = CompiledStore.CompiledStore(path) if path else None
+    g_expressionCache.store = store
+    return store
+
+
+def GetParser():
+    """
+    Return the parser factory used by Evaluate and Compile.  The default
+    parser, and with it the expression classes, is imported on first use.
+    """
+    global parser
+    try:
+        return parser
+    except NameError:
+        pass
+    try:
+        import XPathParserc
+    except ImportError:
+        from .pyxpath import ExprParserFactory
 
-def Init():
-    from xml.xpath import BuiltInExtFunctions
+        parser = ExprParserFactory
+    else:
+        parser = XPathParserc
+    return parser
+
+if os.environ.get("XPATH_PARSER"):
+    SetParserBackend(os.environ["XPATH_PARSER"])
+
+if os.environ.get("XPATH_NO_OPTIMIZE"):
+    SetOptimizing(0)
 
-    g_extFunctions.update(BuiltInExtFunctions.ExtFunctions)
+if os.environ.get("XPATH_COMPILED_STORE"):
+    try:
+        UseCompiledStore(os.environ["XPATH_COMPILED_STORE"])
+    except (OSError, ValueError) as error:
+        # Parsing still works without the store, just more slowly
+        warnings.warn("Compiled expression store not used: %s" % error)
+
+
+def Init():
+    """
+    Load what importing the package leaves for first use: the built-in
+    extension functions and the default parser.  Set XPATH_EAGER_INIT to
+    do this at import time, e.g. in long-running servers.
+    """
+    g_extFunctions.load()
+    GetParser()
 
 
-Init()
+if os.environ.get("XPATH_EAGER_INIT"):
+    Init()
@@ -8,7 +8,9 @@ import os  # isort:skip
 # stdlib
 
 import string
+import threading
 import types
+import weakref
 from xml.xpath import ParsedExpr
 from xml.xpath import ParsedNodeTest
 from xml.xpath.ParsedAbbreviatedAbsoluteLocationPath import (
@@ -25,6 +27,7 @@ from xml.xpath.ParsedStep import ParsedStep
 from .exceptions import NoMoreTokens
 from .exceptions import StringException
 from .exceptions import XPathSyntaxError
+from .ParsedNode import ParsedNode
 
 
 
@@ -110,7 +113,10 @@ class FtFactory:
     createAbbreviatedRelativeLocationPath = PARLP
 
     def createStep(self, axis, test, predicates):
-        return ParsedStep(axis, test, ParsedPredicateList(predicates))
+        return ParsedStep(axis, test, self.createPredicateList(predicates))
+
+    def createPredicateList(self, predicates):
+        return ParsedPredicateList(predicates)
 
     def createAbbreviatedStep(self, parent):
         if parent:
@@ -120,7 +126,7 @@ class FtFactory:
         return ParsedStep(
             ParsedAxisSpecifier(type),
             ParsedNodeTest.ParsedNodeTest("node", ""),
-            ParsedPredicateList([]),
+            self.createPredicateList([]),
         )
 
     axisMap = {
@@ -190,6 +196,9 @@ class FtFactory:
             return cl[0](cl[1], left, right)
         return cl(left, right)
 
+    def createUnaryExpr(self, exp):
+        return ParsedExpr.ParsedUnaryExpr(exp)
+
     def createBooleanExpr(self, operator, left, right):
         cl = self.opMap[operator]
         if type(cl) is tuple:
@@ -197,13 +206,13 @@ class FtFactory:
         return cl(left, right)
 
     def createPathExpr(self, left, right):
-        return ParsedExpr.ParsedPathExpr("/", left, right)
+        return ParsedExpr.ParsedPathExpr(0, left, right)
 
     def createAbbreviatedPathExpr(self, left, right):
-        return ParsedExpr.ParsedPathExpr(XPATH.DOUBLE_SLASH, left, right)
+        return ParsedExpr.ParsedPathExpr(1, left, right)
 
     def createFilterExpr(self, filter, predicates):
-        return ParsedExpr.ParsedFilterExpr(filter, ParsedPredicateList(predicates))
+        return ParsedExpr.ParsedFilterExpr(filter, self.createPredicateList(predicates))
 
     def createVariableReference(self, prefix, localName):
         if prefix:
@@ -278,7 +287,7 @@ class FtFactory:
     def createStepPattern(self, axis, test, predicates):
         axis = axis.principalType
         if predicates:
-            predicates = ParsedPredicateList(predicates)
+            predicates = self.createPredicateList(predicates)
             return ParsedStepPattern.PredicateStepPattern(test, axis, predicates)
         else:
             return ParsedStepPattern.StepPattern(test, axis)
@@ -287,6 +296,59 @@ class FtFactory:
 factory = FtFactory()
 
 
+# Nodes built by interning factories, by structure.  Entries go away with
+# the last expression using them.
+g_internTable = weakref.WeakValueDictionary()
+g_internLock = threading.Lock()
+
+
+class InterningFtFactory(FtFactory):
+    """
+    An FtFactory that hash-conses: a node structurally equal to one built
+    before (and still in use) is not returned, the earlier one is.  Since
+    trees are built bottom up, equal sub-expressions of all expressions
+    compiled through the factory end up as one shared object.
+    """
+
+    def __init__(self):
+        for name in dir(FtFactory):
+            if name[:6] == "create":
+                create = getattr(FtFactory, name)
+                if type(create) is types.FunctionType:
+                    # Calls between create methods go through interning too
+                    create = types.MethodType(create, self)
+                setattr(self, name, self._interning(create))
+
+    def _interning(self, create):
+        def Create(*args):
+            return self.intern(create(*args))
+
+        return Create
+
+    def intern(self, node):
+        if not isinstance(node, ParsedNode):
+            return node
+        key = node.structure()
+        g_internLock.acquire()
+        try:
+            shared = g_internTable.get(key)
+            if shared is None:
+                g_internTable[key] = shared = node
+            return shared
+        finally:
+            g_internLock.release()
+
+
+def SetInterning(flag):
+    """
+    Have the parsers build through an InterningFtFactory (flag true) or a
+    plain FtFactory from now on.
+    """
+    global factory
+    factory = flag and InterningFtFactory() or FtFactory()
+    return factory
+
+
 class XPathSyntaxError_(XPathSyntaxError):
     def __init__(self, pos, msg, str):
         super().__init__(pos, msg)
@@ -346,8 +408,10 @@ def CompilePattern(str):
 
 
 class Factory:
-    def __init__(self, cl):
+    def __init__(self, cl, flavor=None):
         self.new = cl
+        # Names the kind of tree the parsers build, for persistent stores
+        self.flavor = flavor
 
 
 class ExprParser:
@@ -360,7 +424,7 @@ class ExprParser:
             raise XPathSyntaxError_(e.pos, e.msg, str)
 
 
-ExprParserFactory = Factory(ExprParser)
+ExprParserFactory = Factory(ExprParser, "expr")
 
 
 class PatternParser:
@@ -373,4 +437,4 @@ class PatternParser:
             raise XPathSyntaxError_(e.pos, e.msg, str)
 
 
-PatternParserFactory = Factory(PatternParser)
+PatternParserFactory = Factory(PatternParser, "pattern")